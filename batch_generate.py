@@ -0,0 +1,401 @@
+"""
+Headless, multi-process generation of large unload files.
+
+Examples:
+    python batch_generate.py denial -n 10000000 -j 8 -o samp_eng_app_denial.xml.gz
+    python batch_generate.py concurrent_usage -n 2000000 --parts 4
+    python batch_generate.py license -n 300000 --total-sum 60
+    python batch_generate.py license -n 2000000 --catalog --quantity lognormal:25,1.2 --start-from 2018-01-01 --term-years 1,3,5
+    python batch_generate.py denial -n 1000000 --seed 42 --as-of "2024-12-31 12:00:00"
+    python batch_generate.py denial -n 1000000 --seed 42 --as-of "2024-12-31 12:00:00" --parts 8 --part 3
+    python batch_generate.py denial -n 1000000 --format xml --format parquet -o denials.xml.gz
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+import sys_ids
+from clock import DateWindow, GenerationClock
+from instrumentation import Profiler, profiling, stage, write_report
+from record_templates import TEMPLATES
+from reference_data import BASE_DIR
+from seeding import RandomStreams
+from sinks import FORMATS, SINKS, open_sink, sink_path, write_values
+
+TableSpec = namedtuple("TableSpec", ["module", "file_name", "block_option"])
+
+# "block_option" names the option that sets the shard alignment: license records come in
+# blocks of `parts` records that share one quantity split.
+TABLES = {
+    "denial": TableSpec("data_generate", "samp_eng_app_denial.xml", None),
+    "concurrent_usage": TableSpec("concurrent_usage", "samp_eng_app_concurrent_usage.xml", None),
+    "usage_summary": TableSpec("usage_summary", "samp_eng_app_usage_summary.xml", None),
+    "license": TableSpec("license_usage", "samp_eng_app_license.xml", "parts"),
+}
+
+
+def table_template(table):
+    """Returns the record_templates.RecordTemplate of one of TABLES."""
+    return TEMPLATES[TABLES[table].file_name[:-len(".xml")]]
+
+
+# Seeded runs split into shards of this many records regardless of the worker count, so
+# the same seed gives the same file on any machine.
+SEEDED_SHARD_RECORDS = 50000
+
+# Finished seeded runs with a fixed --as-of are kept here and copied instead of regenerated.
+UNLOAD_CACHE_DIR = os.path.join(BASE_DIR, ".cache", "unloads")
+
+
+def plan_shards(num_records, num_shards, block=1):
+    """
+    Split record numbers 1..num_records into contiguous [start, stop) ranges.
+
+    Shard boundaries fall on multiples of `block`, so numbering stays contiguous and
+    blocked tables never straddle two shards.
+    """
+    num_blocks = -(-num_records // block)
+    num_shards = max(1, min(num_shards, num_blocks))
+    shards = []
+    start = 1
+    for k in range(num_shards):
+        blocks = num_blocks // num_shards + (1 if k < num_blocks % num_shards else 0)
+        stop = min(start + blocks * block, num_records + 1)
+        shards.append((start, stop))
+        start = stop
+    return shards
+
+
+def format_paths(path, formats):
+    """
+    Returns {format: output path} for one output path.
+
+    A lone XML output keeps its path as given; otherwise each format gets the path with
+    its own extension (see sinks.sink_path).
+    """
+    if tuple(formats) == ("xml",):
+        return {"xml": path}
+    return {fmt: sink_path(path, fmt) for fmt in formats}
+
+
+def _generate_shard(table, shard, start, stop, path, options, complete, unload_date, seed=None, profile=None,
+                    formats=("xml",)):
+    """
+    Worker entry point: write records start..stop-1 of shard number `shard` to `path`,
+    in every one of `formats` (see format_paths).
+
+    With complete=True the shard is a valid file on its own; otherwise only the
+    serialized records are written, ready to be concatenated by the parent. With a seed
+    the shard draws from its own seeded streams, so it can be regenerated on its own.
+    With profile set to a Profiler's `memory` flag the shard is profiled.
+
+    Returns:
+    tuple: (record count, Profiler.to_dict() or None).
+    """
+    if profile is None:
+        return _write_shard(table, shard, start, stop, path, options, complete, unload_date, seed, formats), None
+    profiler = Profiler(memory=profile)
+    with profiling(profiler):
+        count = _write_shard(table, shard, start, stop, path, options, complete, unload_date, seed, formats)
+    profiler.add_records(count)
+    return count, profiler.to_dict()
+
+
+def _write_shard(table, shard, start, stop, path, options, complete, unload_date, seed, formats):
+    # Forked workers inherit the parent's random state; reseed so shards differ.
+    random.seed()
+    # Each shard draws sys_ids from its own namespace, so ids are unique across the whole run.
+    sys_ids.configure(namespace=shard)
+    module = importlib.import_module(TABLES[table].module)
+    # Fresh streams: unseeded numpy streams must not be shared with a forked parent either.
+    options = dict(options, streams=RandomStreams(seed, shard, table))
+    template = table_template(table)
+    with ExitStack() as stack:
+        sinks = [
+            stack.enter_context(open_sink(fmt, target, template, header=complete, unload_date=unload_date))
+            for fmt, target in format_paths(path, formats).items()
+        ]
+        return write_values(module.generate_values(start, stop, **options), sinks)
+
+
+def part_path(output, index, total):
+    """Returns the file name of part `index` (0-based) of `total`, e.g. out.part003-of-008.xml."""
+    base, ext = output, ""
+    extensions = [sink.extension for sink in SINKS.values()]
+    for suffix in [extension + ".gz" for extension in extensions] + extensions:
+        if output.endswith(suffix):
+            base, ext = output[:-len(suffix)], suffix
+            break
+    return f"{base}.part{index + 1:03d}-of-{total:03d}{ext}"
+
+
+def run(table, num_records, output=None, workers=None, shards=None, parts=None, options=None, seed=None,
+        only_part=None, profiler=None, formats=("xml",)):
+    """
+    Generate `num_records` records of `table` on a process pool.
+
+    Parameters:
+    table (str): One of TABLES.
+    num_records (int): Number of records to generate.
+    output (str): Output path. ".gz" outputs are gzip-compressed. Defaults to the table's file name.
+        Missing parent directories are created.
+    workers (int): Number of worker processes. Defaults to the CPU count.
+    shards (int): Number of shards to merge into one file. Defaults to 4 per worker, or
+        one per SEEDED_SHARD_RECORDS records when seeded.
+    parts (int): Write this many standalone part files instead of one merged file.
+    options (dict): Table-specific keyword arguments for generate_records.
+    seed (int): Root seed. Shard k draws from RandomStreams(seed, k, table), so the output only
+        depends on the seed, the options and the shard layout.
+    only_part (int): With parts, write only this part (0-based), e.g. to regenerate a lost one.
+    profiler (instrumentation.Profiler): Profile every shard and merge the reports into it;
+        stage times are then summed over the workers.
+    formats (tuple): Output formats from sinks.FORMATS. Every format receives the same
+        records; with more than one (or a non-XML one) each gets its own extension.
+
+    Returns:
+    list: The written file paths.
+    """
+    spec = TABLES[table]
+    output = output or spec.file_name
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    options = options or {}
+    block = options.get(spec.block_option, 1) if spec.block_option else 1
+    clock = options.get("clock")
+    if clock is not None and clock.as_of is not None:
+        unload_date = clock.as_of.strftime("%Y-%m-%d %H:%M:%S")
+    else:
+        unload_date = time.strftime("%Y-%m-%d %H:%M:%S")
+
+    profile = None if profiler is None else profiler.memory
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if parts:
+            plan = plan_shards(num_records, parts, block)
+            paths = [part_path(output, k, len(plan)) for k in range(len(plan))]
+            selected = range(len(plan)) if only_part is None else [only_part]
+            futures = [
+                pool.submit(_generate_shard, table, k, *plan[k], paths[k], options, True, unload_date, seed, profile,
+                            formats)
+                for k in selected
+            ]
+            for future in futures:
+                _, report = future.result()
+                if report is not None:
+                    profiler.merge(report)
+            return [written for k in selected for written in format_paths(paths[k], formats).values()]
+
+        if shards is None and seed is not None:
+            shards = -(-num_records // SEEDED_SHARD_RECORDS)
+        plan = plan_shards(num_records, shards or workers * 4, block)
+        tmp_dir = tempfile.mkdtemp(prefix=f"{table}-", dir=os.path.dirname(os.path.abspath(output)))
+        try:
+            futures = [
+                pool.submit(_generate_shard, table, k, start, stop,
+                            os.path.join(tmp_dir, f"shard{k:05d}.xml"), options, False, unload_date, seed, profile,
+                            formats)
+                for k, (start, stop) in enumerate(plan)
+            ]
+            outputs = format_paths(output, formats)
+            template = table_template(table)
+            # Merge in shard order as soon as each next shard is ready.
+            with ExitStack() as stack:
+                sinks = {
+                    fmt: stack.enter_context(open_sink(fmt, target, template, unload_date=unload_date))
+                    for fmt, target in outputs.items()
+                }
+                for k, future in enumerate(futures):
+                    count, report = future.result()
+                    if report is not None:
+                        profiler.merge(report)
+                    for fmt, shard_file in format_paths(os.path.join(tmp_dir, f"shard{k:05d}.xml"), formats).items():
+                        with stage("merge_shards"):
+                            sinks[fmt].append_shard(shard_file, count)
+                        os.remove(shard_file)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return list(outputs.values())
+
+
+def cache_key(table, num_records, seed, options, layout):
+    """
+    Returns the cache key of a seeded run: everything its output depends on.
+
+    layout is ("merged", shards) or ("parts", parts) plus the output suffix, since the
+    shard layout decides which records each seeded stream produces.
+    """
+    settings = {}
+    for name, value in sorted(options.items()):
+        if isinstance(value, GenerationClock):
+            value = value.as_of
+        elif isinstance(value, DateWindow):
+            value = (value.start, value.end)
+        settings[name] = value
+    text = json.dumps([table, num_records, seed, settings, layout], sort_keys=True, default=str)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def run_cached(table, num_records, output=None, workers=None, shards=None, parts=None, options=None, seed=None,
+               cache_dir=UNLOAD_CACHE_DIR):
+    """
+    Like run(), but reuse the files of an identical earlier seeded run from cache_dir.
+
+    Returns:
+    tuple: (written paths, True when they were copied from the cache).
+    """
+    output = output or TABLES[table].file_name
+    suffix = ".xml.gz" if output.endswith(".gz") else ".xml"
+    layout = ["parts", parts, suffix] if parts else ["merged", shards, suffix]
+    entry = os.path.join(cache_dir, cache_key(table, num_records, seed, options or {}, layout))
+
+    if os.path.isdir(entry):
+        cached = sorted(os.listdir(entry))
+        paths = [part_path(output, k, len(cached)) for k in range(len(cached))] if parts else [output]
+        if len(cached) == len(paths):
+            os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+            for name, path in zip(cached, paths):
+                shutil.copyfile(os.path.join(entry, name), path)
+            return paths, True
+
+    paths = run(table, num_records, output, workers, shards, parts, options, seed)
+    try:
+        tmp_entry = f"{entry}.{os.getpid()}.tmp"
+        os.makedirs(tmp_entry, exist_ok=True)
+        for k, path in enumerate(paths):
+            shutil.copyfile(path, os.path.join(tmp_entry, f"{k:05d}{suffix}"))
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp_entry, entry)
+    except OSError:
+        # The cache is only an optimisation; a full disk or read-only checkout still works.
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+    return paths, False
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate large unload files without Streamlit.")
+    sub = parser.add_subparsers(dest="table", required=True)
+    for table, spec in TABLES.items():
+        p = sub.add_parser(table, help=f"Generate {spec.file_name}")
+        p.add_argument("-n", "--num-records", type=int, required=True, help="Number of records to generate")
+        p.add_argument("-o", "--output", help=f"Output file (default: {spec.file_name}; add .gz to compress)")
+        p.add_argument("-j", "--workers", type=int, help="Worker processes (default: CPU count)")
+        p.add_argument("--shards", type=int, help="Shards to merge into one file (default: 4 per worker)")
+        p.add_argument("--parts", type=int, help="Write N standalone part files instead of one file")
+        p.add_argument("--seed", type=int, help="Root seed; the same seed, options and --as-of give the same file")
+        p.add_argument("--part", type=int, help="With --parts and --seed, regenerate only part K (1-based)")
+        p.add_argument("--no-cache", action="store_true",
+                       help="Always regenerate, even when a seeded XML run with a fixed --as-of is cached")
+        p.add_argument("--profile", nargs="?", const="memory", choices=["memory", "time"],
+                       help="Print per-stage wall time (and tracemalloc peaks unless 'time'); implies --no-cache")
+        p.add_argument("--profile-json", help="Also write the profile as JSON to this file (implies --profile)")
+        p.add_argument("--format", action="append", choices=FORMATS, dest="formats",
+                       help="Output format; repeat to write the same records in several formats, each file "
+                            "named after --output with its own extension (default: xml)")
+        add_table_arguments(p, table)
+    return parser
+
+
+def add_table_arguments(parser, table):
+    """Adds --as-of and the table-specific options read by table_options() to a subcommand parser."""
+    parser.add_argument("--as-of", help="Timestamp every record with this time (default: the start of the run)")
+    if table != "license":
+        parser.add_argument("--date-from", help="Spread usage/denial dates from this date (YYYY-MM-DD)")
+        parser.add_argument("--date-to", help="... up to this date (default: the as-of date)")
+    if table == "license":
+        parser.add_argument("--total-sum", type=int, default=30, help="Quantity split across each block of licenses")
+        parser.add_argument("--max-gap", type=int, default=5, help="Maximum quantity gap within a block")
+        parser.add_argument("--licenses-per-split", type=int, default=3,
+                            help="Number of licenses that share each split of --total-sum")
+        parser.add_argument("--catalog", action="store_true",
+                            help="Generate a bulk license catalog instead: entitlements spread over every software "
+                                 "install, license server and license type")
+        parser.add_argument("--quantity",
+                            help="Catalog quantity distribution: fixed:N, uniform:LOW,HIGH, choice:A,B,..., "
+                                 "poisson:MEAN or lognormal:MEDIAN,SIGMA (default: lognormal:10,1)")
+        parser.add_argument("--start-from", help="Draw catalog start dates from this day (default: the as-of date)")
+        parser.add_argument("--start-to", help="... up to this day (default: --start-from)")
+        parser.add_argument("--term-years", help="Catalog license terms in years to draw from, e.g. 1,3,5 (default: 10)")
+
+
+def table_options(args):
+    """Collects the table-specific generate_records keyword arguments from parsed arguments."""
+    clock = GenerationClock(args.as_of or time.strftime("%Y-%m-%d %H:%M:%S"))
+    options = {"clock": clock}
+    if args.table == "license":
+        options.update(total_sum=args.total_sum, max_gap=args.max_gap, parts=args.licenses_per_split)
+        if args.catalog:
+            from license_usage import CatalogSpec, parse_term_years
+
+            spec = {"quantity": args.quantity, "start_from": args.start_from, "start_to": args.start_to,
+                    "term_years": parse_term_years(args.term_years) if args.term_years else None}
+            options["catalog"] = CatalogSpec(**{name: value for name, value in spec.items() if value is not None})
+    elif args.date_from:
+        options["date_window"] = DateWindow(args.date_from, args.date_to or clock.as_of)
+    return options
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.num_records <= 0:
+        print("Please enter a valid number greater than 0.", file=sys.stderr)
+        return 2
+    if args.part is not None and (args.seed is None or not args.parts or not 1 <= args.part <= args.parts):
+        print("--part needs --seed and --parts, and must be between 1 and --parts.", file=sys.stderr)
+        return 2
+    try:
+        options = table_options(args)
+        if args.table == "license":
+            # Report an impossible split or catalog spec right away instead of from every worker.
+            from license_usage import check_catalog, split_quantity
+            if "catalog" in options:
+                check_catalog(options["catalog"], options["clock"])
+            else:
+                split_quantity(args.total_sum, args.licenses_per_split, args.max_gap)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    started = time.perf_counter()
+    formats = tuple(dict.fromkeys(args.formats or ["xml"]))
+    if args.profile or args.profile_json:
+        profiler = Profiler(memory=args.profile != "time")
+        with profiling(profiler):
+            paths = run(args.table, args.num_records, args.output, args.workers, args.shards, args.parts,
+                        options, args.seed, None if args.part is None else args.part - 1, profiler, formats)
+        print(f"Wrote {args.table} records to {', '.join(paths)}")
+        print(profiler.summary())
+        if args.profile_json:
+            write_report(profiler, args.profile_json)
+        return 0
+    if args.part is not None:
+        paths = run(args.table, args.num_records, args.output, args.workers, args.shards, args.parts,
+                    options, args.seed, only_part=args.part - 1, formats=formats)
+        print(f"Regenerated {', '.join(paths)} in {time.perf_counter() - started:.1f}s")
+        return 0
+    if args.seed is not None and args.as_of and not args.no_cache and formats == ("xml",):
+        paths, hit = run_cached(args.table, args.num_records, args.output, args.workers, args.shards, args.parts,
+                                options, args.seed)
+        if hit:
+            print(f"Copied {args.num_records} cached {args.table} records to {', '.join(paths)}")
+            return 0
+    else:
+        paths = run(args.table, args.num_records, args.output, args.workers, args.shards, args.parts,
+                    options, args.seed, formats=formats)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {args.num_records} {args.table} records to {', '.join(paths)} "
+          f"in {elapsed:.1f}s ({args.num_records / elapsed:,.0f} records/s)")
+    if args.seed is not None:
+        print(f"Seed: {args.seed}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
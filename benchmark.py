@@ -0,0 +1,343 @@
+"""
+Headless benchmarks for the record generators, the unload writer, the graph series and
+the scripts' startup time.
+
+Each case reports records/s, bytes/s and peak traced memory. Every case gets an
+untimed warm-up run and then keeps the best of several timed runs. Results can be saved
+as JSON and compared against a saved baseline; a case that got slower (or hungrier) by
+more than the threshold is flagged and the exit status is 1. The allowed slowdown of a
+case is widened to the run-to-run spread measured in either run, so a noisy case is not
+flagged for noise.
+
+Examples:
+    python benchmark.py                              # run everything, print a table
+    python benchmark.py --save baseline.json
+    python benchmark.py --compare baseline.json -k unload
+    python benchmark.py --scale 0.1 --repeat 1 --warmup 0   # quick smoke run
+    python benchmark.py -k startup                   # import time of each script
+"""
+import argparse
+import fnmatch
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+
+from clock import GenerationClock
+from unload_writer import UnloadWriter
+
+# A fixed clock keeps the timestamp formatting out of the measurement's noise.
+AS_OF = "2024-12-31 12:00:00"
+
+Case = namedtuple("Case", ["name", "count", "run"])
+Result = namedtuple("Result", ["name", "records", "seconds", "bytes", "peak_bytes", "samples"])
+
+
+def _element_records(render, count):
+    """Builds `count` ET.Element records the way the pages do; returns (records, bytes)."""
+    size = 0
+    for number in range(1, count + 1):
+        size += len(ET.tostring(render(number), encoding="unicode"))
+    return count, size
+
+
+def _unload(module, count, **options):
+    """Streams a full unload of `count` records into memory; returns (records, bytes)."""
+    sink = io.BytesIO()
+    with UnloadWriter(sink, unload_date=AS_OF) as writer:
+        writer.write_all(module.generate_records(1, count + 1, **options))
+    return writer.count, writer.bytes_written
+
+
+def _record_cases(scale):
+    import concurrent_usage
+    import data_generate
+    import license_usage
+    import usage_summary
+
+    clock = GenerationClock(AS_OF)
+    discovery = license_usage.DISCOVERY_MODELS
+    count = max(1, int(20000 * scale))
+    return [
+        Case("record.denial", count,
+             lambda n: _element_records(lambda i: data_generate.generate_xml_record(i, clock), n)),
+        Case("record.concurrent_usage", count,
+             lambda n: _element_records(lambda i: concurrent_usage.generate_xml_record(i, clock), n)),
+        Case("record.usage_summary", count,
+             lambda n: _element_records(
+                 lambda i: usage_summary.generate_xml_record(i, usage_summary.BASE_DATE, clock), n)),
+        Case("record.license", count,
+             lambda n: _element_records(
+                 lambda i: license_usage.generate_xml_record(discovery[i % len(discovery)], i % 50 + 1, clock), n)),
+    ]
+
+
+def _unload_cases(scale):
+    import concurrent_usage
+    import data_generate
+    import license_usage
+    import usage_summary
+
+    clock = GenerationClock(AS_OF)
+    count = max(1, int(100000 * scale))
+    return [
+        Case("unload.denial", count, lambda n: _unload(data_generate, n, clock=clock)),
+        Case("unload.concurrent_usage", count, lambda n: _unload(concurrent_usage, n, clock=clock)),
+        Case("unload.usage_summary", count, lambda n: _unload(usage_summary, n, clock=clock)),
+        Case("unload.license", count, lambda n: _unload(license_usage, n, clock=clock)),
+    ]
+
+
+def _split_cases(scale):
+    from license_usage import generate_distinct_numbers_with_constraints
+
+    def run(count, totals):
+        # Cycle through the totals so every size of split is exercised.
+        for i in range(count):
+            generate_distinct_numbers_with_constraints(totals[i % len(totals)])
+        return count, 0
+
+    count = max(1, int(100000 * scale))
+    return [
+        Case("split.small_totals", count, lambda n: run(n, range(6, 28))),
+        Case("split.large_totals", count, lambda n: run(n, range(1000, 100000, 997))),
+    ]
+
+
+def _graph_cases(scale):
+    import numpy as np
+    from graph import generate_controlled_data
+
+    def run(points):
+        rng = np.random.default_rng(0)
+        data = generate_controlled_data("2024-01-01", "2024-12-31", 100, num_points=points, rng=rng)
+        return len(data), int(data.memory_usage(index=False).sum())
+
+    return [
+        Case(f"graph.points_{points}", max(26, int(points * scale)), run)
+        for points in (100, 10000, 1000000)
+    ]
+
+
+# Modules a script may only import when a feature needs them, never at startup.
+HEAVY_MODULES = ("pandas", "matplotlib", "streamlit")
+STARTUP_MODULES = ("reference_data", "data_generate", "concurrent_usage", "usage_summary", "license_usage",
+                   "batch_generate", "pipeline", "curve_usage", "session_sim", "generation_state")
+
+
+def _import_fresh(module):
+    """Imports `module` in a new interpreter; raises if that pulled in one of HEAVY_MODULES."""
+    code = (f"import sys\nimport {module}\n"
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))") if module else "pass"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    heavy = out.stdout.strip()
+    if heavy:
+        raise RuntimeError(f"Importing {module} also imported {heavy}.")
+    return 1, 0
+
+
+def _startup_cases(scale):
+    # Cold start of a new interpreter, as a CI job sees it; "python" is the bare interpreter.
+    cases = [Case("startup.python", 1, lambda n: _import_fresh(None))]
+    for module in STARTUP_MODULES:
+        cases.append(Case(f"startup.{module}", 1, lambda n, module=module: _import_fresh(module)))
+    return cases
+
+
+CASE_GROUPS = {
+    "record": _record_cases,
+    "unload": _unload_cases,
+    "split": _split_cases,
+    "graph": _graph_cases,
+    "startup": _startup_cases,
+}
+
+
+def collect_cases(scale=1.0, pattern=None):
+    """Returns the cases whose name matches the glob `pattern` (all cases by default)."""
+    cases = []
+    for build in CASE_GROUPS.values():
+        cases.extend(build(scale))
+    if pattern:
+        cases = [c for c in cases if any(fnmatch.fnmatch(c.name, p) or p in c.name for p in pattern)]
+    return cases
+
+
+def measure(case, repeat=5, warmup=1):
+    """
+    Run one case: `warmup` untimed runs (imports, reference caches, allocator), the best
+    wall time over `repeat` runs, then one traced run for peak memory.
+
+    Returns:
+    Result: Records and bytes produced, best seconds, peak traced bytes and every timed run's seconds.
+    """
+    for _ in range(warmup):
+        case.run(case.count)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        records, size = case.run(case.count)
+        samples.append(time.perf_counter() - started)
+
+    # tracemalloc slows allocation down, so memory is measured on a separate run.
+    tracemalloc.start()
+    try:
+        case.run(case.count)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return Result(case.name, records, min(samples), size, peak, samples)
+
+
+def spread(samples):
+    """Returns the relative run-to-run spread of timings: (median - best) / best, 0 for one run."""
+    samples = sorted(samples)
+    if len(samples) < 2 or not samples[0]:
+        return 0.0
+    middle = len(samples) // 2
+    median = samples[middle] if len(samples) % 2 else (samples[middle - 1] + samples[middle]) / 2
+    return median / samples[0] - 1
+
+
+def _git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def to_json(results, scale, repeat, warmup=1):
+    """Returns the results as a JSON-serializable dict."""
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": scale,
+            "repeat": repeat,
+            "warmup": warmup,
+        },
+        "results": {
+            r.name: {
+                "records": r.records,
+                "seconds": r.seconds,
+                "bytes": r.bytes,
+                "records_per_second": r.records / r.seconds if r.seconds else None,
+                "bytes_per_second": r.bytes / r.seconds if r.seconds else None,
+                "peak_bytes": r.peak_bytes,
+                "samples": r.samples,
+                "spread": spread(r.samples),
+            }
+            for r in results
+        },
+    }
+
+
+def compare(current, baseline, threshold=0.10):
+    """
+    Compare two result dicts (see to_json) case by case.
+
+    Throughput is compared per record (best run against best run), so runs at different
+    --scale still line up. A slowdown only counts as a regression beyond the larger of
+    the threshold and the spread measured in either result: a case whose own runs
+    differ by 25% cannot show a 10% regression. Baselines saved without samples use
+    the threshold alone.
+
+    Returns:
+    list: (name, speed change, memory change, allowed slowdown, regressed) for cases present in both.
+    """
+    rows = []
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if not before or not before.get("records_per_second") or not now.get("records_per_second"):
+            continue
+        speed = now["records_per_second"] / before["records_per_second"] - 1
+        memory = (now["peak_bytes"] / before["peak_bytes"] - 1) if before["peak_bytes"] else 0.0
+        allowed = max(threshold, before.get("spread", 0.0), now.get("spread", 0.0))
+        rows.append((name, speed, memory, allowed, speed < -allowed or memory > threshold))
+    return rows
+
+
+def _format_rate(value, unit):
+    for prefix in ("", "k", "M", "G"):
+        if abs(value) < 1000 or prefix == "G":
+            return f"{value:,.1f} {prefix}{unit}"
+        value /= 1000
+
+
+def print_results(results, out=sys.stdout):
+    print(f"{'case':<28}{'records':>10}{'seconds':>10}{'records/s':>16}{'bytes/s':>14}{'peak':>12}", file=out)
+    for r in results:
+        rate = r.records / r.seconds if r.seconds else 0
+        byte_rate = r.bytes / r.seconds if r.seconds else 0
+        print(f"{r.name:<28}{r.records:>10,}{r.seconds:>10.3f}{_format_rate(rate, ''):>16}"
+              f"{_format_rate(byte_rate, 'B'):>14}{r.peak_bytes / 2 ** 20:>9.1f} MB", file=out)
+
+
+def print_comparison(rows, threshold, out=sys.stdout):
+    print(f"\n{'case':<28}{'speed':>10}{'allowed':>10}{'memory':>10}", file=out)
+    for name, speed, memory, allowed, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<28}{speed:>+10.1%}{-allowed:>+10.1%}{memory:>+10.1%}{flag}", file=out)
+    print(f"(threshold {threshold:.0%}, widened to each case's measured run-to-run spread)", file=out)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the generators headlessly.")
+    parser.add_argument("-k", "--cases", action="append",
+                        help="Run only cases matching this glob or substring (repeatable), e.g. 'unload.*'")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every case's record count")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Timed runs per case; the best one is kept and their spread widens --threshold")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per case before the timed ones")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Compare against a JSON file written by --save")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown or memory growth flagged as a regression")
+    parser.add_argument("--list", action="store_true", help="List the cases and exit")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    cases = collect_cases(args.scale, args.cases)
+    if args.list:
+        for case in cases:
+            print(f"{case.name:<28}{case.count:>10,}")
+        return 0
+    if not cases:
+        print("No benchmark case matches.", file=sys.stderr)
+        return 2
+
+    results = []
+    for case in cases:
+        print(f"running {case.name} ({case.count:,})...", file=sys.stderr)
+        results.append(measure(case, max(1, args.repeat), max(0, args.warmup)))
+    print_results(results)
+
+    current = to_json(results, args.scale, args.repeat, args.warmup)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as handle:
+            json.dump(current, handle, indent=2)
+        print(f"\nResults saved to {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            rows = compare(current, json.load(handle), args.threshold)
+        print_comparison(rows, args.threshold)
+        if any(row[-1] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import random
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+from instrumentation import stage
+
+DATE_FORMAT = "%Y-%m-%d"
+MINUTE_FORMAT = "%Y-%m-%d %H:%M"
+SECOND_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# One instant, pre-formatted in every layout the record templates use.
+Stamp = namedtuple("Stamp", ["date", "minute", "second"])
+
+
+def make_stamp(moment):
+    """Formats a datetime once into a Stamp."""
+    with stage("timestamps"):
+        second = moment.strftime(SECOND_FORMAT)
+    return Stamp(second[:10], second[:16], second)
+
+
+class GenerationClock:
+    """
+    The "as-of" clock records are stamped with.
+
+    With a fixed as_of every record of the run carries the same timestamps. Without one
+    the clock follows wall time but formats each distinct second only once, and every
+    field of a record is filled from the same Stamp, so fields no longer drift apart.
+
+    Parameters:
+    as_of (datetime | str): Fixed generation time, as a datetime or "YYYY-MM-DD[ HH:MM:SS]".
+    """
+
+    def __init__(self, as_of=None):
+        if isinstance(as_of, str):
+            as_of = parse_datetime(as_of)
+        self.as_of = as_of
+        self._second = None
+        self._stamp = make_stamp(as_of) if as_of is not None else None
+
+    def stamp(self):
+        """Returns the Stamp for the current generation second."""
+        if self.as_of is not None:
+            return self._stamp
+        second = int(time.time())
+        if second != self._second:
+            self._second = second
+            self._stamp = make_stamp(datetime.fromtimestamp(second))
+        return self._stamp
+
+    def now(self):
+        """Returns the current generation time as a datetime."""
+        if self.as_of is not None:
+            return self.as_of
+        return datetime.fromtimestamp(int(time.time()))
+
+
+class DateWindow:
+    """
+    A precomputed table of formatted dates between start and end (inclusive).
+
+    Used to spread usage_date / denial_date over a window instead of stamping every
+    record with today.
+    """
+
+    def __init__(self, start, end):
+        start, end = _as_date(start), _as_date(end)
+        if end < start:
+            raise ValueError("The end of the date window must not be before its start.")
+        days = (end - start).days + 1
+        self.start = start
+        self.end = end
+        self.dates = [(start + timedelta(days=offset)).strftime(DATE_FORMAT) for offset in range(days)]
+
+    def __len__(self):
+        return len(self.dates)
+
+    def pick(self, rng=random):
+        """Returns one formatted date drawn uniformly from the window."""
+        return rng.choice(self.dates)
+
+
+def parse_datetime(text):
+    """Parses "YYYY-MM-DD" or "YYYY-MM-DD HH:MM[:SS]" into a datetime."""
+    for layout in (SECOND_FORMAT, MINUTE_FORMAT, DATE_FORMAT):
+        try:
+            return datetime.strptime(text, layout)
+        except ValueError:
+            pass
+    raise ValueError(f"Unrecognised date: {text!r}. Use YYYY-MM-DD or YYYY-MM-DD HH:MM:SS.")
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return parse_datetime(value).date()
+
+
+@lru_cache(maxsize=65536)
+def format_offset(base_date, offset):
+    """Formats base_date + offset as "YYYY-MM-DD HH:MM:SS", once per distinct offset."""
+    return (base_date + offset).strftime(SECOND_FORMAT)
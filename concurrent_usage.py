@@ -1,88 +1,151 @@
-import streamlit as st
 import xml.etree.ElementTree as ET
-import random
-import hashlib
-from datetime import datetime
-import pandas as pd
+from datetime import date, timedelta
+from reference_data import EmptyDataError, ReferenceTable, load_table, report_error
+from seeding import RandomStreams, parse_seed
+from record_templates import CONCURRENT_USAGE
+from clock import DateWindow, GenerationClock
+from instrumentation import wrap
 
 def load_data_from_csv(file_name):
+    """Returns the cached reference table for a CSV file (see reference_data.py)."""
     try:
-        data = pd.read_csv(file_name)
-        return data.to_dict(orient="records")
-    except (FileNotFoundError, pd.errors.EmptyDataError) as e:
-        st.error(f"Error loading CSV file: {e}")
-        return []
+        return load_table(file_name)
+    except (FileNotFoundError, EmptyDataError) as e:
+        report_error(f"Error loading CSV file: {e}")
+        return ReferenceTable.empty(file_name)
 
 
 # Usage:
-USER_NAMES = load_data_from_csv("user.csv")
-DISCOVERY_MODELS = load_data_from_csv("discovery.csv")
-GROUP_NAMES = load_data_from_csv("group.csv")
+USER_TABLE = load_data_from_csv("user.csv")
+USER_NAMES = USER_TABLE.records()
+DISCOVERY_TABLE = load_data_from_csv("discovery.csv")
+DISCOVERY_MODELS = DISCOVERY_TABLE.records()
+GROUP_TABLE = load_data_from_csv("group.csv")
+GROUP_NAMES = GROUP_TABLE.records()
 
 
 
 
 if not USER_NAMES:
-    st.error("No user names found. Ensure the 'user.csv' file exists and contains valid data.")
+    report_error("No user names found. Ensure the 'user.csv' file exists and contains valid data.")
 if not DISCOVERY_MODELS:
-    st.error("No discovery models found. Ensure the 'discovery.csv' file exists and contains valid data.")
+    report_error("No discovery models found. Ensure the 'discovery.csv' file exists and contains valid data.")
 if not GROUP_NAMES:
-    st.error("No group names found. Ensure the 'group.csv' file exists and contains valid data.")
+    report_error("No group names found. Ensure the 'group.csv' file exists and contains valid data.")
 
 # Other Fixed Values
 
 CON_USAGE_ID_TEMPLATE = "Con Usage {}"
 
-def generate_unique_hash():
-    """Generates a unique hash value to ensure each XML field requiring a hash is unique and randomized."""
-    return hashlib.md5(str(random.random()).encode()).hexdigest()
-
-def generate_xml_record(denial_num):
-    
-    #randomly select from csv files
-    discovery = random.choice(DISCOVERY_MODELS)
-
-
- # Create the <samp_eng_app_concurrent_usage> element with "INSERT_OR_UPDATE" action
-    concurrent_usage = ET.Element("samp_eng_app_concurrent_usage", action="INSERT_OR_UPDATE")
-    ET.SubElement(concurrent_usage, "conc_usage_id").text = CON_USAGE_ID_TEMPLATE.format(denial_num + 100)
-    ET.SubElement(concurrent_usage, "concurrent_usage").text = str(random.randint(1, 100))
-    ET.SubElement(concurrent_usage, "license", display_value=discovery["norm_product"]).text = discovery["license_sys_id"]
-    ET.SubElement(concurrent_usage, "source").text = "OpeniT"
-    ET.SubElement(concurrent_usage, "sys_created_by").text = "admin"
-    ET.SubElement(concurrent_usage, "sys_created_on").text = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    ET.SubElement(concurrent_usage, "sys_domain").text = generate_unique_hash()
-    ET.SubElement(concurrent_usage, "sys_domain_path").text = "/"
-    ET.SubElement(concurrent_usage, "sys_id").text = generate_unique_hash()
-    ET.SubElement(concurrent_usage, "sys_mod_count").text = str(random.randint(1, 100))
-    ET.SubElement(concurrent_usage, "sys_updated_by").text = "admin"
-    ET.SubElement(concurrent_usage, "sys_updated_on").text = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    ET.SubElement(concurrent_usage, "usage_date").text = datetime.now().strftime("%Y-%m-%d")
-    return concurrent_usage
-
-st.title("XML Record Generator for samp_eng_app_concurrent_usage.xml")
-
-num_records_input = st.text_input("Enter the number of records to generate", value="")
-
-if num_records_input.isdigit():
-    num_records = int(num_records_input)
-else:
-    num_records = 0
-
-if st.button("Generate XML"):
-    if num_records <= 0:
-        st.error("Please enter a valid number greater than 0.")
+# Reference rows are drawn for this many records at a time.
+BATCH_SIZE = 4096
+
+# The discovery columns a concurrent usage record takes, in the order of its discovery pick.
+DISCOVERY_COLUMNS = ("norm_product", "license_sys_id")
+
+# Records are stamped from one clock that formats each second once.
+CLOCK = GenerationClock()
+
+# Unseeded by default; generate_records(..., streams=RandomStreams(seed, table="concurrent_usage")) is reproducible.
+STREAMS = RandomStreams()
+
+def generate_unique_hash(streams=STREAMS):
+    """Returns a new 32-hex sys_id, guaranteed unique within this run (see sys_ids.py)."""
+    return streams.new_sys_id()
+
+def generate_record_values(denial_num, clock=CLOCK, date_window=None, discovery=None, streams=STREAMS,
+                           usage_date=None, concurrent_usage=None):
+    """
+    Returns the varying values of one concurrent usage record, in CONCURRENT_USAGE template slot order.
+
+    usage_date is today by default, or drawn from date_window (a clock.DateWindow).
+    discovery is the licensed discovery row as a tuple of DISCOVERY_COLUMNS values (see
+    reference_data.row_values); one is drawn here when omitted.
+    streams (seeding.RandomStreams) supplies every random draw.
+    usage_date and concurrent_usage override the drawn values (see pipeline.py).
+    """
+    if discovery is None:
+        #randomly select from csv files
+        discovery = next(DISCOVERY_TABLE.sample_values(1, streams.numpy("picks"), DISCOVERY_COLUMNS))
+
+    stamp = clock.stamp()
+    if usage_date is None:
+        usage_date = stamp.date if date_window is None else date_window.pick(streams.dates)
+    counts = streams.counts
+    if concurrent_usage is None:
+        concurrent_usage = counts.randint(1, 100)
+
+    return (
+        CON_USAGE_ID_TEMPLATE.format(denial_num + 100),
+        str(concurrent_usage),  # concurrent_usage
+        *discovery,
+        stamp.second,  # sys_created_on
+        generate_unique_hash(streams),  # sys_domain
+        generate_unique_hash(streams),  # sys_id
+        str(counts.randint(1, 100)),  # sys_mod_count
+        stamp.second,  # sys_updated_on
+        usage_date,
+    )
+
+
+def render_xml_record(denial_num, clock=CLOCK, date_window=None, streams=STREAMS):
+    """Renders one <samp_eng_app_concurrent_usage> record straight to an XML string."""
+    return CONCURRENT_USAGE.render(generate_record_values(denial_num, clock, date_window, streams=streams))
+
+
+def generate_xml_record(denial_num, clock=CLOCK, date_window=None, streams=STREAMS):
+    """Returns one <samp_eng_app_concurrent_usage> record as an ET.Element."""
+    return ET.fromstring(render_xml_record(denial_num, clock, date_window, streams))
+
+def generate_values(start, stop, clock=CLOCK, date_window=None, batch_size=BATCH_SIZE, streams=STREAMS):
+    """Yields the CONCURRENT_USAGE value tuples of the records numbered start..stop-1."""
+    pick, values = wrap("picks", DISCOVERY_TABLE.sample_values), wrap("values", generate_record_values)
+    for batch_start in range(start, stop, batch_size):
+        batch_stop = min(batch_start + batch_size, stop)
+        discoveries = pick(batch_stop - batch_start, streams.numpy("picks"), DISCOVERY_COLUMNS)
+        for i, discovery in zip(range(batch_start, batch_stop), discoveries):
+            yield values(i, clock, date_window, discovery, streams)
+
+def generate_records(start, stop, clock=CLOCK, date_window=None, batch_size=BATCH_SIZE, streams=STREAMS):
+    """Yields the records numbered start..stop-1, so shards of one run keep contiguous IDs."""
+    yield from map(wrap("render", CONCURRENT_USAGE.render), generate_values(start, stop, clock, date_window, batch_size, streams))
+
+if __name__ == "__main__":
+    import streamlit as st
+
+    from streamlit_jobs import show_job, start_job
+
+    st.title("XML Record Generator for samp_eng_app_concurrent_usage.xml")
+
+    num_records_input = st.text_input("Enter the number of records to generate", value="")
+
+    if num_records_input.isdigit():
+        num_records = int(num_records_input)
     else:
-        root = ET.Element("unload")
-        root.set("unload_date", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-        for i in range(1, num_records + 1):
-            record = generate_xml_record(i)
-            root.append(record)
-        xml_data = ET.tostring(root, encoding="utf-8").decode("utf-8")
-        st.code(xml_data, language="xml")
-        st.download_button(
-            label="Download XML",
-            data=xml_data,
-            file_name="samp_eng_app_concurrent_usage.xml",
-            mime="application/xml"
-        )
+        num_records = 0
+
+    date_window = None
+    if st.checkbox("Spread usage dates over a date window"):
+        window = st.date_input("Date window", value=(date.today() - timedelta(days=30), date.today()))
+        if len(window) == 2:
+            date_window = DateWindow(*window)
+
+    compress = st.checkbox("Gzip the download")
+    profile = st.sidebar.checkbox("Profile generation stages")
+    seed_input = st.text_input("Random seed (optional, for reproducible records)", value="")
+
+    if st.button("Generate XML"):
+        try:
+            seed = parse_seed(seed_input)
+        except ValueError as e:
+            st.error(str(e))
+            st.stop()
+        if num_records <= 0:
+            st.error("Please enter a valid number greater than 0.")
+        else:
+            records = generate_records(1, num_records + 1, date_window=date_window,
+                                       streams=RandomStreams(seed, table="concurrent_usage"))
+            start_job("concurrent_usage_job", records, num_records, "samp_eng_app_concurrent_usage.xml", compress,
+                      profile=profile)
+
+    show_job("concurrent_usage_job")
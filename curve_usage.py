@@ -0,0 +1,170 @@
+"""
+Curve-driven concurrent usage and denial records.
+
+Instead of a random concurrent_usage for a random license, every license gets a daily
+usage curve from graph.py's controlled model (ramp-up, two peaks held at the licensed
+quantity, denial windows at the peaks, a capped tail). Each day of each curve becomes
+one samp_eng_app_concurrent_usage record, and each day with denials becomes one
+samp_eng_app_denial record with that day's denial count.
+
+Examples:
+    python curve_usage.py --date-from 2024-01-01 --date-to 2024-12-31 -o history
+    python curve_usage.py --licenses my_discovery.csv --min-quantity 5 --max-quantity 200 --seed 3 --gzip
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+
+import numpy as np
+
+import concurrent_usage
+import data_generate
+from batch_generate import TABLES
+from clock import DATE_FORMAT, DateWindow, GenerationClock
+from graph import MIN_POINTS, controlled_series_batch
+from record_templates import CONCURRENT_USAGE, DENIAL
+from reference_data import load_table, row_values
+from seeding import RandomStreams
+from unload_writer import UnloadWriter
+
+
+def license_curves(licenses, date_window, min_quantity=40, max_quantity=100, rng=None):
+    """
+    Draw one controlled usage curve per license over the days of date_window.
+
+    Parameters:
+    licenses (list): Discovery rows (dicts with norm_product and license_sys_id).
+    date_window (clock.DateWindow): The days to cover; at least graph.MIN_POINTS of them.
+    min_quantity, max_quantity (int): Range of the licensed quantity drawn per license.
+    rng (np.random.Generator | int): Random generator or seed.
+
+    Returns:
+    tuple: (dates, quantity, usage, denial) with dates a list of "YYYY-MM-DD" strings,
+    quantity a (licenses,) array and usage/denial (licenses, days) arrays.
+    """
+    days = len(date_window)
+    if days < MIN_POINTS:
+        raise ValueError(f"The date window must cover at least {MIN_POINTS} days.")
+    if not 1 <= min_quantity <= max_quantity:
+        raise ValueError("The quantity range must satisfy 1 <= min_quantity <= max_quantity.")
+    rng = np.random.default_rng(rng)
+    quantity = rng.integers(min_quantity, max_quantity + 1, size=len(licenses))
+    usage, denial = controlled_series_batch(quantity, days, rng)
+    dates = [(date_window.start + timedelta(days=offset)).strftime(DATE_FORMAT) for offset in range(days)]
+    return dates, quantity, usage, denial
+
+
+def generate_curve_records(licenses, dates, usage, denial, clock=None, streams=None):
+    """
+    Yield ("concurrent_usage" | "denial", record) pairs for the curves of license_curves().
+
+    Records come license by license, day by day. Usage and denial counts are converted to
+    strings for a whole curve at once, and the user/group/server/type picks of the
+    denials are drawn per license in one batch.
+    """
+    clock = clock or GenerationClock()
+    streams = streams or RandomStreams()
+    usage_text = usage.astype(str)
+    usage_num = denial_num = 0
+    for row, license in enumerate(licenses):
+        usage_ref = row_values(license, concurrent_usage.DISCOVERY_COLUMNS)
+        for day, value in zip(dates, usage_text[row].tolist()):
+            usage_num += 1
+            values = concurrent_usage.generate_record_values(
+                usage_num, clock, discovery=usage_ref, streams=streams, usage_date=day, concurrent_usage=value)
+            yield "concurrent_usage", CONCURRENT_USAGE.render(values)
+
+        denied_days = np.flatnonzero(denial[row])
+        if not len(denied_days):
+            continue
+        picks = data_generate.pick_references(len(denied_days), streams)
+        discovery = row_values(license, data_generate.DISCOVERY_COLUMNS)
+        for day_index, (user, _, group, server, license_type) in zip(denied_days.tolist(), picks):
+            denial_num += 1
+            values = data_generate.generate_record_values(
+                denial_num, clock, picks=(user, discovery, group, server, license_type), streams=streams,
+                denial_date=dates[day_index], total_denial_count=int(denial[row, day_index]))
+            yield "denial", DENIAL.render(values)
+
+
+def write_curve_unloads(output_dir, date_window, licenses=None, min_quantity=40, max_quantity=100,
+                        compress=False, clock=None, streams=None):
+    """
+    Write curve-driven concurrent usage and denial unloads for every license.
+
+    Parameters:
+    output_dir (str): Directory for the two files (created if missing).
+    date_window (clock.DateWindow): Days of history to generate.
+    licenses (list): Discovery rows. Defaults to every row of discovery.csv.
+    min_quantity, max_quantity (int): Range of the licensed quantity per license.
+    compress (bool): Gzip the files.
+    clock (clock.GenerationClock): Clock records are stamped from. Defaults to now.
+    streams (seeding.RandomStreams): Random streams; the curves use its numpy "series" stream.
+
+    Returns:
+    dict: Table name -> (path, record count).
+    """
+    clock = clock or GenerationClock()
+    streams = streams or RandomStreams()
+    licenses = concurrent_usage.DISCOVERY_MODELS if licenses is None else licenses
+    if not licenses:
+        raise ValueError("No licenses to generate curves for.")
+    dates, _, usage, denial = license_curves(licenses, date_window, min_quantity, max_quantity,
+                                             streams.numpy("series"))
+
+    os.makedirs(output_dir, exist_ok=True)
+    suffix = ".gz" if compress else ""
+    tables = ("concurrent_usage", "denial")
+    paths = {table: os.path.join(output_dir, TABLES[table].file_name + suffix) for table in tables}
+    unload_date = clock.stamp().second
+    with UnloadWriter(paths["concurrent_usage"], unload_date, compress) as usage_writer, \
+            UnloadWriter(paths["denial"], unload_date, compress) as denial_writer:
+        writers = {"concurrent_usage": usage_writer, "denial": denial_writer}
+        for table, record in generate_curve_records(licenses, dates, usage, denial, clock, streams):
+            writers[table].write(record)
+    return {table: (paths[table], writers[table].count) for table in tables}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate daily concurrent usage and denials from usage curves.")
+    parser.add_argument("-o", "--output-dir", default=".", help="Directory for the two unload files")
+    parser.add_argument("--licenses",
+                        help="Discovery CSV listing the licenses (default: the reference data's discovery.csv)")
+    parser.add_argument("--date-from", help="First day (default: 365 days before the as-of date)")
+    parser.add_argument("--date-to", help="Last day (default: the as-of date)")
+    parser.add_argument("--as-of", help="Timestamp every record with this time (default: now)")
+    parser.add_argument("--min-quantity", type=int, default=40,
+                        help="Smallest licensed quantity; below 40 the band between the peaks narrows to fit")
+    parser.add_argument("--max-quantity", type=int, default=100, help="Largest licensed quantity")
+    parser.add_argument("--seed", type=int, help="Root seed for reproducible curves and records")
+    parser.add_argument("--gzip", action="store_true", help="Gzip the output files")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    clock = GenerationClock(args.as_of or time.strftime("%Y-%m-%d %H:%M:%S"))
+    date_to = args.date_to or clock.as_of
+    date_from = args.date_from or (clock.as_of - timedelta(days=365))
+    try:
+        # A file named on the command line is relative to the working directory, not the reference data.
+        licenses = (concurrent_usage.DISCOVERY_MODELS if args.licenses is None
+                    else load_table(os.path.abspath(args.licenses)).records())
+        started = time.perf_counter()
+        written = write_curve_unloads(args.output_dir, DateWindow(date_from, date_to), licenses,
+                                      args.min_quantity, args.max_quantity, args.gzip, clock,
+                                      RandomStreams(args.seed))
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    elapsed = time.perf_counter() - started
+    for table, (path, count) in written.items():
+        print(f"{table:<18}{count:>10,} records  {path}")
+    print(f"{len(licenses)} licenses in {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,111 +1,194 @@
-import streamlit as st
 import xml.etree.ElementTree as ET
-import random
-import hashlib
-from datetime import datetime
-import pandas as pd
+from datetime import date, timedelta
+from reference_data import EmptyDataError, ReferenceTable, load_table, report_error
+from seeding import RandomStreams, parse_seed
+from record_templates import DENIAL
+from clock import DateWindow, GenerationClock
+from instrumentation import wrap
 
 def load_data_from_csv(file_name):
+    """Returns the cached reference table for a CSV file (see reference_data.py)."""
     try:
-        data = pd.read_csv(file_name)
-        return data.to_dict(orient="records")
-    except (FileNotFoundError, pd.errors.EmptyDataError) as e:
-        st.error(f"Error loading CSV file: {e}")
-        return []
+        return load_table(file_name)
+    except (FileNotFoundError, EmptyDataError) as e:
+        report_error(f"Error loading CSV file: {e}")
+        return ReferenceTable.empty(file_name)
 
 
 # Usage:
-USER_NAMES = load_data_from_csv("user.csv")
-DISCOVERY_MODELS = load_data_from_csv("discovery.csv")
-GROUP_NAMES = load_data_from_csv("group.csv")
-LICENSE_SERVER_VALUES = load_data_from_csv("license_server.csv")
-LICENSE_TYPE_VALUES= load_data_from_csv("license_type.csv")
+USER_TABLE = load_data_from_csv("user.csv")
+USER_NAMES = USER_TABLE.records()
+DISCOVERY_TABLE = load_data_from_csv("discovery.csv")
+DISCOVERY_MODELS = DISCOVERY_TABLE.records()
+GROUP_TABLE = load_data_from_csv("group.csv")
+GROUP_NAMES = GROUP_TABLE.records()
+LICENSE_SERVER_TABLE = load_data_from_csv("license_server.csv")
+LICENSE_SERVER_VALUES = LICENSE_SERVER_TABLE.records()
+LICENSE_TYPE_TABLE = load_data_from_csv("license_type.csv")
+LICENSE_TYPE_VALUES = LICENSE_TYPE_TABLE.records()
 
 
 
 if not USER_NAMES:
-    st.error("No user names found. Ensure the 'user.csv' file exists and contains valid data.")
+    report_error("No user names found. Ensure the 'user.csv' file exists and contains valid data.")
 if not DISCOVERY_MODELS:
-    st.error("No discovery models found. Ensure the 'discovery.csv' file exists and contains valid data.")
+    report_error("No discovery models found. Ensure the 'discovery.csv' file exists and contains valid data.")
 if not GROUP_NAMES:
-    st.error("No group names found. Ensure the 'group.csv' file exists and contains valid data.")
+    report_error("No group names found. Ensure the 'group.csv' file exists and contains valid data.")
 if not LICENSE_SERVER_VALUES:
-    st.error("No license server found. Ensure the 'license_server.csv' file exists and contains valid data.")
+    report_error("No license server found. Ensure the 'license_server.csv' file exists and contains valid data.")
 if not LICENSE_TYPE_VALUES:
-    st.error("No license type found. Ensure the 'license_type.csv' file exists and contains valid data.")
+    report_error("No license type found. Ensure the 'license_type.csv' file exists and contains valid data.")
 
 
 # Other Fixed Values
 
 DENIAL_ID_TEMPLATE = "Denial {}"
 
-def generate_unique_hash():
-    """Generates a unique hash value to ensure each XML field requiring a hash is unique and randomized."""
-    return hashlib.md5(str(random.random()).encode()).hexdigest()
-
-def generate_xml_record(denial_num):
-    
-    #randomly select from csv files
-    users = random.choice(USER_NAMES)
-    discovery = random.choice(DISCOVERY_MODELS)
-    group = random.choice(GROUP_NAMES)
-    license_server = random.choice(LICENSE_SERVER_VALUES)
-    license_type = random.choice(LICENSE_TYPE_VALUES)
-
-    # Create the <samp_eng_app_denial> element with "INSERT_OR_UPDATE" action
-    denial = ET.Element("samp_eng_app_denial", action="INSERT_OR_UPDATE")
-    ET.SubElement(denial, "additional_key")
-    ET.SubElement(denial, "computer", display_value=users["computer_name"]).text = users["computer_sys_id"]
-    ET.SubElement(denial, "denial_date").text = datetime.now().strftime("%Y-%m-%d")
-    ET.SubElement(denial, "denial_id").text = DENIAL_ID_TEMPLATE.format(denial_num + 100)  # Offset by 100 to start at 101
-    ET.SubElement(denial, "discovery_model", display_value=discovery["discovery_model"]).text = discovery["discovery_sys_id"]
-    ET.SubElement(denial, "group", display_value=group["group"]).text = group["group_sys_id"]
-    ET.SubElement(denial, "is_product_normalized").text = "true"
-    ET.SubElement(denial, "last_denial_time").text = datetime.now().strftime("%Y-%m-%d %H:%M")
-    ET.SubElement(denial, "license_server", display_value=license_server["license_server"]).text = license_server["license_server_sys_id"]
-    ET.SubElement(denial, "license_type", display_value=license_type["license_type"]).text = license_type["license_type_sys_id"]
-    ET.SubElement(denial, "norm_product", display_value=discovery["norm_product"]).text = discovery["norm_product_sys_id"]
-    ET.SubElement(denial, "norm_publisher", display_value=discovery["norm_publisher"]).text = discovery["norm_publisher_sys_id"]
-    ET.SubElement(denial, "product").text = discovery["product"]
-    ET.SubElement(denial, "publisher").text = discovery["publisher"]
-    ET.SubElement(denial, "source").text = "OpeniT"
-    ET.SubElement(denial, "sys_created_by").text = "admin"
-    ET.SubElement(denial, "sys_created_on").text = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    ET.SubElement(denial, "sys_domain").text = generate_unique_hash()
-    ET.SubElement(denial, "sys_domain_path").text = "/"
-    ET.SubElement(denial, "sys_id").text = generate_unique_hash()
-    ET.SubElement(denial, "sys_mod_count").text = str(random.randint(1, 100))
-    ET.SubElement(denial, "sys_updated_by").text = "admin"
-    ET.SubElement(denial, "sys_updated_on").text = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    ET.SubElement(denial, "total_denial_count").text = str(random.randint(1, 10))
-    ET.SubElement(denial, "user", display_value=users["user"]).text = users["user_sys_id"]
-    ET.SubElement(denial, "version").text = "2020"
-    ET.SubElement(denial, "workstation", display_value=users["workstation"]).text = users["workstation_sys_id"]
-    return denial
-
-st.title("XML Record Generator for samp_eng_app_denial.xml")
-
-num_records_input = st.text_input("Enter the number of records to generate", value="")
-
-if num_records_input.isdigit():
-    num_records = int(num_records_input)
-else:
-    num_records = 0
-
-if st.button("Generate XML"):
-    if num_records <= 0:
-        st.error("Please enter a valid number greater than 0.")
+# Reference rows are drawn for this many records at a time.
+BATCH_SIZE = 4096
+
+# The reference columns a denial takes from each table, in the order of its picks.
+USER_COLUMNS = ("computer_name", "computer_sys_id", "user", "user_sys_id", "workstation", "workstation_sys_id")
+DISCOVERY_COLUMNS = ("discovery_model", "discovery_sys_id", "norm_product", "norm_product_sys_id",
+                     "norm_publisher", "norm_publisher_sys_id", "product", "publisher")
+GROUP_COLUMNS = ("group", "group_sys_id")
+LICENSE_SERVER_COLUMNS = ("license_server", "license_server_sys_id")
+LICENSE_TYPE_COLUMNS = ("license_type", "license_type_sys_id")
+
+# Records are stamped from one clock that formats each second once.
+CLOCK = GenerationClock()
+
+# Unseeded by default; generate_records(..., streams=RandomStreams(seed, table="denial")) is reproducible.
+STREAMS = RandomStreams()
+
+def generate_unique_hash(streams=STREAMS):
+    """Returns a new 32-hex sys_id, guaranteed unique within this run (see sys_ids.py)."""
+    return streams.new_sys_id()
+
+def pick_references(count, streams=STREAMS):
+    """
+    Draws the (user, discovery, group, license_server, license_type) picks for `count` records at once.
+
+    Each pick is a tuple of that table's *_COLUMNS values; a {column: value} row becomes
+    one with reference_data.row_values(row, USER_COLUMNS) etc.
+    """
+    rng = streams.numpy("picks")
+    return zip(
+        USER_TABLE.sample_values(count, rng, USER_COLUMNS),
+        DISCOVERY_TABLE.sample_values(count, rng, DISCOVERY_COLUMNS),
+        GROUP_TABLE.sample_values(count, rng, GROUP_COLUMNS),
+        LICENSE_SERVER_TABLE.sample_values(count, rng, LICENSE_SERVER_COLUMNS),
+        LICENSE_TYPE_TABLE.sample_values(count, rng, LICENSE_TYPE_COLUMNS),
+    )
+
+
+def generate_record_values(denial_num, clock=CLOCK, date_window=None, picks=None, streams=STREAMS,
+                           denial_date=None, total_denial_count=None):
+    """
+    Returns the varying values of one denial record, in DENIAL template slot order.
+
+    denial_date is today by default, or drawn from date_window (a clock.DateWindow).
+    picks is one tuple from pick_references(); reference rows are drawn here when omitted.
+    streams (seeding.RandomStreams) supplies every random draw.
+    denial_date and total_denial_count override the drawn values (see pipeline.py).
+    """
+    if picks is None:
+        #randomly select from csv files
+        picks = next(pick_references(1, streams))
+    users, discovery, group, license_server, license_type = picks
+    computer_name, computer_sys_id, user, user_sys_id, workstation, workstation_sys_id = users
+    (discovery_model, discovery_sys_id, norm_product, norm_product_sys_id,
+     norm_publisher, norm_publisher_sys_id, product, publisher) = discovery
+
+    stamp = clock.stamp()
+    if denial_date is None:
+        denial_date = stamp.date if date_window is None else date_window.pick(streams.dates)
+    counts = streams.counts
+    if total_denial_count is None:
+        total_denial_count = counts.randint(1, 10)
+
+    return (
+        computer_name, computer_sys_id,
+        denial_date,
+        DENIAL_ID_TEMPLATE.format(denial_num + 100),  # Offset by 100 to start at 101
+        discovery_model, discovery_sys_id,
+        *group,
+        denial_date + stamp.minute[10:],  # last_denial_time
+        *license_server,
+        *license_type,
+        norm_product, norm_product_sys_id,
+        norm_publisher, norm_publisher_sys_id,
+        product,
+        publisher,
+        stamp.second,  # sys_created_on
+        generate_unique_hash(streams),  # sys_domain
+        generate_unique_hash(streams),  # sys_id
+        str(counts.randint(1, 100)),  # sys_mod_count
+        stamp.second,  # sys_updated_on
+        str(total_denial_count),  # total_denial_count
+        user, user_sys_id,
+        workstation, workstation_sys_id,
+    )
+
+
+def render_xml_record(denial_num, clock=CLOCK, date_window=None, streams=STREAMS):
+    """Renders one <samp_eng_app_denial> record straight to an XML string."""
+    return DENIAL.render(generate_record_values(denial_num, clock, date_window, streams=streams))
+
+
+def generate_xml_record(denial_num, clock=CLOCK, date_window=None, streams=STREAMS):
+    """Returns one <samp_eng_app_denial> record as an ET.Element."""
+    return ET.fromstring(render_xml_record(denial_num, clock, date_window, streams))
+
+def generate_values(start, stop, clock=CLOCK, date_window=None, batch_size=BATCH_SIZE, streams=STREAMS):
+    """Yields the DENIAL value tuples of the records numbered start..stop-1."""
+    pick, values = wrap("picks", pick_references), wrap("values", generate_record_values)
+    for batch_start in range(start, stop, batch_size):
+        batch_stop = min(batch_start + batch_size, stop)
+        picks = pick(batch_stop - batch_start, streams)
+        for i, record_picks in zip(range(batch_start, batch_stop), picks):
+            yield values(i, clock, date_window, record_picks, streams)
+
+def generate_records(start, stop, clock=CLOCK, date_window=None, batch_size=BATCH_SIZE, streams=STREAMS):
+    """Yields the records numbered start..stop-1, so shards of one run keep contiguous IDs."""
+    yield from map(wrap("render", DENIAL.render), generate_values(start, stop, clock, date_window, batch_size, streams))
+
+if __name__ == "__main__":
+    import streamlit as st
+
+    from streamlit_jobs import show_job, start_job
+
+    st.title("XML Record Generator for samp_eng_app_denial.xml")
+
+    num_records_input = st.text_input("Enter the number of records to generate", value="")
+
+    if num_records_input.isdigit():
+        num_records = int(num_records_input)
     else:
-        root = ET.Element("unload")
-        root.set("unload_date", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-        for i in range(1, num_records + 1):
-            record = generate_xml_record(i)
-            root.append(record)
-        xml_data = ET.tostring(root, encoding="utf-8").decode("utf-8")
-        st.code(xml_data, language="xml")
-        st.download_button(
-            label="Download XML",
-            data=xml_data,
-            file_name="samp_eng_app_denial.xml",
-            mime="application/xml"
-        )
+        num_records = 0
+
+    date_window = None
+    if st.checkbox("Spread denial dates over a date window"):
+        window = st.date_input("Date window", value=(date.today() - timedelta(days=30), date.today()))
+        if len(window) == 2:
+            date_window = DateWindow(*window)
+
+    compress = st.checkbox("Gzip the download")
+    profile = st.sidebar.checkbox("Profile generation stages")
+    seed_input = st.text_input("Random seed (optional, for reproducible records)", value="")
+
+    if st.button("Generate XML"):
+        try:
+            seed = parse_seed(seed_input)
+        except ValueError as e:
+            st.error(str(e))
+            st.stop()
+        if num_records <= 0:
+            st.error("Please enter a valid number greater than 0.")
+        else:
+            records = generate_records(1, num_records + 1, date_window=date_window,
+                                       streams=RandomStreams(seed, table="denial"))
+            start_job("denial_job", records, num_records, "samp_eng_app_denial.xml", compress, profile=profile)
+
+    show_job("denial_job")
@@ -0,0 +1,244 @@
+"""
+Incremental (delta) unloads with persisted generation state.
+
+A state directory remembers, per table, the last record number, the as-of time of the
+last run and every emitted record. The first run writes the full unload. Each later run
+writes a delta file with only:
+- new records, numbered on from the last run (Denial 1101, 1102, ...);
+- INSERT_OR_UPDATE copies of a chosen fraction of existing records, with sys_mod_count
+  bumped and sys_updated_on set to the new as-of time.
+
+A run costs time in proportion to the change, not to the history.
+
+Emitted records are tracked in <table>.index, one fixed-size entry per record (raw
+sys_id, file number, byte offset and length of its latest version). An update therefore
+re-reads exactly one record from disk, and the index never has to be parsed into
+Python objects. For the same reason the unloads are written uncompressed: compress
+older files only once they can no longer receive updates.
+
+Examples:
+    python generation_state.py denial --state-dir feed -n 100000 --as-of 2024-12-01
+    python generation_state.py denial --state-dir feed -n 2000 --update-fraction 0.01 --as-of 2024-12-02
+"""
+import argparse
+import importlib
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from batch_generate import TABLES
+from clock import DateWindow, GenerationClock, SECOND_FORMAT
+from seeding import RandomStreams
+from unload_writer import UnloadWriter
+
+STATE_VERSION = 1
+STATE_FILE = "state.json"
+
+# One index entry per emitted record: where its latest version lives.
+INDEX_DTYPE = np.dtype([("sys_id", "V16"), ("file", "<u2"), ("offset", "<u8"), ("length", "<u4")])
+
+SYS_ID_PATTERN = re.compile(r"<sys_id>([0-9a-f]{32})</sys_id>")
+MOD_COUNT_PATTERN = re.compile(r"<sys_mod_count>(\d+)</sys_mod_count>")
+UPDATED_ON_PATTERN = re.compile(r"<sys_updated_on>[^<]*</sys_updated_on>")
+
+
+class GenerationState:
+    """
+    The persisted state of one state directory.
+
+    Parameters:
+    path (str): State directory (created on save).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tables = {}
+        state_file = os.path.join(path, STATE_FILE)
+        if os.path.exists(state_file):
+            with open(state_file, encoding="utf-8") as handle:
+                state = json.load(handle)
+            if state.get("version") != STATE_VERSION:
+                raise ValueError(f"{state_file} was written by an incompatible version.")
+            self.tables = state["tables"]
+
+    def table(self, table):
+        """Returns the state of one table: last_number, records, files and as_of."""
+        return self.tables.setdefault(table, {"last_number": 0, "records": 0, "files": [], "as_of": None})
+
+    def index_path(self, table):
+        return os.path.join(self.path, f"{table}.index")
+
+    def index(self, table, mode="r"):
+        """Memory-maps the table's index, trimmed to the records the state knows about."""
+        records = self.table(table)["records"]
+        if not records:
+            return np.zeros(0, dtype=INDEX_DTYPE)
+        return np.memmap(self.index_path(table), dtype=INDEX_DTYPE, mode=mode, shape=(records,))
+
+    def save(self):
+        """Writes state.json atomically."""
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = os.path.join(self.path, f"{STATE_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump({"version": STATE_VERSION, "tables": self.tables}, handle, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, STATE_FILE))
+
+
+def delta_file_name(table, run):
+    """File name of run number `run` (0 is the full unload), e.g. samp_eng_app_denial.delta0003.xml."""
+    file_name = TABLES[table].file_name
+    if run == 0:
+        return file_name
+    return f"{file_name[:-len('.xml')]}.delta{run:04d}.xml"
+
+
+def _read_record(handle, offset, length):
+    handle.seek(offset)
+    return handle.read(length).decode("utf-8")
+
+
+def bump_record(record, updated_on):
+    """Returns the record with sys_mod_count incremented and sys_updated_on replaced."""
+    record = MOD_COUNT_PATTERN.sub(lambda m: f"<sys_mod_count>{int(m.group(1)) + 1}</sys_mod_count>", record, 1)
+    return UPDATED_ON_PATTERN.sub(f"<sys_updated_on>{updated_on}</sys_updated_on>", record, 1)
+
+
+def run_delta(state, table, new_records, update_fraction=0.0, clock=None, streams=None, options=None):
+    """
+    Write the next unload of `table` and record it in `state`.
+
+    Parameters:
+    state (GenerationState): State to continue from; saved on success.
+    table (str): One of batch_generate.TABLES.
+    new_records (int): Records to add, numbered on from the last run.
+    update_fraction (float): Share of the existing records re-emitted as updates.
+    clock (clock.GenerationClock): The run's as-of clock; must not be before the last run's.
+    streams (seeding.RandomStreams): Random streams for new records and the update sample.
+    options (dict): Extra keyword arguments for the table's generate_records.
+
+    Returns:
+    tuple: (path of the written file, new record count, update count).
+    """
+    clock = clock or GenerationClock(time.strftime(SECOND_FORMAT))
+    streams = streams or RandomStreams()
+    if not 0 <= update_fraction <= 1:
+        raise ValueError("The update fraction must be between 0 and 1.")
+    table_state = state.table(table)
+    as_of = clock.stamp().second
+    if table_state["as_of"] and as_of < table_state["as_of"]:
+        raise ValueError(f"The as-of time {as_of} is before the last run's ({table_state['as_of']}).")
+
+    run = len(table_state["files"])
+    if run >= np.iinfo(INDEX_DTYPE["file"]).max:
+        raise ValueError("Too many delta files for one state directory.")
+    file_name = delta_file_name(table, run)
+    os.makedirs(state.path, exist_ok=True)
+    path = os.path.join(state.path, file_name)
+
+    existing = table_state["records"]
+    update_count = round(existing * update_fraction)
+    updates = np.sort(np.asarray(streams.stream("updates").sample(range(existing), update_count), dtype=np.int64))
+
+    start = table_state["last_number"] + 1
+    module = importlib.import_module(TABLES[table].module)
+    records = module.generate_records(start, start + new_records, clock=clock, streams=streams, **(options or {}))
+
+    new_entries = np.zeros(new_records, dtype=INDEX_DTYPE)
+    moved = np.zeros(update_count, dtype=INDEX_DTYPE)
+    with UnloadWriter(path, unload_date=as_of) as writer:
+        for k, record in enumerate(records):
+            offset = writer.bytes_written
+            writer.write(record)
+            new_entries[k] = (bytes.fromhex(SYS_ID_PATTERN.search(record).group(1)), run, offset,
+                              writer.bytes_written - offset)
+
+        if update_count:
+            index = state.index(table)
+            entries = index[updates]
+            # Read each file's records in offset order, one open file at a time.
+            order = np.lexsort((entries["offset"], entries["file"]))
+            current_file, handle = None, None
+            try:
+                for position in order.tolist():
+                    entry = entries[position]
+                    if entry["file"] != current_file:
+                        if handle is not None:
+                            handle.close()
+                        current_file = int(entry["file"])
+                        handle = open(os.path.join(state.path, table_state["files"][current_file]), "rb")
+                    record = bump_record(_read_record(handle, int(entry["offset"]), int(entry["length"])), as_of)
+                    offset = writer.bytes_written
+                    writer.write(record)
+                    moved[position] = (entry["sys_id"], run, offset, writer.bytes_written - offset)
+            finally:
+                if handle is not None:
+                    handle.close()
+            del index
+
+    # The file is complete: append the new entries, repoint the updated ones, then save.
+    with open(state.index_path(table), "r+b" if existing else "wb") as handle:
+        handle.truncate(existing * INDEX_DTYPE.itemsize)
+        handle.seek(0, os.SEEK_END)
+        handle.write(new_entries.tobytes())
+    if update_count:
+        index = np.memmap(state.index_path(table), dtype=INDEX_DTYPE, mode="r+", shape=(existing,))
+        index[updates] = moved
+        index.flush()
+        del index
+
+    table_state["last_number"] = start + new_records - 1
+    table_state["records"] = existing + new_records
+    table_state["files"].append(file_name)
+    table_state["as_of"] = as_of
+    state.save()
+    return path, new_records, update_count
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Write the next full or delta unload of a table.")
+    parser.add_argument("table", choices=sorted(TABLES), help="Table to extend")
+    parser.add_argument("--state-dir", required=True, help="Directory holding state.json, the index and the unloads")
+    parser.add_argument("-n", "--num-records", type=int, default=0, help="New records to add")
+    parser.add_argument("--update-fraction", type=float, default=0.0,
+                        help="Share of existing records to re-emit as updates (e.g. 0.01)")
+    parser.add_argument("--as-of", help="As-of time of this run (default: now); dates of new records follow it")
+    parser.add_argument("--date-from", help="Spread new records' dates from this day (e.g. for the first, full run)")
+    parser.add_argument("--date-to", help="Last day of that spread (default: the as-of date)")
+    parser.add_argument("--seed", type=int, help="Root seed; combined with the run number")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.num_records < 0:
+        print("The number of records must not be negative.", file=sys.stderr)
+        return 2
+    state = GenerationState(args.state_dir)
+    run = len(state.table(args.table)["files"])
+    # Each run gets its own streams, so run k of a seeded feed is reproducible on its own.
+    streams = RandomStreams(args.seed, run, args.table) if args.seed is not None else RandomStreams()
+    clock = GenerationClock(args.as_of or time.strftime(SECOND_FORMAT))
+    options = {}
+    started = time.perf_counter()
+    try:
+        if args.date_from:
+            if args.table == "license":
+                raise ValueError("License records have no date to spread.")
+            options["date_window"] = DateWindow(args.date_from, args.date_to or clock.as_of)
+        path, added, updated = run_delta(state, args.table, args.num_records, args.update_fraction, clock, streams,
+                                         options)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    table_state = state.table(args.table)
+    print(f"Wrote {added:,} new and {updated:,} updated {args.table} records to {path} "
+          f"in {time.perf_counter() - started:.1f}s ({table_state['records']:,} records in total)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,133 @@
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
 
-def generate_controlled_data(start_date, end_date, max_quantity, num_points=100):
+from instrumentation import stage
+
+# pandas is imported by the DataFrame helpers and matplotlib by the demo below, so
+# importing the series model (e.g. from curve_usage.py) only costs numpy.
+
+MIN_POINTS = 26  # room for the first peak, the second peak and its 17-point tail
+
+# The ramp, both peaks and the 10 restricted days after the second peak end by this point.
+HEAD_POINTS = 8 + 29 + 11
+
+# Usage between the peaks is drawn within this distance of half the maximum quantity.
+BAND_SPREAD = 20
+
+
+def _clamped_walks(start, steps, low, high, block=512):
+    """
+    Compute walk[:, i] = clip(walk[:, i-1] + steps[:, i], low[:, i], high[:, i]) for every
+    row at once, with walk[:, -1] = start.
+
+    One step x -> clip(x + a, l, h) composed with the next is again of that form:
+    clip(clip(x + a1, l1, h1) + a2, l2, h2) = clip(x + a1 + a2, clip(l1 + a2, l2, h2), clip(h1 + a2, l2, h2)).
+    So each block of columns is a prefix scan of (a, l, h) triples, log2(block) array
+    passes over all rows, after which every point is one clip of the value carried in.
+    The cost does not depend on how often the walk hits its bounds. The scan runs in
+    int32 when the bounds and a block's step sums fit.
+
+    Parameters:
+    start (array-like): Value before the first step, one per row.
+    steps (np.ndarray): Integer steps of shape (rows, points).
+    low, high (array-like): Bounds, broadcastable to steps' shape, with low <= high.
+
+    Returns:
+    np.ndarray: int64 walk of steps' shape.
+    """
+    rows, points = steps.shape
+    walk = np.empty(steps.shape, dtype=np.int64)
+    if not points:
+        return walk
+    low, high = np.broadcast_to(low, steps.shape), np.broadcast_to(high, steps.shape)
+    largest = max(np.abs(low).max(), np.abs(high).max(), np.abs(start).max(), np.abs(steps).max() * block)
+    dtype = np.int32 if 2 * largest < np.iinfo(np.int32).max else np.int64
+    current = np.broadcast_to(np.asarray(start, dtype=dtype), (rows,))
+    for position in range(0, points, block):
+        columns = slice(position, min(position + block, points))
+        shift = steps[:, columns].astype(dtype)
+        lower, upper = low[:, columns].astype(dtype), high[:, columns].astype(dtype)
+        width = 1
+        while width < shift.shape[1]:
+            # Compose the prefix ending `width` columns back with the steps since.
+            added, bound_low, bound_high = shift[:, width:], lower[:, width:], upper[:, width:]
+            new_lower = lower[:, :-width] + added
+            np.minimum(np.maximum(new_lower, bound_low, out=new_lower), bound_high, out=new_lower)
+            new_upper = upper[:, :-width] + added
+            np.minimum(np.maximum(new_upper, bound_low, out=new_upper), bound_high, out=new_upper)
+            added += shift[:, :-width]
+            bound_low[...], bound_high[...] = new_lower, new_upper
+            width *= 2
+        out = walk[:, columns]
+        np.add(current[:, None], shift, out=out)
+        np.minimum(np.maximum(out, lower, out=out), upper, out=out)
+        current = out[:, -1].astype(dtype)
+    return walk
+
+
+def _controlled_series(max_quantities, num_points, rng):
+    """
+    Returns the usage and denial arrays, shaped (series, num_points), of one controlled
+    series per max quantity (see generate_controlled_data).
+
+    Every stage is drawn for all series at once. The ragged per-series windows (ramp,
+    band between the peaks, peaks, restricted days) all lie in the first HEAD_POINTS
+    columns and are placed with column masks; only the free walk after them spans the
+    whole series.
+    """
+    if num_points < MIN_POINTS:
+        raise ValueError(f"num_points must be at least {MIN_POINTS}.")
+    max_quantities = np.asarray(max_quantities, dtype=np.int64)
+    count = len(max_quantities)
+    quantity = max_quantities[:, None]
+    head = min(num_points, HEAD_POINTS)
+    columns = np.arange(head)
+    usage = np.zeros((count, num_points), dtype=np.int64)
+    denial = np.zeros((count, num_points), dtype=np.int64)
+    head_usage, head_denial = usage[:, :head], denial[:, :head]
+
+    # Generate the first peak after 5-8 days
+    first_peak_day = rng.integers(5, 9, size=(count, 1))
+    # Generate the second peak 20-29 days after the first peak
+    second_peak_day = first_peak_day + rng.integers(20, 30, size=(count, 1))
+    # Ensure space for 10 days post-peak
+    second_peak_day = np.where(second_peak_day >= num_points - 16, num_points - 17, second_peak_day)
+
+    # Gradually increase usage before the first peak: random 5-40 steps, capped at max_quantity
+    ramp = np.minimum(np.cumsum(rng.integers(5, 41, size=(count, head)), axis=1), quantity)
+    np.copyto(head_usage, ramp, where=columns < first_peak_day)
+    # Usage between peaks ranges around half the maximum quantity ± 20, narrowed to ± half
+    # the quantity below 40 so the band stays within 0..max_quantity
+    spread = np.minimum(BAND_SPREAD, quantity // 2)
+    band = quantity // 2 + rng.integers(-spread, spread + 1, size=(count, head))
+    np.copyto(head_usage, band, where=(columns >= first_peak_day) & (columns < second_peak_day))
+
+    # Keep usage at the peak and record 3-5 denials a day for 3-6 days from each peak
+    for peak in (first_peak_day, second_peak_day):
+        window = (columns >= peak) & (columns < peak + rng.integers(3, 7, size=(count, 1)))
+        np.copyto(head_usage, quantity, where=window)
+        np.copyto(head_denial, rng.integers(3, 6, size=(count, head)), where=window)
+
+    # After the second peak usage drifts by -10..9 a step: kept below max_quantity for
+    # 10 days, then allowed back up to it. The head walk runs from the earliest second
+    # peak; up to a series' own second peak it is pinned to the values already placed.
+    start = int(second_peak_day.min())
+    pinned = columns[start:] <= second_peak_day
+    restricted = columns[start:] <= second_peak_day + 10
+    steps = np.where(pinned, 0, rng.integers(-10, 10, size=(count, head - start)))
+    low = np.where(pinned, head_usage[:, start:], 0)
+    high = np.where(pinned, head_usage[:, start:], np.where(restricted, quantity - 1, quantity))
+    head_usage[:, start:] = _clamped_walks(0, steps, low, high)
+    if num_points > head:
+        steps = rng.integers(-10, 10, size=(count, num_points - head))
+        usage[:, head:] = _clamped_walks(head_usage[:, -1], steps, 0, quantity)
+    return usage, denial
+
+
+def generate_controlled_data(start_date, end_date, max_quantity, num_points=100, rng=None):
     """
     Generate data with controlled peaks and denial periods.
     Usage increases randomly by 5–40 units before reaching each peak.
-    Usage between peaks ranges from half the maximum quantity ±20.
+    Usage between peaks ranges from half the maximum quantity ±20 (± half of it below 40).
     Usage does not reach the maximum quantity for 10 days after the second peak.
 
     Parameters:
@@ -14,100 +135,112 @@ def generate_controlled_data(start_date, end_date, max_quantity, num_points=100)
     end_date (str): End date in 'YYYY-MM-DD' format.
     max_quantity (int): Maximum value for the quantity and usage.
     num_points (int): Total number of data points.
+    rng (np.random.Generator | int): Random generator, or a seed for one. Defaults to a fresh one.
 
     Returns:
     pd.DataFrame: Generated dataset with Date, Quantity, Usage, and Denial columns.
     """
+    import pandas as pd
+
+    rng = np.random.default_rng(rng)
     # Generate dates
-    date_range = pd.date_range(start=start_date, end=end_date, periods=num_points)
-    
-    # Initialize usage and denial lists
-    usage = [0] * num_points
-    denial = [0] * num_points  # Initialize denial data with zeros
-    
-    # Generate the first peak after 5-8 days
-    first_peak_day = np.random.randint(5, 9)
-    # Generate the second peak 5-10 days after the first peak
-    second_peak_day = first_peak_day + np.random.randint(20, 30)
-    if second_peak_day >= num_points - 16:  # Ensure space for 10 days post-peak
-        second_peak_day = num_points - 17
-    
-    # Peak positions
-    peaks = [first_peak_day, second_peak_day]
-    
-    # Random incremental logic
-    def random_increment(start, peak_day):
-        """Generate random increments from start to the peak day."""
-        increments = []
-        current = start
-        for _ in range(peak_day):
-            step = np.random.randint(5, 41)  # Random increment between 5 and 40
-            current = min(current + step, max_quantity)  # Cap at max_quantity
-            increments.append(current)
-        return increments
-
-    # Generate random usage between peaks
-    def random_between_peaks(length, base):
-        """Generate random values within the range base ± 20."""
-        return [base + np.random.randint(-20, 21) for _ in range(length)]
-    
-    # Gradually increase usage before peaks
-    usage[:peaks[0]] = random_increment(0, peaks[0])
-    usage[peaks[0]:peaks[1]] = random_between_peaks(peaks[1] - peaks[0], max_quantity // 2)
-    
-    # Generate peak and denial data
-    for i in range(num_points):
-        if i in peaks:
-            # Add denial data after each peak
-            denial_duration = np.random.randint(3, 7)  # Randomly choose 3-6 days for denials
-            for j in range(denial_duration):
-                if i + j < num_points:
-                    usage[i + j] = max_quantity  # Keep usage at peak for denial days
-                    denial[i + j] = np.random.randint(3, 6)  # Random denial count (3-5 per day)
-        elif peaks[1] < i <= peaks[1] + 10:  # 10 days after the second peak
-            # Ensure usage does not reach max_quantity
-            fluctuation = np.random.randint(-10, 10)
-            prev_usage = usage[i - 1] if i > 0 else max_quantity // 2
-            usage[i] = max(0, min(max_quantity - 1, prev_usage + fluctuation))  # Keep below max_quantity
-        elif i > peaks[1] + 10:  # After the 10-day restricted period
-            # Allow usage to fluctuate randomly
-            fluctuation = np.random.randint(-10, 10)
-            prev_usage = usage[i - 1] if i > 0 else max_quantity // 2
-            usage[i] = max(0, min(max_quantity, prev_usage + fluctuation))  # Ensure within bounds
+    with stage("graph_dates"):
+        date_range = pd.date_range(start=start_date, end=end_date, periods=num_points)
+    with stage("graph_series"):
+        usage, denial = _controlled_series([max_quantity], num_points, rng)
+        usage, denial = usage[0], denial[0]
 
     # Create DataFrame
-    data = pd.DataFrame({
-        "Date": date_range,
-        "Quantity": max_quantity,
-        "Usage": usage,
-        "Denial": denial
-    })
-    
+    with stage("graph_frame"):
+        data = pd.DataFrame({
+            "Date": date_range,
+            "Quantity": max_quantity,
+            "Usage": usage,
+            "Denial": denial
+        })
+
+    return data
+
+
+def controlled_series_batch(max_quantities, num_points, rng=None):
+    """
+    Draw one controlled series per max quantity, without building a DataFrame.
+
+    Parameters:
+    max_quantities (array-like): Maximum quantity of each series.
+    num_points (int): Number of data points per series.
+    rng (np.random.Generator | int): Random generator, or a seed for one. Defaults to a fresh one.
+
+    Returns:
+    tuple: (usage, denial) int64 arrays of shape (series, num_points).
+    """
+    rng = np.random.default_rng(rng)
+    with stage("graph_series"):
+        return _controlled_series(max_quantities, num_points, rng)
+
+
+def generate_controlled_batch(start_date, end_date, series, num_points=100, rng=None):
+    """
+    Generate many controlled series over the same dates in one long-format frame.
+
+    Parameters:
+    start_date (str): Start date in 'YYYY-MM-DD' format.
+    end_date (str): End date in 'YYYY-MM-DD' format.
+    series (pd.DataFrame | list[dict]): One row per series (e.g. product × server) with a
+        max_quantity column; every other column is repeated onto that series' points.
+    num_points (int): Number of data points per series.
+    rng (np.random.Generator | int): Random generator, or a seed for one. Defaults to a fresh one.
+
+    Returns:
+    pd.DataFrame: The series' key columns followed by Date, Quantity, Usage and Denial,
+    num_points rows per series, series after series.
+    """
+    import pandas as pd
+
+    series = pd.DataFrame(series).reset_index(drop=True)
+    if "max_quantity" not in series.columns:
+        raise ValueError("series must have a max_quantity column.")
+    date_range = pd.date_range(start=start_date, end=end_date, periods=num_points)
+    max_quantities = series["max_quantity"].to_numpy(dtype=np.int64)
+    usage, denial = controlled_series_batch(max_quantities, num_points, rng)
+
+    with stage("graph_frame"):
+        keys = series.drop(columns="max_quantity")
+        data = pd.DataFrame({column: np.repeat(keys[column].to_numpy(), num_points) for column in keys.columns})
+        data["Date"] = np.tile(date_range.to_numpy(), len(series))
+        data["Quantity"] = np.repeat(max_quantities, num_points)
+        data["Usage"] = usage.ravel()
+        data["Denial"] = denial.ravel()
     return data
 
-# Parameters
-start_date = "2024-11-01"
-end_date = "2024-12-30"
-max_quantity = 100
-
-# Generate controlled data
-data = generate_controlled_data(start_date, end_date, max_quantity)
-
-# Save the data
-data.to_csv("generated_graph_data.csv", index=False)
-print("Data saved to generated_graph_data.csv")
-
-# Display the data
-print(data.head())  # Print the first few rows of the dataframe
-
-# Plotting the data
-plt.figure(figsize=(12, 6))
-plt.plot(data["Date"], data["Quantity"], label="Quantity (Max)", linestyle="--", color="grey")
-plt.plot(data["Date"], data["Usage"], label="Usage", marker="o")
-plt.scatter(data["Date"], data["Denial"], label="Denial", color="red")
-plt.title("Controlled Data with Post-Second Peak Restrictions")
-plt.xlabel("Date")
-plt.ylabel("Value")
-plt.legend()
-plt.grid()
-plt.show()
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
+    # Parameters
+    start_date = "2024-11-01"
+    end_date = "2024-12-30"
+    max_quantity = 100
+
+    # Generate controlled data
+    data = generate_controlled_data(start_date, end_date, max_quantity)
+
+    # Save the data
+    with stage("graph_save_csv"):
+        data.to_csv("generated_graph_data.csv", index=False)
+    print("Data saved to generated_graph_data.csv")
+
+    # Display the data
+    print(data.head())  # Print the first few rows of the dataframe
+
+    # Plotting the data (run with DATA_GENERATE_PROFILE=1 for a per-stage summary)
+    with stage("graph_plot"):
+        plt.figure(figsize=(12, 6))
+        plt.plot(data["Date"], data["Quantity"], label="Quantity (Max)", linestyle="--", color="grey")
+        plt.plot(data["Date"], data["Usage"], label="Usage", marker="o")
+        plt.scatter(data["Date"], data["Denial"], label="Denial", color="red")
+        plt.title("Controlled Data with Post-Second Peak Restrictions")
+        plt.xlabel("Date")
+        plt.ylabel("Value")
+        plt.legend()
+        plt.grid()
+    plt.show()
@@ -0,0 +1,236 @@
+"""
+Per-stage timing and memory instrumentation for generation runs.
+
+Stages are named phases of a run: loading reference data, drawing picks, issuing
+sys_ids, formatting timestamps, building record values, rendering and writing records,
+building graph series. Each stage records its number of calls, inclusive wall time and
+the tracemalloc peak reached above the memory in use when it started.
+
+Instrumentation is off unless a Profiler is active, and costs next to nothing when
+off: stage() hands out one shared no-op context manager, and wrap(), called once per
+run, returns the function unchanged. Hot per-record functions are wrapped; batch-level
+work (reference loads, sys_id blocks, new timestamps) uses stage().
+
+A Profiler is activated for the current thread with profiling(), or for the whole
+process by setting DATA_GENERATE_PROFILE=1 (or =time to skip tracemalloc); the summary
+is then printed at exit.
+
+Example:
+    profiler = Profiler()
+    with profiling(profiler):
+        writer.write_all(data_generate.generate_records(1, 100001))
+    profiler.add_records(100000)
+    print(profiler.summary())
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+PROFILE_ENV = "DATA_GENERATE_PROFILE"
+
+_NO_STAGE = nullcontext()
+_local = threading.local()
+_process_profiler = None
+
+
+class Profiler:
+    """
+    Collects per-stage statistics.
+
+    Parameters:
+    memory (bool): Also trace allocations with tracemalloc (slower, but gives peaks).
+    """
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.stages = {}   # name -> [calls, seconds, peak_bytes]
+        self.records = 0
+        self.elapsed = 0.0
+        self._started = None
+        self._owns_tracing = False
+        self._frames = threading.local()
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracing = True
+
+    def stop(self):
+        if self._started is not None:
+            self.elapsed += time.perf_counter() - self._started
+            self._started = None
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+
+    def add_records(self, count):
+        """Counts records produced, for the overall records/s."""
+        self.records += count
+
+    def _stack(self):
+        stack = getattr(self._frames, "stack", None)
+        if stack is None:
+            stack = self._frames.stack = []
+        return stack
+
+    def _enter(self):
+        # frame: [started, memory in use at entry, highest peak seen in nested stages]
+        base = 0
+        if self.memory and tracemalloc.is_tracing():
+            base, peak = tracemalloc.get_traced_memory()
+            stack = self._stack()
+            if stack:
+                # Resetting the peak below would lose the enclosing stage's peak so far.
+                stack[-1][2] = max(stack[-1][2], peak)
+            tracemalloc.reset_peak()
+        frame = [time.perf_counter(), base, 0]
+        self._stack().append(frame)
+        return frame
+
+    def _exit(self, name, frame):
+        elapsed = time.perf_counter() - frame[0]
+        stack = self._stack()
+        stack.pop()
+        peak = 0
+        if self.memory and tracemalloc.is_tracing():
+            peak = max(tracemalloc.get_traced_memory()[1], frame[2])
+            if stack:
+                stack[-1][2] = max(stack[-1][2], peak)
+            peak -= frame[1]
+        stats = self.stages.get(name)
+        if stats is None:
+            self.stages[name] = [1, elapsed, peak]
+        else:
+            stats[0] += 1
+            stats[1] += elapsed
+            if peak > stats[2]:
+                stats[2] = peak
+
+    @contextmanager
+    def stage(self, name):
+        """Times the enclosed block as one call of stage `name`."""
+        frame = self._enter()
+        try:
+            yield
+        finally:
+            self._exit(name, frame)
+
+    def wrap(self, name, func):
+        """Returns func timed as stage `name` on every call."""
+        def timed(*args, **kwargs):
+            frame = self._enter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._exit(name, frame)
+        return timed
+
+    def merge(self, report):
+        """Adds the stages and records of another profiler's to_dict() (e.g. from a worker process)."""
+        for name, stats in report["stages"].items():
+            mine = self.stages.setdefault(name, [0, 0.0, 0])
+            mine[0] += stats["calls"]
+            mine[1] += stats["seconds"]
+            mine[2] = max(mine[2], stats["peak_bytes"])
+        self.records += report["records"]
+
+    def to_dict(self):
+        """Returns a JSON-serializable report."""
+        elapsed = self.elapsed + (time.perf_counter() - self._started if self._started is not None else 0.0)
+        return {
+            "records": self.records,
+            "seconds": elapsed,
+            "records_per_second": self.records / elapsed if elapsed and self.records else None,
+            "memory": self.memory,
+            "stages": {
+                name: {
+                    "calls": calls,
+                    "seconds": seconds,
+                    "calls_per_second": calls / seconds if seconds else None,
+                    "peak_bytes": peak,
+                }
+                for name, (calls, seconds, peak) in sorted(self.stages.items(), key=lambda item: -item[1][1])
+            },
+        }
+
+    def rows(self):
+        """Returns one dict per stage, slowest first, for tables."""
+        return [
+            {
+                "stage": name,
+                "calls": stats["calls"],
+                "seconds": round(stats["seconds"], 4),
+                "calls/s": round(stats["calls_per_second"]) if stats["calls_per_second"] else None,
+                "peak MB": round(stats["peak_bytes"] / 1e6, 2) if self.memory else None,
+            }
+            for name, stats in self.to_dict()["stages"].items()
+        ]
+
+    def summary(self):
+        """Returns a plain-text table of the stages, slowest first."""
+        report = self.to_dict()
+        lines = [f"{'stage':<24}{'calls':>12}{'seconds':>10}{'calls/s':>14}{'peak MB':>10}"]
+        for name, stats in report["stages"].items():
+            rate = f"{stats['calls_per_second']:,.0f}" if stats["calls_per_second"] else "-"
+            peak = f"{stats['peak_bytes'] / 1e6:.2f}" if self.memory else "-"
+            lines.append(f"{name:<24}{stats['calls']:>12,}{stats['seconds']:>10.3f}{rate:>14}{peak:>10}")
+        total = f"{report['seconds']:.2f}s"
+        if report["records"]:
+            total = f"{report['records']:,} records in {total} ({report['records_per_second']:,.0f} records/s)"
+        lines.append(total + "; stage times include nested stages")
+        return "\n".join(lines)
+
+
+def current():
+    """Returns the Profiler active for this thread (or the process), or None."""
+    return getattr(_local, "profiler", None) or _process_profiler
+
+
+def stage(name):
+    """Context manager timing a block as stage `name`; a shared no-op when profiling is off."""
+    profiler = getattr(_local, "profiler", None) or _process_profiler
+    if profiler is None:
+        return _NO_STAGE
+    return profiler.stage(name)
+
+
+def wrap(name, func):
+    """Returns func timed as stage `name` when profiling is on, else func itself."""
+    profiler = current()
+    return func if profiler is None else profiler.wrap(name, func)
+
+
+@contextmanager
+def profiling(profiler):
+    """Activates profiler for the current thread while the block runs."""
+    previous = getattr(_local, "profiler", None)
+    _local.profiler = profiler
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _local.profiler = previous
+
+
+def write_report(profiler, path):
+    """Writes profiler.to_dict() as JSON."""
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(profiler.to_dict(), handle, indent=2)
+
+
+def _enable_from_env():
+    global _process_profiler
+    if os.environ.get(PROFILE_ENV, "") not in ("", "0"):
+        _process_profiler = Profiler(memory=os.environ.get(PROFILE_ENV) != "time")
+        _process_profiler.start()
+        atexit.register(lambda: print(_process_profiler.summary(), file=sys.stderr))
+
+
+_enable_from_env()
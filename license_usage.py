@@ -1,147 +1,540 @@
-import streamlit as st
 import xml.etree.ElementTree as ET
-import hashlib
+from collections import namedtuple
 from datetime import datetime
-import pandas as pd
+from functools import lru_cache
+from itertools import repeat
+from reference_data import EmptyDataError, ReferenceTable, load_table, report_error
+from seeding import RandomStreams, parse_seed
+from record_templates import LICENSE
+from clock import DateWindow, GenerationClock
+from instrumentation import stage, wrap
+import math
 import random
 
 
 def load_data_from_csv(file_name):
+    """Returns the cached reference table for a CSV file (see reference_data.py)."""
     try:
-        data = pd.read_csv(file_name)
-        return data.to_dict(orient="records")
-    except (FileNotFoundError, pd.errors.EmptyDataError) as e:
-        st.error(f"Error loading CSV file: {e}")
-        return []
+        return load_table(file_name)
+    except (FileNotFoundError, EmptyDataError) as e:
+        report_error(f"Error loading CSV file: {e}")
+        return ReferenceTable.empty(file_name)
 
 current_date = datetime.now()
 incremented_date = current_date.replace(year=current_date.year + 10)
+END_DATE = incremented_date.strftime("%Y-%m-%d %H:%M:%S")
+
+# Records are stamped from one clock that formats each second once.
+CLOCK = GenerationClock()
+
+# Unseeded by default; generate_records(..., streams=RandomStreams(seed, table="license")) is reproducible.
+STREAMS = RandomStreams()
 
 # Usage:
-USER_NAMES = load_data_from_csv("user.csv")
-DISCOVERY_MODELS = load_data_from_csv("discovery.csv")
-GROUP_NAMES = load_data_from_csv("group.csv")
-LICENSE_SERVER_VALUES = load_data_from_csv("license_server.csv")
-LICENSE_TYPE_VALUES = load_data_from_csv("license_type.csv")
-SOFTWARE_INSTALL = load_data_from_csv("software_install.csv")
+DISCOVERY_TABLE = load_data_from_csv("discovery.csv")
+DISCOVERY_MODELS = DISCOVERY_TABLE.records()
+LICENSE_SERVER_TABLE = load_data_from_csv("license_server.csv")
+LICENSE_SERVER_VALUES = LICENSE_SERVER_TABLE.records()
+LICENSE_TYPE_TABLE = load_data_from_csv("license_type.csv")
+LICENSE_TYPE_VALUES = LICENSE_TYPE_TABLE.records()
+SOFTWARE_INSTALL_TABLE = load_data_from_csv("software_install.csv")
+SOFTWARE_INSTALL = SOFTWARE_INSTALL_TABLE.records()
 
 
-if not USER_NAMES:
-    st.error("No user names found. Ensure the 'user.csv' file exists and contains valid data.")
 if not DISCOVERY_MODELS:
-    st.error("No discovery models found. Ensure the 'discovery.csv' file exists and contains valid data.")
-if not GROUP_NAMES:
-    st.error("No group names found. Ensure the 'group.csv' file exists and contains valid data.")
+    report_error("No discovery models found. Ensure the 'discovery.csv' file exists and contains valid data.")
 if not LICENSE_SERVER_VALUES:
-    st.error("No license server found. Ensure the 'license_server.csv' file exists and contains valid data.")
+    report_error("No license server found. Ensure the 'license_server.csv' file exists and contains valid data.")
 if not LICENSE_TYPE_VALUES:
-    st.error("No license type found. Ensure the 'license_type.csv' file exists and contains valid data.")
+    report_error("No license type found. Ensure the 'license_type.csv' file exists and contains valid data.")
+
+
+def generate_unique_hash(streams=STREAMS):
+    """Returns a new 32-hex sys_id, guaranteed unique within this run (see sys_ids.py)."""
+    return streams.new_sys_id()
+
+
+def format_version(version_raw):
+    """Formats a version for the record: whole numbers lose their ".0", anything else is kept as is."""
+    try:
+        # Convert to float and then int if it's a whole number
+        return str(int(float(version_raw))) if float(version_raw).is_integer() else str(version_raw)
+    except (ValueError, OverflowError):
+        # If conversion fails, use the raw value as a fallback
+        return str(version_raw)
+
+
+@lru_cache(maxsize=64)
+def _ten_years_after(moment):
+    return moment.replace(year=moment.year + 10).strftime("%Y-%m-%d %H:%M:%S")
 
 
-def generate_unique_hash():
-    """Generates a unique hash value to ensure each XML field requiring a hash is unique and randomized."""
-    return hashlib.md5(str(datetime.now().timestamp()).encode()).hexdigest()
+def license_end_date(clock=CLOCK):
+    """Returns the license end date: ten years after the clock's as-of time, or after start-up."""
+    return END_DATE if clock.as_of is None else _ten_years_after(clock.as_of)
 
 
-def generate_distinct_numbers_with_constraints(total_sum, max_gap=5):
+def split_quantity(total_sum, parts=3, max_gap=5, rng=random):
     """
-    Generate three distinct numbers that sum up to the total_sum.
+    Split total_sum into `parts` numbers without rejection sampling.
     Ensures:
     1. Numbers are distinct.
     2. No number is zero.
     3. The difference (gap) between any two numbers does not exceed max_gap.
+
+    With smallest value m, the reachable sums run from the tightest run m, m+1, ...
+    up to m plus the top parts-1 values of m+1..m+max_gap, and every sum in between is
+    reachable. So m is drawn from the feasible range directly. Above the tightest run,
+    number i is raised by a lift of 0..max_gap-parts+1; lifts in ascending order keep
+    the numbers distinct and within max_gap. The remaining sum is handed out as one
+    lift per part, so the work depends only on parts, never on total_sum or max_gap.
+
+    Returns:
+    tuple: The numbers in ascending order.
+
+    Raises:
+    ValueError: Immediately, when no such split exists.
+    """
+    if parts < 1:
+        raise ValueError("The quantity must be split into at least one part.")
+    if parts - 1 > max_gap:
+        raise ValueError(f"{parts} distinct numbers cannot fit within a maximum gap of {max_gap}.")
+    min_offset = parts * (parts - 1) // 2
+    max_offset = (parts - 1) * max_gap - (parts - 1) * (parts - 2) // 2
+    lowest_smallest = max(1, -(-(total_sum - max_offset) // parts))
+    highest_smallest = (total_sum - min_offset) // parts
+    if lowest_smallest > highest_smallest:
+        raise ValueError(
+            f"The total sum {total_sum} cannot be split into {parts} distinct non-zero numbers "
+            f"with a maximum gap of {max_gap}."
+        )
+
+    smallest = rng.randint(lowest_smallest, highest_smallest)
+    remaining = total_sum - smallest * parts - min_offset
+    headroom = max_gap - parts + 1
+    lifts = []
+    for left in range(parts - 1, 0, -1):
+        # Leave every later part no more than it can take.
+        lift = rng.randint(max(0, remaining - (left - 1) * headroom), min(headroom, remaining))
+        lifts.append(lift)
+        remaining -= lift
+    lifts.sort()
+    return (smallest, *(smallest + i + lift for i, lift in enumerate(lifts, 1)))
+
+
+def generate_distinct_numbers_with_constraints(total_sum, max_gap=5, count=3):
+    """
+    Generate `count` (default three) distinct numbers that sum up to the total_sum.
+    See split_quantity for the constraints; raises ValueError when no split exists.
+    """
+    return split_quantity(total_sum, parts=count, max_gap=max_gap)
+
+
+def generate_record_values(discovery, quantity, clock=CLOCK, streams=STREAMS, license_server=None, license_type=None):
+    """
+    Returns the varying values of one license record, in LICENSE template slot order.
+
+    streams (seeding.RandomStreams) supplies every random draw. license_server and
+    license_type rows are drawn when omitted.
     """
-    if total_sum < 3:
-        raise ValueError("The total sum must be at least 3 to generate three distinct numbers.")
-    
-    while True:
-        num1 = random.randint(1, total_sum - 2)
-        num2 = random.randint(1, total_sum - num1 - 1)
-        num3 = total_sum - num1 - num2
-        numbers = [num1, num2, num3]
-        numbers.sort()
-        if (len(set(numbers)) == 3 and all(n > 0 for n in numbers) and 
-            numbers[2] - numbers[0] <= max_gap):
-            return tuple(numbers)
-
-
-def generate_xml_record(discovery, quantity):
     # Randomly select other values
-    user = random.choice(USER_NAMES)
-    group = random.choice(GROUP_NAMES)
-    license_server = random.choice(LICENSE_SERVER_VALUES)
-    license_type = random.choice(LICENSE_TYPE_VALUES)
+    picks = streams.picks
+    if license_server is None:
+        license_server = picks.choice(LICENSE_SERVER_VALUES)
+    if license_type is None:
+        license_type = picks.choice(LICENSE_TYPE_VALUES)
+
+    # discovery.csv calls the column version1; scaled or older tables may say version.
+    version = format_version(discovery.get("version1", discovery.get("version", "Unknown")))
+
+    stamp = clock.stamp()
+
+    return (
+        license_end_date(clock),
+        discovery["software_install"], discovery["software_install_sys_id"],
+        generate_unique_hash(streams),  # license_id
+        license_server["license_server"], license_server["license_server_sys_id"],
+        license_type["license_type"], license_type["license_type_sys_id"],
+        discovery["norm_product"], discovery["norm_product_sys_id"],
+        discovery["norm_publisher"], discovery["norm_publisher_sys_id"],
+        discovery["product"],
+        discovery["publisher"],
+        str(int(quantity)),
+        stamp.second,  # start_date
+        stamp.second,  # sys_created_on
+        generate_unique_hash(streams),  # sys_domain
+        generate_unique_hash(streams),  # sys_id
+        str(streams.counts.randint(1, 100)),  # sys_mod_count
+        stamp.second,  # sys_updated_on
+        version,
+    )
 
-    version_raw = discovery.get("version", "Unknown")
+
+def render_xml_record(discovery, quantity, clock=CLOCK, streams=STREAMS):
+    """Renders one <samp_eng_app_license> record straight to an XML string."""
+    return LICENSE.render(generate_record_values(discovery, quantity, clock, streams))
+
+
+def generate_xml_record(discovery, quantity, clock=CLOCK, streams=STREAMS):
+    """Returns one <samp_eng_app_license> record as an ET.Element."""
+    return ET.fromstring(render_xml_record(discovery, quantity, clock, streams))
+
+
+def generate_values(start, stop, total_sum=30, max_gap=5, parts=3, clock=CLOCK, streams=STREAMS, catalog=None):
+    """
+    Yield the LICENSE value tuples of the records numbered start..stop-1.
+
+    Records cycle through the discovery models; every block of `parts` consecutive
+    records shares one distinct-quantity split of total_sum. Shards should therefore
+    start on a multiple of `parts` (plus one) to keep each block's quantities together.
+
+    With catalog (a CatalogSpec) the records are bulk entitlements instead; see
+    generate_catalog_values.
+    """
+    if catalog is not None:
+        yield from generate_catalog_values(start, stop, catalog, clock, streams)
+        return
+    # Fail before the first record rather than part-way through a shard.
+    split_quantity(total_sum, parts, max_gap)
+    split, values = wrap("quantity_split", split_quantity), wrap("values", generate_record_values)
+    quantities = None
+    for i in range(start, stop):
+        slot = (i - 1) % parts
+        if quantities is None or slot == 0:
+            quantities = split(total_sum, parts, max_gap, streams.quantities)
+        yield values(DISCOVERY_MODELS[slot % len(DISCOVERY_MODELS)], quantities[slot], clock, streams)
+
+
+def generate_records(start, stop, total_sum=30, max_gap=5, parts=3, clock=CLOCK, streams=STREAMS, catalog=None):
+    """Yield license records numbered start..stop-1 (see generate_values)."""
+    yield from map(wrap("render", LICENSE.render),
+                   generate_values(start, stop, total_sum, max_gap, parts, clock, streams, catalog))
+
+
+# Bulk license catalog: entitlements spread over every software install, license server
+# and license type, drawn a batch at a time with numpy.
+
+CATALOG_BATCH_SIZE = 4096
+
+# quantity: a parse_quantity_distribution() spec; start_from/start_to: the window start
+# dates are drawn from (default: the clock's as-of day); term_years: terms drawn from.
+# License terms in years drawn by default: ten, like the end date of a regular license.
+DEFAULT_TERM_YEARS = (10,)
+
+CatalogSpec = namedtuple("CatalogSpec", ["quantity", "start_from", "start_to", "term_years"],
+                         defaults=("lognormal:10,1", None, None, DEFAULT_TERM_YEARS))
+
+# name -> (number of parameters, None for one or more; draw(rng, size, *parameters))
+QUANTITY_DISTRIBUTIONS = {
+    "fixed": (1, lambda rng, size, n: rng.integers(n, n + 1, size)),
+    "uniform": (2, lambda rng, size, low, high: rng.integers(low, high + 1, size)),
+    "choice": (None, lambda rng, size, *values: rng.choice(values, size)),
+    "poisson": (1, lambda rng, size, mean: rng.poisson(mean, size)),
+    "lognormal": (2, lambda rng, size, median, sigma: rng.lognormal(math.log(median), sigma, size).round()),
+}
+
+
+def parse_quantity_distribution(text):
+    """
+    Parses a quantity distribution spec into a draw function.
+
+    Specs: "fixed:N", "uniform:LOW,HIGH", "choice:A,B,...", "poisson:MEAN" and
+    "lognormal:MEDIAN,SIGMA" (long-tailed: most entitlements small, a few very large).
+
+    Returns:
+    function: draw(rng, size) -> int64 array of quantities, each at least 1.
+
+    Raises:
+    ValueError: For an unknown name or bad parameters.
+    """
+    import numpy as np
+
+    name, _, params = text.partition(":")
+    if name not in QUANTITY_DISTRIBUTIONS:
+        raise ValueError(f"Unknown quantity distribution {name!r}; expected one of "
+                         f"{', '.join(QUANTITY_DISTRIBUTIONS)}.")
+    arity, draw = QUANTITY_DISTRIBUTIONS[name]
     try:
-        # Convert to float and then int if it's a whole number
-        version = str(int(float(version_raw))) if float(version_raw).is_integer() else str(version_raw)
+        values = [float(value) for value in params.split(",")] if params else []
     except ValueError:
-        # If conversion fails, use the raw value as a fallback
-        version = str(version_raw)
-    
-
-    # Create the <samp_eng_app_license> element with "INSERT_OR_UPDATE" action
-    license = ET.Element("samp_eng_app_license", action="INSERT_OR_UPDATE")
-    ET.SubElement(license, "active").text = "true"
-    ET.SubElement(license, "end_date").text = incremented_date.strftime("%Y-%m-%d %H:%M:%S")
-    ET.SubElement(license, "eng_software_install", display_value=discovery["software_install"]).text = discovery["software_install_sys_id"]
-    ET.SubElement(license, "is_product_normalized").text = "true"
-    ET.SubElement(license, "license_id").text = generate_unique_hash()
-    ET.SubElement(license, "license_server", display_value=license_server["license_server"]).text = license_server["license_server_sys_id"]
-    ET.SubElement(license, "license_type", display_value=license_type["license_type"]).text = license_type["license_type_sys_id"]
-    ET.SubElement(license, "norm_product", display_value=discovery["norm_product"]).text = discovery["norm_product_sys_id"]
-    ET.SubElement(license, "norm_publisher", display_value=discovery["norm_publisher"]).text = discovery["norm_publisher_sys_id"]
-    ET.SubElement(license, "parent_id").text = ""
-    ET.SubElement(license, "product").text = discovery["product"]
-    ET.SubElement(license, "publisher").text = discovery["publisher"]
-    ET.SubElement(license, "quantity").text = str(int(quantity))   #change
-    ET.SubElement(license, "source").text = "OpeniT"
-    ET.SubElement(license, "start_date").text = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    ET.SubElement(license, "sys_created_by").text = "admin"
-    ET.SubElement(license, "sys_created_on").text = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    ET.SubElement(license, "sys_domain").text = generate_unique_hash()
-    ET.SubElement(license, "sys_domain_path").text = "/"
-    ET.SubElement(license, "sys_id").text = generate_unique_hash()
-    ET.SubElement(license, "sys_mod_count").text = str(random.randint(1, 100))
-    ET.SubElement(license, "sys_updated_by").text = "admin"
-    ET.SubElement(license, "sys_updated_on").text = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    ET.SubElement(license, "version").text = version
-    return license
-
-
-st.title("XML Record Generator with Quantity Distribution")
-
-# Input for the total sum of the quantity
-total_sum_input = st.text_input("Enter the total sum of the quantity", value="")
-
-if st.button("Generate XML"):
-    if not DISCOVERY_MODELS or len(DISCOVERY_MODELS) < 3:
-        st.error("Discovery models data must have at least 3 entries.")
-    elif not total_sum_input.isdigit():
-        st.error("Please enter a valid numeric total sum.")
-    else:
-        total_sum = int(total_sum_input)
+        raise ValueError(f"The parameters of {text!r} must be numbers.") from None
+    if (arity is None and not values) or (arity is not None and len(values) != arity):
+        raise ValueError(f"The {name} distribution takes {arity or 'one or more'} comma-separated parameter(s).")
+    if name in ("fixed", "uniform", "choice"):
+        values = [int(value) for value in values]
+    if min(values) <= 0 or (name == "uniform" and values[0] > values[1]):
+        raise ValueError(f"The parameters of {text!r} must be positive (and LOW <= HIGH).")
+    return lambda rng, size: np.maximum(draw(rng, size, *values), 1).astype(np.int64)
 
+
+def parse_term_years(text):
+    """Parses a comma-separated list of license terms in years, e.g. "1,3,5"."""
+    try:
+        terms = tuple(int(term) for term in text.split(","))
+    except ValueError:
+        raise ValueError(f"The term years {text!r} must be whole numbers separated by commas.") from None
+    if min(terms) <= 0:
+        raise ValueError("License terms must be at least one year.")
+    return terms
+
+
+def _columns(table, names):
+    """Returns the named columns of a reference (or scaled) table as lists."""
+    indices = range(len(table))
+    return {name: table.take(name, indices) for name in names}
+
+
+# The reference files entitlements are drawn from, in _build_entitlement_sources() order.
+ENTITLEMENT_FILES = ("discovery.csv", "software_install.csv", "license_server.csv", "license_type.csv")
+
+_entitlements = {}  # digests of the ENTITLEMENT_FILES tables -> their entitlement sources
+
+
+def _current_table(file_name):
+    """Returns a reference table as it is on disk now; an empty one when missing (reported at import)."""
+    try:
+        return load_table(file_name)
+    except (FileNotFoundError, EmptyDataError):
+        return ReferenceTable.empty(file_name)
+
+
+def entitlement_sources():
+    """
+    Returns the installs, license servers and license types entitlements are spread over.
+
+    Every discovery model contributes its software install. software_install.csv adds
+    the installs no discovery model covers, as long as discovery.csv knows their
+    normalized product and publisher (license records are always normalized); their
+    version comes from its version column. Each source is a dict of numpy object
+    arrays, one entry per distinct sys_id.
+
+    The sources are rebuilt whenever one of ENTITLEMENT_FILES changes on disk (see
+    reference_data.load_table), so edits show up in a running Streamlit session.
+    """
+    tables = [_current_table(file_name) for file_name in ENTITLEMENT_FILES]
+    key = tuple(table.digest or id(table) for table in tables)
+    sources = _entitlements.get(key)
+    if sources is None:
+        _entitlements.clear()
+        sources = _entitlements[key] = _build_entitlement_sources(*tables)
+    return sources
+
+
+def _build_entitlement_sources(discovery_table, install_table, server_table, type_table):
+    import numpy as np
+
+    installs = {}  # install sys_id -> (install, norm product, its sys_id, norm publisher, its sys_id, product, publisher, version)
+    if len(discovery_table):
+        columns = _columns(discovery_table, ["software_install", "software_install_sys_id", "norm_product",
+                                             "norm_product_sys_id", "norm_publisher", "norm_publisher_sys_id",
+                                             "product", "publisher", "version1"])
+        products = dict(zip(columns["norm_product_sys_id"], columns["norm_product"]))
+        publishers = dict(zip(columns["norm_publisher_sys_id"], columns["norm_publisher"]))
+        for (install, sys_id, norm_product, product_id, norm_publisher, publisher_id, product, publisher,
+             version) in zip(*columns.values()):
+            installs.setdefault(sys_id, (install, norm_product, product_id, norm_publisher, publisher_id,
+                                         product, publisher, format_version(version)))
+        if len(install_table):
+            listed = _columns(install_table, ["eng_software_install", "norm_product", "norm_publisher",
+                                              "product", "publisher", "version"])
+            for sys_id, product_id, publisher_id, product, publisher, version in zip(*listed.values()):
+                if sys_id and product_id in products and publisher_id in publishers:
+                    installs.setdefault(sys_id, (product, products[product_id], product_id,
+                                                 publishers[publisher_id], publisher_id, product, publisher,
+                                                 format_version(version)))
+
+    def as_arrays(names, rows):
+        columns = list(zip(*rows)) or [()] * len(names)
+        return {name: np.array(values, dtype=object) for name, values in zip(names, columns)}
+
+    install_names = ["install", "norm_product", "norm_product_sys_id", "norm_publisher", "norm_publisher_sys_id",
+                     "product", "publisher", "version"]
+    sources = as_arrays(install_names, installs.values())
+    sources["install_sys_id"] = np.array(list(installs), dtype=object)
+    servers = as_arrays(["license_server", "license_server_sys_id"],
+                        zip(*_columns(server_table, ["license_server", "license_server_sys_id"]).values())
+                        if len(server_table) else [])
+    license_types = as_arrays(["license_type", "license_type_sys_id"],
+                              zip(*_columns(type_table, ["license_type", "license_type_sys_id"]).values())
+                              if len(type_table) else [])
+    return sources, servers, license_types
+
+
+def _add_years(days, years):
+    """Adds whole years to datetime64[D] days; a 29 February lands on 28 February."""
+    import numpy as np
+
+    months = days.astype("datetime64[M]")
+    target = months + (years * 12).astype("timedelta64[M]")
+    last_day = (target + 1).astype("datetime64[D]") - 1
+    return np.minimum(target.astype("datetime64[D]") + (days - months.astype("datetime64[D]")), last_day)
+
+
+def check_catalog(catalog, clock=CLOCK):
+    """
+    Validates a CatalogSpec against the reference data.
+
+    Returns:
+    tuple: (quantity draw function, term years as an int64 array, start clock.DateWindow).
+
+    Raises:
+    ValueError: For a bad spec, or when a reference file is empty.
+    """
+    import numpy as np
+
+    draw_quantities = parse_quantity_distribution(catalog.quantity)
+    terms = np.array(catalog.term_years, dtype=np.int64)
+    if not len(terms) or terms.min() <= 0:
+        raise ValueError("License terms must be at least one year.")
+    as_of_day = clock.now().date()
+    window = DateWindow(catalog.start_from or as_of_day, catalog.start_to or catalog.start_from or as_of_day)
+    installs, servers, license_types = entitlement_sources()
+    if not (len(installs["install_sys_id"]) and len(servers["license_server_sys_id"])
+            and len(license_types["license_type_sys_id"])):
+        raise ValueError("The discovery, license server and license type reference files must not be empty.")
+    return draw_quantities, terms, window
+
+
+def generate_catalog_values(start, stop, catalog=CatalogSpec(), clock=CLOCK, streams=STREAMS,
+                            batch_size=CATALOG_BATCH_SIZE):
+    """
+    Yield the LICENSE value tuples of bulk entitlements numbered start..stop-1.
+
+    Entitlement i covers install i mod installs, then the next license server, then
+    the next license type, so the first installs x servers x types records hold every
+    combination once and later ones add further entitlements to them. Quantities follow
+    catalog.quantity; start dates are drawn from the catalog's window and end dates are
+    a drawn term of whole years later. Everything else is drawn a batch at a time.
+
+    Parameters:
+    catalog (CatalogSpec): Quantity distribution, start window and terms.
+    clock (clock.GenerationClock): Stamps sys_created_on/sys_updated_on; its as-of day is
+        the default start window.
+    streams (seeding.RandomStreams): Supplies the numpy "catalog" stream and the sys_ids.
+
+    Raises:
+    ValueError: For a bad spec, or when a reference file is empty.
+    """
+    import numpy as np
+
+    draw_quantities, terms, window = check_catalog(catalog, clock)
+    first_day = np.datetime64(window.start, "D")
+    installs, servers, license_types = entitlement_sources()
+    num_installs = len(installs["install_sys_id"])
+    num_servers = len(servers["license_server_sys_id"])
+    combinations = num_installs * num_servers * len(license_types["license_type_sys_id"])
+
+    rng = streams.numpy("catalog")
+    for batch_start in range(start, stop, batch_size):
+        size = min(batch_start + batch_size, stop) - batch_start
+        with stage("picks"):
+            combination = np.arange(batch_start - 1, batch_start - 1 + size) % combinations
+            install = combination % num_installs
+            server = combination // num_installs % num_servers
+            license_type = combination // (num_installs * num_servers)
+            quantities = draw_quantities(rng, size)
+            starts = first_day + rng.integers(0, len(window), size)
+            ends = _add_years(starts, terms[rng.integers(0, len(terms), size)])
+            mod_counts = rng.integers(1, 101, size)
+            ids = streams.new_sys_ids(3 * size)
+        with stage("values"):
+            picked = {name: column[install].tolist() for name, column in installs.items()}
+            second = clock.stamp().second
+            values = list(zip(
+                [f"{day} 00:00:00" for day in np.datetime_as_string(ends).tolist()],
+                picked["install"], picked["install_sys_id"],
+                ids[0::3],  # license_id
+                servers["license_server"][server].tolist(), servers["license_server_sys_id"][server].tolist(),
+                license_types["license_type"][license_type].tolist(),
+                license_types["license_type_sys_id"][license_type].tolist(),
+                picked["norm_product"], picked["norm_product_sys_id"],
+                picked["norm_publisher"], picked["norm_publisher_sys_id"],
+                picked["product"],
+                picked["publisher"],
+                map(str, quantities.tolist()),
+                [f"{day} 00:00:00" for day in np.datetime_as_string(starts).tolist()],
+                repeat(second),  # sys_created_on
+                ids[1::3],  # sys_domain
+                ids[2::3],  # sys_id
+                map(str, mod_counts.tolist()),
+                repeat(second),  # sys_updated_on
+                picked["version"],
+            ))
+        yield from values
+
+
+if __name__ == "__main__":
+    import streamlit as st
+
+    from datetime import date, timedelta
+
+    from streamlit_jobs import show_job, start_job
+
+    st.title("XML Record Generator with Quantity Distribution")
+
+    if st.checkbox("Bulk license catalog: entitlements across every software install, server and license type"):
+        num_input = st.text_input("Number of license entitlements", value="")
+        quantity = st.text_input("Quantity distribution", value=CatalogSpec._field_defaults["quantity"],
+                                 help="fixed:N, uniform:LOW,HIGH, choice:A,B,..., poisson:MEAN or lognormal:MEDIAN,SIGMA")
+        window = st.date_input("Start dates between", value=(date.today() - timedelta(days=3 * 365), date.today()))
+        terms = st.text_input("License terms in years", value=",".join(map(str, DEFAULT_TERM_YEARS)))
+        compress = st.checkbox("Gzip the download")
+        seed_input = st.text_input("Random seed (optional, for reproducible records)", value="")
+        profile = st.sidebar.checkbox("Profile generation stages")
+
+        if st.button("Generate XML"):
+            try:
+                streams = RandomStreams(parse_seed(seed_input), table="license")
+                if not num_input.isdigit() or int(num_input) <= 0:
+                    raise ValueError("Please enter a valid number greater than 0.")
+                if len(window) != 2:
+                    raise ValueError("Pick the first and the last start date.")
+                catalog = CatalogSpec(quantity, window[0], window[1], parse_term_years(terms))
+                check_catalog(catalog)
+            except ValueError as e:
+                st.error(str(e))
+                st.stop()
+            num_records = int(num_input)
+            records = generate_records(1, num_records + 1, streams=streams, catalog=catalog)
+            start_job("license_catalog_job", records, num_records, "samp_eng_app_license.xml", compress,
+                      profile=profile)
+
+        show_job("license_catalog_job")
+        st.stop()
+
+    # Input for the total sum of the quantity
+    total_sum_input = st.text_input("Enter the total sum of the quantity", value="")
+
+    model_names = [discovery["discovery_model"] for discovery in DISCOVERY_MODELS]
+    selected_models = st.multiselect("Discovery models to license", model_names, default=model_names[:3])
+    max_gap = st.number_input("Maximum gap between quantities", min_value=0, value=5, step=1)
+    seed_input = st.text_input("Random seed (optional, for reproducible records)", value="")
+    profile = st.sidebar.checkbox("Profile generation stages")
+
+    if st.button("Generate XML"):
         try:
-            quantities = generate_distinct_numbers_with_constraints(total_sum, max_gap=5)
+            streams = RandomStreams(parse_seed(seed_input), table="license")
         except ValueError as e:
             st.error(str(e))
             st.stop()
+        if not selected_models:
+            st.error("Select at least one discovery model.")
+        elif not total_sum_input.isdigit():
+            st.error("Please enter a valid numeric total sum.")
+        else:
+            total_sum = int(total_sum_input)
 
-        root = ET.Element("unload")
-        root.set("unload_date", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-
-        # Generate records using DISCOVERY_MODELS[0], [1], [2] and assign quantities
-        for i in range(3):
-            record = generate_xml_record(DISCOVERY_MODELS[i], quantities[i])
-            root.append(record)
-
-        xml_data = ET.tostring(root, encoding="utf-8").decode("utf-8")
-        st.code(xml_data, language="xml")
-        st.download_button(
-            label="Download XML",
-            data=xml_data,
-            file_name="samp_eng_app_license.xml",
-            mime="application/xml"
-        )
+            try:
+                quantities = split_quantity(total_sum, parts=len(selected_models), max_gap=int(max_gap),
+                                            rng=streams.quantities)
+            except ValueError as e:
+                st.error(str(e))
+                st.stop()
+
+            # One license per selected discovery model, each with its share of the quantity
+            licensed = [DISCOVERY_MODELS[model_names.index(name)] for name in selected_models]
+            records = (render_xml_record(discovery, quantity, streams=streams)
+                       for discovery, quantity in zip(licensed, quantities))
+            start_job("license_job", records, len(licensed), "samp_eng_app_license.xml", profile=profile)
+
+    show_job("license_job")
@@ -1,46 +1,302 @@
+import argparse
+import io
+import json
+import os
+
 import pandas as pd
-import matplotlib.pyplot as plt
 
-def load_and_display_data(csv_file):
+REQUIRED_COLUMNS = ["Date", "Quantity", "Usage", "Denial"]
+BLOCK_SIZE = 16 * 1024 * 1024  # bytes of CSV parsed at a time
+MAX_POINTS = 4000  # points drawn for the usage line
+
+
+class UsageFile:
+    """
+    A Date/Quantity/Usage/Denial history on disk, read in blocks rather than all at once.
+
+    CSV files are parsed 16 MB at a time. Because rows are in Date order (as graph.py
+    writes them), a block's date range is the Date of its first and last line, so the
+    block index (byte offset, length and date range of every block) is built by scanning
+    the bytes without parsing the rows, and is saved next to the CSV (<path>.blocks.json,
+    keyed by the file's size and mtime) for later runs. Reads for a date range (e.g. after
+    zooming the plot) only parse the blocks that overlap it. Parquet files are read by row
+    group with the same date filter.
+
+    Parameters:
+    path (str): Path to a .csv or .parquet file.
+    block_size (int): Bytes of CSV parsed per block.
+    """
+
+    def __init__(self, path, block_size=BLOCK_SIZE):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self.block_size = block_size
+        self.is_parquet = path.endswith(".parquet")
+        self.index_path = f"{path}.blocks.json"
+        self.blocks = None  # [(offset, length, first_date, last_date)] once the CSV has been indexed
+        if not self.is_parquet:
+            with open(path, "rb") as handle:
+                self._header = handle.readline()
+                self._data_start = handle.tell()
+            missing = set(REQUIRED_COLUMNS) - set(self._header.decode("utf-8-sig").strip().split(","))
+            if missing:
+                raise ValueError(f"The CSV file must contain the following columns: {set(REQUIRED_COLUMNS)}")
+
+    def head(self, rows=5):
+        """Returns the first few rows."""
+        if self.is_parquet:
+            import pyarrow.parquet as pq
+
+            return pq.ParquetFile(self.path).read_row_group(0).to_pandas().head(rows)
+        return pd.read_csv(self.path, nrows=rows)
+
+    def _row_group_dates(self, parquet):
+        """Yields (row group, first Date, last Date), from the footer statistics where available."""
+        column = parquet.schema_arrow.get_field_index("Date")
+        for group in range(parquet.num_row_groups):
+            statistics = parquet.metadata.row_group(group).column(column).statistics
+            if statistics is not None and statistics.has_min_max:
+                yield group, pd.Timestamp(statistics.min), pd.Timestamp(statistics.max)
+            else:
+                dates = parquet.read_row_group(group, columns=["Date"]).column(0).to_pandas()
+                yield group, pd.Timestamp(dates.min()), pd.Timestamp(dates.max())
+
+    def date_range(self):
+        """Returns the first and last Date without reading the rows in between."""
+        if self.is_parquet:
+            import pyarrow.parquet as pq
+
+            ranges = list(self._row_group_dates(pq.ParquetFile(self.path)))
+            return min(r[1] for r in ranges), max(r[2] for r in ranges)
+        with open(self.path, "rb") as handle:
+            handle.seek(self._data_start)
+            first = handle.readline()
+            handle.seek(0, os.SEEK_END)
+            size = handle.tell()
+            handle.seek(max(self._data_start, size - 64 * 1024))
+            last = handle.read().rstrip(b"\r\n").rsplit(b"\n", 1)[-1]
+        return tuple(self._line_dates(first.rstrip(b"\r\n"), last))
+
+    def _line_dates(self, *lines):
+        rows = pd.read_csv(io.BytesIO(self._header + b"\n".join(lines) + b"\n"), usecols=["Date"])
+        return list(pd.to_datetime(rows["Date"]))
+
+    def _index_key(self):
+        stat = os.stat(self.path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "block_size": self.block_size}
+
+    def _load_index(self, key):
+        try:
+            with open(self.index_path, encoding="utf-8") as handle:
+                saved = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        if saved.get("key") != key:
+            return None
+        return [(offset, length, pd.Timestamp(first), pd.Timestamp(last))
+                for offset, length, first, last in saved["blocks"]]
+
+    def _save_index(self, key, blocks):
+        saved = {"key": key, "blocks": [(offset, length, first.isoformat(), last.isoformat())
+                                         for offset, length, first, last in blocks]}
+        try:
+            with open(self.index_path, "w", encoding="utf-8") as handle:
+                json.dump(saved, handle)
+        except OSError:  # e.g. a read-only directory; the index is rebuilt next time
+            pass
+
+    def index(self):
+        """
+        Returns the block index, loading the saved one if the CSV is unchanged and
+        otherwise building and saving it.
+
+        Returns:
+        list: (offset, length, first_date, last_date) for every non-empty block.
+        """
+        if self.blocks is not None:
+            return self.blocks
+        key = self._index_key()
+        blocks = self._load_index(key)
+        if blocks is None:
+            blocks = []
+            for offset, data in self._read_blocks(self._data_start):
+                lines = data.strip(b"\r\n")
+                if not lines:
+                    continue
+                first, last = self._line_dates(lines.split(b"\n", 1)[0], lines.rsplit(b"\n", 1)[-1])
+                blocks.append((offset, len(data), first, last))
+            self._save_index(key, blocks)
+        self.blocks = blocks
+        return blocks
+
+    def _parse(self, data):
+        frame = pd.read_csv(io.BytesIO(self._header + data), usecols=REQUIRED_COLUMNS)
+        frame["Date"] = pd.to_datetime(frame["Date"])
+        return frame
+
+    def _read_blocks(self, offset):
+        with open(self.path, "rb") as handle:
+            handle.seek(offset)
+            while True:
+                data = handle.read(self.block_size)
+                if not data:
+                    return
+                data += handle.readline()  # finish the last line of the block
+                yield offset, data
+                offset += len(data)
+
+    def chunks(self, start=None, end=None):
+        """Yields DataFrame chunks with rows inside [start, end] (either end may be None)."""
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+
+        if self.is_parquet:
+            import pyarrow.parquet as pq
+
+            parquet = pq.ParquetFile(self.path)
+            for group, first_date, last_date in self._row_group_dates(parquet):
+                if (end is not None and first_date > end) or (start is not None and last_date < start):
+                    continue
+                frame = parquet.read_row_group(group, columns=REQUIRED_COLUMNS).to_pandas()
+                yield _clip(frame, start, end)
+            return
+
+        with open(self.path, "rb") as handle:
+            for offset, length, first_date, last_date in self.index():
+                if (end is not None and first_date > end) or (start is not None and last_date < start):
+                    continue
+                handle.seek(offset)
+                yield _clip(self._parse(handle.read(length)), start, end)
+
+
+def _clip(frame, start, end):
+    if start is not None:
+        frame = frame[frame["Date"] >= start]
+    if end is not None:
+        frame = frame[frame["Date"] <= end]
+    return frame
+
+
+def downsample(usage_file, start=None, end=None, max_points=MAX_POINTS):
     """
-    Load data from a CSV file and display a table and a graph.
-    
+    Reduce a usage history to a plot-sized, shape-preserving summary in one pass.
+
+    The range is cut into max_points // 2 equal time buckets and each bucket keeps the
+    points where Usage is lowest and highest, so spikes and dips survive. Every row with
+    a denial is kept.
+
+    Parameters:
+    usage_file (UsageFile): The history to read.
+    start, end (str | Timestamp): Optional visible range. Defaults to the whole file.
+    max_points (int): Upper bound on the number of usage points returned.
+
+    Returns:
+    tuple: (usage, quantity, denials) DataFrames. usage has Date and Usage, quantity has
+    Date and Quantity (the bucket maximum), denials has Date and Denial.
+    """
+    first, last = usage_file.date_range()
+    start = first if start is None else max(pd.Timestamp(start), first)
+    end = last if end is None else min(pd.Timestamp(end), last)
+    buckets = max(1, max_points // 2)
+    span = max((end - start).total_seconds(), 1e-9)
+
+    partials, denials = [], []
+    for frame in usage_file.chunks(start, end):
+        if not len(frame):
+            continue
+        offsets = (frame["Date"] - start).dt.total_seconds().to_numpy()
+        bucket = (offsets * (buckets / span)).astype("int64").clip(0, buckets - 1)
+        frame = frame.assign(Bucket=bucket)
+        grouped = frame.groupby("Bucket")
+        lows = frame.loc[grouped["Usage"].idxmin(), ["Bucket", "Date", "Usage"]]
+        highs = frame.loc[grouped["Usage"].idxmax(), ["Bucket", "Date", "Usage"]]
+        quantity = grouped.agg(Date=("Date", "first"), Quantity=("Quantity", "max")).reset_index()
+        partials.append((lows, highs, quantity))
+        denials.append(frame.loc[frame["Denial"] > 0, ["Date", "Denial"]])
+
+    if not partials:
+        empty = pd.DataFrame({"Date": pd.Series(dtype="datetime64[ns]")})
+        return empty.assign(Usage=0)[:0], empty.assign(Quantity=0)[:0], empty.assign(Denial=0)[:0]
+
+    # A bucket can span two blocks; keep the overall extreme of each.
+    lows = pd.concat([p[0] for p in partials]).sort_values("Usage", kind="stable").drop_duplicates("Bucket")
+    highs = pd.concat([p[1] for p in partials]).sort_values("Usage", kind="stable").drop_duplicates("Bucket", keep="last")
+    usage = pd.concat([lows, highs]).drop_duplicates().sort_values("Date")[["Date", "Usage"]]
+    quantity = (pd.concat([p[2] for p in partials]).groupby("Bucket")
+                .agg(Date=("Date", "min"), Quantity=("Quantity", "max")).sort_values("Date"))
+    return usage.reset_index(drop=True), quantity.reset_index(drop=True), pd.concat(denials, ignore_index=True)
+
+
+def load_and_display_data(csv_file, output=None, start=None, end=None, max_points=MAX_POINTS):
+    """
+    Load data from a CSV (or Parquet) file and display a table and a graph.
+
+    The file is streamed in blocks and the usage line is downsampled to max_points, so
+    multi-million-row histories plot in seconds. In an interactive window, zooming or
+    panning re-reads only the blocks of the visible range at full detail.
+
     Parameters:
     csv_file (str): Path to the CSV file containing the data.
+    output (str): Save the graph to this PNG instead of opening a window (works headless).
+    start, end (str): Optional date range to plot.
+    max_points (int): Maximum number of usage points to draw.
     """
     try:
-        # Load data from CSV
-        data = pd.read_csv(csv_file)
+        usage_file = UsageFile(csv_file)
 
         # Display the first few rows of the data
         print("Data Preview:")
-        print(data.head())
-        
-        # Ensure required columns exist
-        required_columns = {"Date", "Quantity", "Usage", "Denial"}
-        if not required_columns.issubset(data.columns):
-            raise ValueError(f"The CSV file must contain the following columns: {required_columns}")
-        
-        # Convert 'Date' column to datetime if it's not already
-        data["Date"] = pd.to_datetime(data["Date"])
+        print(usage_file.head())
+
+        usage, quantity, denials = downsample(usage_file, start, end, max_points)
+
+        import matplotlib
+        if output:
+            matplotlib.use("Agg")
+        import matplotlib.dates as mdates
+        import matplotlib.pyplot as plt
 
         # Plot the data
-        plt.figure(figsize=(12, 6))
-        plt.plot(data["Date"], data["Quantity"], label="Quantity (Max)", linestyle="--", color="grey")
-        plt.plot(data["Date"], data["Usage"], label="Usage", marker="o")
-        plt.scatter(data["Date"], data["Denial"], label="Denial", color="red")
-        plt.title("Loaded Data from CSV")
-        plt.xlabel("Date")
-        plt.ylabel("Value")
-        plt.legend()
-        plt.grid()
+        fig, ax = plt.subplots(figsize=(12, 6))
+        ax.step(quantity["Date"], quantity["Quantity"], where="post", label="Quantity (Max)", linestyle="--", color="grey")
+        (usage_line,) = ax.plot(usage["Date"], usage["Usage"], label="Usage", marker="o" if len(usage) <= 200 else None)
+        ax.scatter(denials["Date"], denials["Denial"], label="Denial", color="red", s=10)
+        ax.set_title("Loaded Data from CSV")
+        ax.set_xlabel("Date")
+        ax.set_ylabel("Value")
+        ax.legend()
+        ax.grid()
+
+        if output:
+            fig.savefig(output, dpi=100, bbox_inches="tight")
+            plt.close(fig)
+            print(f"Graph saved to {output}")
+            return
+
+        def refine(axes):
+            """Re-reads the visible range at full resolution after a zoom or pan."""
+            low, high = (pd.Timestamp(mdates.num2date(x)).tz_localize(None) for x in axes.get_xlim())
+            visible, _, _ = downsample(usage_file, low, high, max_points)
+            usage_line.set_data(visible["Date"], visible["Usage"])
+            axes.figure.canvas.draw_idle()
+
+        ax.callbacks.connect("xlim_changed", refine)
         plt.show()
-        
+
     except FileNotFoundError:
         print(f"Error: The file '{csv_file}' was not found.")
     except Exception as e:
         print(f"An error occurred: {e}")
 
-# Example usage
-csv_file_path = "generated_graph_data.csv"  # Replace with the path to your CSV file
-load_and_display_data(csv_file_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plot a Date/Quantity/Usage/Denial history.")
+    parser.add_argument("csv_file", nargs="?", default="generated_graph_data.csv",
+                        help="Path to the CSV or Parquet file")
+    parser.add_argument("-o", "--output", help="Save the graph to this PNG instead of showing it")
+    parser.add_argument("--start", help="First date to plot")
+    parser.add_argument("--end", help="Last date to plot")
+    parser.add_argument("--max-points", type=int, default=MAX_POINTS, help="Usage points to draw")
+    args = parser.parse_args()
+    load_and_display_data(args.csv_file, args.output, args.start, args.end, args.max_points)
@@ -0,0 +1,253 @@
+"""
+Generate a referentially consistent dataset in one pass: the license, concurrent usage,
+usage summary and denial unloads, written side by side.
+
+The license set is built first and indexed by product and license server. Everything
+else is generated against it:
+- concurrent usage references the license's sys_id and never exceeds its quantity;
+- usage summaries exist only for licensed products, one per distinct user per product
+  and day, with at least as many users as that day's peak concurrency;
+- denials occur only for licensed product/server pairs, and only on days where that
+  license was used up to its quantity.
+
+Examples:
+    python pipeline.py --date-from 2024-12-01 --date-to 2024-12-31 -o dataset
+    python pipeline.py --date-from 2024-01-01 --seed 42 --as-of "2024-12-31 12:00:00" --gzip
+"""
+import argparse
+import os
+import sys
+import time
+from collections import namedtuple
+from contextlib import ExitStack
+from datetime import timedelta
+
+import concurrent_usage
+import data_generate
+import license_usage
+import usage_summary
+from batch_generate import TABLES
+from clock import DateWindow, GenerationClock
+from record_templates import CONCURRENT_USAGE, DENIAL, LICENSE, USAGE_SUMMARY
+from reference_data import row_values, rows_at
+from seeding import RandomStreams
+from unload_writer import UnloadWriter
+
+# Position of the license's own sys_id among the LICENSE template's values.
+LICENSE_SYS_ID = LICENSE.slots.index("sys_id")
+
+License = namedtuple("License", ["discovery", "server", "license_type", "quantity", "sys_id", "usage_ref"])
+
+
+class LicenseIndex:
+    """
+    The licenses of a dataset, indexed by product and by license server.
+
+    Parameters:
+    licenses (list): License tuples.
+    """
+
+    def __init__(self, licenses):
+        self.licenses = list(licenses)
+        self.by_product = {}
+        self.by_server = {}
+        self.by_key = {}
+        for lic in self.licenses:
+            product = lic.discovery["norm_product_sys_id"]
+            server = lic.server["license_server_sys_id"]
+            self.by_product.setdefault(product, []).append(lic)
+            self.by_server.setdefault(server, []).append(lic)
+            self.by_key[(product, server)] = lic
+
+    def __len__(self):
+        return len(self.licenses)
+
+    def __iter__(self):
+        return iter(self.licenses)
+
+    def lookup(self, product_sys_id, server_sys_id):
+        """Returns the license of a product on a server, or None when it is unlicensed there."""
+        return self.by_key.get((product_sys_id, server_sys_id))
+
+
+def build_licenses(total_sum=30, max_gap=5, clock=license_usage.CLOCK, streams=license_usage.STREAMS,
+                   servers_per_product=3):
+    """
+    Builds the licenses of every discovery model: one on each of `servers_per_product`
+    license servers drawn for that model (all servers when there are fewer).
+
+    Each product's total_sum is split across its servers with split_quantity, as the
+    license page splits it across models, so the license count grows with the models
+    only, however many servers the reference data has.
+
+    Returns:
+    tuple: (LicenseIndex, list of LICENSE value tuples in the same order).
+
+    Raises:
+    ValueError: When a reference file is empty or the split is impossible.
+    """
+    servers = license_usage.LICENSE_SERVER_VALUES
+    if not servers or not license_usage.DISCOVERY_MODELS or not license_usage.LICENSE_TYPE_VALUES:
+        raise ValueError("The discovery, license server and license type reference files must not be empty.")
+    per_product = min(servers_per_product, len(servers))
+    licenses, rows = [], []
+    for discovery in license_usage.DISCOVERY_MODELS:
+        quantities = license_usage.split_quantity(total_sum, per_product, max_gap, streams.quantities)
+        # Servers are drawn in random order, so the largest share does not always land on the first one.
+        chosen = streams.picks.sample(range(len(servers)), per_product)
+        for server, quantity in zip(rows_at(servers, chosen), quantities):
+            license_type = streams.picks.choice(license_usage.LICENSE_TYPE_VALUES)
+            values = license_usage.generate_record_values(discovery, quantity, clock, streams, server, license_type)
+            sys_id = values[LICENSE_SYS_ID]
+            # Concurrent usage points at this license instead of discovery.csv's license_sys_id.
+            usage_ref = (discovery["norm_product"], sys_id)
+            licenses.append(License(discovery, server, license_type, quantity, sys_id, usage_ref))
+            rows.append(values)
+    return LicenseIndex(licenses), rows
+
+
+def peak_concurrency(quantity, cap_rate, rng):
+    """Draws a day's peak concurrency: the full quantity with probability cap_rate, otherwise below it."""
+    if quantity <= 1 or rng.random() < cap_rate:
+        return quantity
+    return rng.randint(1, quantity - 1)
+
+
+def _idle_user(num_users, in_session, rng):
+    """Draws a user index outside in_session; generate_dataset makes sure one is left."""
+    while True:
+        user = rng.randrange(num_users)
+        if user not in in_session:
+            return user
+
+
+def generate_dataset(output_dir, date_window, total_sum=30, max_gap=5, cap_rate=0.1, compress=False,
+                     clock=None, streams=None, servers_per_product=3):
+    """
+    Write the four unload files of one consistent dataset.
+
+    Parameters:
+    output_dir (str): Directory for the files (created if missing).
+    date_window (clock.DateWindow): Days to generate usage, summaries and denials for.
+    total_sum (int): Quantity split across the servers of each product.
+    max_gap (int): Maximum quantity gap between a product's licenses.
+    cap_rate (float): Share of license-days used up to the full quantity (and so denied).
+    compress (bool): Gzip the files.
+    clock (clock.GenerationClock): Clock records are stamped from. Defaults to now.
+    streams (seeding.RandomStreams): Random streams. Defaults to unseeded.
+    servers_per_product (int): License servers each product is licensed on (see build_licenses).
+
+    Returns:
+    dict: Table name -> (path, record count).
+
+    Raises:
+    ValueError: When a reference file is empty, the split is impossible, or there are
+        fewer users than a product's sessions and denials need.
+    """
+    clock = clock or GenerationClock()
+    streams = streams or RandomStreams()
+    users = usage_summary.USER_NAMES
+    groups = data_generate.GROUP_NAMES
+    if not users or not groups:
+        raise ValueError("The user and group reference files must not be empty.")
+    index, license_rows = build_licenses(total_sum, max_gap, clock, streams, servers_per_product)
+    # A product's sessions take as many distinct users as its licenses' summed peaks, and
+    # a denial one more user who had no session that day.
+    can_deny = cap_rate > 0 or any(lic.quantity <= 1 for lic in index)
+    needed = max(sum(lic.quantity for lic in licenses) for licenses in index.by_product.values()) + can_deny
+    if len(users) < needed:
+        raise ValueError(f"A product's sessions and denials need {needed} distinct users, but there are only "
+                         f"{len(users)}. Lower --total-sum or scale up user.csv with scale_reference.py.")
+
+    os.makedirs(output_dir, exist_ok=True)
+    suffix = ".gz" if compress else ""
+    paths = {table: os.path.join(output_dir, TABLES[table].file_name + suffix) for table in TABLES}
+    unload_date = clock.stamp().second
+
+    with ExitStack() as stack:
+        writers = {table: stack.enter_context(UnloadWriter(path, unload_date, compress)) for table, path in paths.items()}
+        for values in license_rows:
+            writers["license"].write(LICENSE.render(values))
+
+        counts, picks = streams.counts, streams.picks
+        for day in date_window.dates:
+            for product_licenses in index.by_product.values():
+                peaks = [peak_concurrency(lic.quantity, cap_rate, counts) for lic in product_licenses]
+
+                # Distinct users of the product that day; at least the sum of the servers' peaks.
+                # Users are drawn by index so scaled (memory-mapped) user tables stay cheap.
+                session = picks.sample(range(len(users)), sum(peaks))
+                discovery = row_values(product_licenses[0].discovery, usage_summary.DISCOVERY_COLUMNS)
+                for user in rows_at(users, session):
+                    values = usage_summary.generate_record_values(
+                        writers["usage_summary"].count + 1, usage_summary.BASE_DATE, clock,
+                        picks=(row_values(user, usage_summary.USER_COLUMNS), discovery), streams=streams,
+                        usage_date=day)
+                    writers["usage_summary"].write(USAGE_SUMMARY.render(values))
+
+                in_session = set(session)
+                for lic, peak in zip(product_licenses, peaks):
+                    values = concurrent_usage.generate_record_values(
+                        writers["concurrent_usage"].count + 1, clock, discovery=lic.usage_ref, streams=streams,
+                        usage_date=day, concurrent_usage=peak)
+                    writers["concurrent_usage"].write(CONCURRENT_USAGE.render(values))
+
+                    if peak < lic.quantity:
+                        continue
+                    # The license was used up: someone who did not get a seat was denied.
+                    record_picks = (
+                        row_values(users[_idle_user(len(users), in_session, picks)], data_generate.USER_COLUMNS),
+                        row_values(lic.discovery, data_generate.DISCOVERY_COLUMNS),
+                        row_values(picks.choice(groups), data_generate.GROUP_COLUMNS),
+                        row_values(lic.server, data_generate.LICENSE_SERVER_COLUMNS),
+                        row_values(lic.license_type, data_generate.LICENSE_TYPE_COLUMNS),
+                    )
+                    values = data_generate.generate_record_values(
+                        writers["denial"].count + 1, clock, picks=record_picks, streams=streams, denial_date=day)
+                    writers["denial"].write(DENIAL.render(values))
+
+    return {table: (paths[table], writers[table].count) for table in TABLES}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate a consistent license/usage/denial dataset in one pass.")
+    parser.add_argument("-o", "--output-dir", default=".", help="Directory for the four unload files")
+    parser.add_argument("--date-from", help="First usage day (default: 30 days before the as-of date)")
+    parser.add_argument("--date-to", help="Last usage day (default: the as-of date)")
+    parser.add_argument("--as-of", help="Timestamp every record with this time (default: now)")
+    parser.add_argument("--seed", type=int, help="Root seed for a reproducible dataset")
+    parser.add_argument("--total-sum", type=int, default=30, help="Quantity split across each product's servers")
+    parser.add_argument("--max-gap", type=int, default=5, help="Maximum quantity gap between a product's licenses")
+    parser.add_argument("--servers-per-product", type=int, default=3,
+                        help="License servers each product is licensed on, drawn from license_server.csv "
+                             "(at most --max-gap + 1)")
+    parser.add_argument("--cap-rate", type=float, default=0.1,
+                        help="Share of license-days used up to the full quantity, which produce denials")
+    parser.add_argument("--gzip", action="store_true", help="Gzip the output files")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    clock = GenerationClock(args.as_of or time.strftime("%Y-%m-%d %H:%M:%S"))
+    date_to = args.date_to or clock.as_of
+    date_from = args.date_from or (clock.as_of - timedelta(days=30))
+    try:
+        window = DateWindow(date_from, date_to)
+        if not 0 <= args.cap_rate <= 1:
+            raise ValueError("--cap-rate must be between 0 and 1.")
+        started = time.perf_counter()
+        written = generate_dataset(args.output_dir, window, args.total_sum, args.max_gap, args.cap_rate,
+                                   args.gzip, clock, RandomStreams(args.seed), args.servers_per_product)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    elapsed = time.perf_counter() - started
+    for table, (path, count) in written.items():
+        print(f"{table:<18}{count:>10,} records  {path}")
+    print(f"{len(window)} days in {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
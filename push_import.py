@@ -0,0 +1,383 @@
+"""
+Push generated records straight to a ServiceNow-style import set REST endpoint.
+
+Records are generated as value tuples, turned into {column: value} rows with the columns
+of the CSV and JSONL sinks (constant fields included, see sinks.column_layout) and
+posted in batches as {"records": [...]} (the body of the
+import set API's insertMultiple). Batches are sent by a small pool of worker threads.
+Each worker keeps its own keep-alive connection. The number of batches in flight is
+bounded, so generation never runs far ahead of the network. Failed batches (connection
+errors, 429 and 5xx) are retried with exponential backoff and honour Retry-After.
+
+A local stub endpoint is included for trying it out without an instance.
+
+Examples:
+    python push_import.py stub --port 8080 --fail-rate 0.05
+    python push_import.py denial -n 100000 --url http://localhost:8080/api/now/import/u_denial/insertMultiple
+    PUSH_IMPORT_PASSWORD=... python push_import.py license -n 3000 --user admin \
+        --url https://dev12345.service-now.com/api/now/import/u_license_import/insertMultiple
+    python push_import.py usage_summary -n 20000 --seed 7        # no --url: push to an in-process stub
+"""
+import argparse
+import base64
+import http.client
+import importlib
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from batch_generate import TABLES, add_table_arguments, table_options, table_template
+from seeding import RandomStreams
+from sinks import column_names, row_getter
+
+BATCH_SIZE = 200
+WORKERS = 4
+RETRIES = 5
+BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 30.0
+PROGRESS_SECONDS = 5.0
+
+# Responses worth retrying; any other non-2xx status fails the push.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+PASSWORD_ENV = "PUSH_IMPORT_PASSWORD"
+
+
+class PushError(Exception):
+    """Raised when a batch is rejected or still fails after every retry."""
+
+
+class ImportClient:
+    """
+    A pooled HTTP client for one import endpoint: one keep-alive connection per thread.
+
+    Parameters:
+    url (str): Endpoint URL, http or https.
+    user, password (str): Basic auth credentials (optional).
+    timeout (float): Socket timeout in seconds.
+    """
+
+    def __init__(self, url, user=None, password=None, timeout=30.0):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Not an http(s) URL: {url}")
+        self.url = url
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path or "/"
+        if parts.query:
+            self.path += f"?{parts.query}"
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        if user:
+            token = base64.b64encode(f"{user}:{password or ''}".encode()).decode("ascii")
+            self.headers["Authorization"] = f"Basic {token}"
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self.connection_class(self.host, self.port, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def reset(self):
+        """Drops this thread's connection, e.g. after an error left it in an unknown state."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def post(self, body):
+        """
+        POSTs one request body on this thread's connection.
+
+        Returns:
+        tuple: (status, headers, response body bytes).
+        """
+        connection = self._connection()
+        try:
+            connection.request("POST", self.path, body=body, headers=self.headers)
+            response = connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.reset()
+            raise
+        if response.will_close:
+            self.reset()
+        return response.status, response.headers, data
+
+
+class PushStats:
+    """Thread-safe counters of one push."""
+
+    def __init__(self):
+        self.records = 0
+        self.batches = 0
+        self.retries = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_batch(self, records, size):
+        with self._lock:
+            self.records += records
+            self.batches += 1
+            self.bytes += size
+
+    def add_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def summary(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return (f"{self.records:,} records in {self.batches:,} batches, {self.retries} retries, "
+                f"{elapsed:.1f}s ({self.records / elapsed:,.0f} records/s, {self.bytes / elapsed / 1e6:.1f} MB/s)")
+
+
+def _retry_delay(attempt, backoff, headers=None):
+    """Seconds to wait before retry `attempt` (1-based): Retry-After when given, else jittered backoff."""
+    retry_after = headers.get("Retry-After") if headers is not None else None
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), MAX_BACKOFF_SECONDS)
+        except ValueError:
+            pass
+    return random.uniform(0, min(backoff * 2 ** (attempt - 1), MAX_BACKOFF_SECONDS))
+
+
+def send_batch(client, body, count, stats, retries=RETRIES, backoff=BACKOFF_SECONDS):
+    """
+    Sends one batch, retrying connection errors and retryable statuses.
+
+    Raises:
+    PushError: On a non-retryable status, or when every retry failed.
+    """
+    for attempt in range(retries + 1):
+        headers = None
+        try:
+            status, headers, data = client.post(body)
+        except (OSError, http.client.HTTPException) as e:
+            error = f"{type(e).__name__}: {e}"
+        else:
+            if 200 <= status < 300:
+                stats.add_batch(count, len(body))
+                return
+            error = f"HTTP {status}: {data[:200].decode('utf-8', 'replace')}"
+            if status not in RETRY_STATUSES:
+                raise PushError(error)
+        if attempt == retries:
+            break
+        stats.add_retry()
+        time.sleep(_retry_delay(attempt + 1, backoff, headers))
+    raise PushError(f"Gave up after {retries} retries: {error}")
+
+
+def iter_batches(rows, batch_size=BATCH_SIZE):
+    """Yields (JSON body, row count) for consecutive batches of rows."""
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        yield json.dumps({"records": batch}, separators=(",", ":")).encode("utf-8"), len(batch)
+
+
+def push_rows(client, rows, batch_size=BATCH_SIZE, workers=WORKERS, retries=RETRIES, backoff=BACKOFF_SECONDS,
+              progress=None, progress_seconds=PROGRESS_SECONDS):
+    """
+    Push rows in batches with at most 2 * workers batches in flight.
+
+    Parameters:
+    client (ImportClient): Endpoint to push to.
+    rows (iterable): {field: value} dicts.
+    batch_size (int): Rows per request.
+    workers (int): Concurrent requests.
+    retries (int): Retries per batch before the push fails.
+    backoff (float): Base of the exponential backoff, in seconds.
+    progress (callable): Called with the PushStats every progress_seconds.
+
+    Returns:
+    PushStats: Counters of the push.
+
+    Raises:
+    PushError: For the first batch that failed; no further batches are sent.
+    """
+    stats = PushStats()
+    last_report = time.perf_counter()
+    pending = set()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="push") as pool:
+        try:
+            for body, count in iter_batches(rows, batch_size):
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(pool.submit(send_batch, client, body, count, stats, retries, backoff))
+                if progress is not None and time.perf_counter() - last_report >= progress_seconds:
+                    progress(stats)
+                    last_report = time.perf_counter()
+            for future in pending:
+                future.result()
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+    return stats
+
+
+def generate_rows(table, num_records, streams=None, **options):
+    """
+    Yields num_records generated rows of `table` as {column: value} dicts.
+
+    Rows hold every column the CSV and JSONL sinks write, constant fields included, so a
+    pushed row matches the XML and CSV output of the same run.
+    """
+    module = importlib.import_module(TABLES[table].module)
+    template = table_template(table)
+    values = module.generate_values(1, num_records + 1, streams=streams or RandomStreams(), **options)
+    names, row = column_names(template), row_getter(template)
+    return (dict(zip(names, row(record))) for record in values)
+
+
+class StubImportServer(ThreadingHTTPServer):
+    """
+    A local stand-in for an import set endpoint that accepts {"records": [...]} POSTs.
+
+    Parameters:
+    port (int): Port to listen on; 0 picks a free one.
+    fail_rate (float): Share of requests answered with 503, to exercise retries.
+    latency (float): Seconds to wait before answering each request.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, fail_rate=0.0, latency=0.0, host="127.0.0.1"):
+        super().__init__((host, port), _StubHandler)
+        self.fail_rate = fail_rate
+        self.latency = latency
+        self.records = 0
+        self.requests = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/now/import/stub/insertMultiple"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if server.latency:
+            time.sleep(server.latency)
+        if random.random() < server.fail_rate:
+            with server.lock:
+                server.requests += 1
+                server.failures += 1
+            self._reply(503, {"error": "stub failure"}, {"Retry-After": "0"})
+            return
+        try:
+            records = json.loads(body)["records"]
+        except (ValueError, KeyError, TypeError):
+            self._reply(400, {"error": "expected a JSON object with a records list"})
+            return
+        with server.lock:
+            server.requests += 1
+            server.records += len(records)
+        self._reply(201, {"result": [{"status": "inserted"}] * len(records)})
+
+    def _reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Push generated records to an import set REST endpoint.")
+    sub = parser.add_subparsers(dest="table", required=True)
+    for table, spec in TABLES.items():
+        p = sub.add_parser(table, help=f"Push generated {spec.file_name[:-len('.xml')]} records")
+        p.add_argument("-n", "--num-records", type=int, required=True, help="Number of records to push")
+        p.add_argument("--url", help="insertMultiple endpoint URL (default: push to an in-process stub)")
+        p.add_argument("--user", help=f"Basic auth user; the password is read from ${PASSWORD_ENV}")
+        p.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Records per request")
+        p.add_argument("-j", "--workers", type=int, default=WORKERS, help="Concurrent requests")
+        p.add_argument("--retries", type=int, default=RETRIES, help="Retries per batch")
+        p.add_argument("--timeout", type=float, default=30.0, help="Socket timeout in seconds")
+        p.add_argument("--seed", type=int, help="Root seed for reproducible records")
+        add_table_arguments(p, table)
+    stub = sub.add_parser("stub", help="Serve a local stub endpoint until interrupted")
+    stub.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    stub.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    stub.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each answer")
+    return parser
+
+
+def serve_stub(args):
+    server = StubImportServer(args.port, args.fail_rate, args.latency)
+    print(f"Stub import endpoint at {server.url}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    print(f"Received {server.records:,} records in {server.requests:,} requests "
+          f"({server.failures} answered with 503)", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.table == "stub":
+        return serve_stub(args)
+    if args.num_records <= 0 or args.batch_size <= 0 or args.workers <= 0 or args.retries < 0:
+        print("--num-records, --batch-size and --workers must be positive and --retries not negative.",
+              file=sys.stderr)
+        return 2
+
+    stub = None
+    if args.url is None:
+        stub = StubImportServer()
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+    try:
+        client = ImportClient(args.url or stub.url, args.user, os.environ.get(PASSWORD_ENV), args.timeout)
+        rows = generate_rows(args.table, args.num_records, RandomStreams(args.seed, table=args.table),
+                             **table_options(args))
+        stats = push_rows(client, rows, args.batch_size, args.workers, args.retries,
+                          progress=lambda s: print(s.summary(), file=sys.stderr))
+    except (ValueError, PushError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        if stub is not None:
+            stub.shutdown()
+            stub.server_close()
+    print(f"Pushed {stats.summary()} to {client.url}")
+    if stub is not None:
+        print(f"Stub received {stub.records:,} records")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""
+Precompiled XML renderers for the unload record tables.
+
+Each table schema is declared once as a list of fields and compiled into a single
+%-format string with the constant fields baked in, so rendering a record only escapes
+and fills its varying values. The output is byte-compatible with building the same
+record through ET.SubElement calls and ET.tostring.
+"""
+from collections import namedtuple
+
+Field = namedtuple("Field", ["kind", "tag", "value", "safe"])
+
+CONST = "const"
+TEXT = "text"
+REF = "ref"
+
+
+def const(tag, value=None):
+    """A field whose text is the same in every record. None or "" renders as an empty element."""
+    return Field(CONST, tag, value, True)
+
+
+def text(tag, safe=False):
+    """A field with varying text. Use safe=True for values that never need escaping (dates, ids, counts)."""
+    return Field(TEXT, tag, None, safe)
+
+
+def ref(tag):
+    """A reference field: a display_value attribute plus a sys_id text."""
+    return Field(REF, tag, None, False)
+
+
+def escape_text(value):
+    """Escapes element text the same way ElementTree does."""
+    if value.__class__ is not str:
+        value = str(value)
+    if "&" in value:
+        value = value.replace("&", "&amp;")
+    if "<" in value:
+        value = value.replace("<", "&lt;")
+    if ">" in value:
+        value = value.replace(">", "&gt;")
+    return value
+
+
+def escape_attrib(value):
+    """Escapes an attribute value the same way ElementTree does."""
+    if value.__class__ is not str:
+        value = str(value)
+    if "&" in value:
+        value = value.replace("&", "&amp;")
+    if "<" in value:
+        value = value.replace("<", "&lt;")
+    if ">" in value:
+        value = value.replace(">", "&gt;")
+    if '"' in value:
+        value = value.replace('"', "&quot;")
+    if "\r" in value:
+        value = value.replace("\r", "&#13;")
+    if "\n" in value:
+        value = value.replace("\n", "&#10;")
+    if "\t" in value:
+        value = value.replace("\t", "&#09;")
+    return value
+
+
+def _as_str(value):
+    return value if value.__class__ is str else str(value)
+
+
+def _element(tag, body, attrib=None):
+    """Serializes one element the way ElementTree does, including the short empty form."""
+    attrs = "" if attrib is None else f' display_value="{attrib}"'
+    if body:
+        return f"<{tag}{attrs}>{body}</{tag}>"
+    return f"<{tag}{attrs} />"
+
+
+class RecordTemplate:
+    """
+    A compiled record layout for one table.
+
+    Parameters:
+    table (str): Record element name, e.g. "samp_eng_app_denial".
+    fields (list): Fields built with const(), text() and ref(), in document order.
+    action (str): Value of the record's action attribute.
+
+    The varying values are passed to render() as one sequence in document order; a ref
+    field takes two values, its display_value then its sys_id. `slots` lists their names,
+    with the display_value slot of a ref named "<tag>_display_value".
+    """
+
+    def __init__(self, table, fields, action="INSERT_OR_UPDATE"):
+        self.table = table
+        self.fields = list(fields)
+        self.action = action
+        self.slots = []
+        escapers = []
+        pieces = [f'<{table} action="{escape_attrib(action)}">']
+        for field in self.fields:
+            if field.kind == CONST:
+                body = "" if field.value is None else escape_text(field.value)
+                pieces.append(_element(field.tag, body).replace("%", "%%"))
+            elif field.kind == TEXT:
+                self.slots.append(field.tag)
+                escapers.append(_as_str if field.safe else escape_text)
+                pieces.append(f"<{field.tag}>%s</{field.tag}>")
+            elif field.kind == REF:
+                self.slots.extend([f"{field.tag}_display_value", field.tag])
+                escapers.extend([escape_attrib, escape_text])
+                pieces.append(f'<{field.tag} display_value="%s">%s</{field.tag}>')
+            else:
+                raise ValueError(f"Unknown field kind: {field.kind}")
+        pieces.append(f"</{table}>")
+        self._format = "".join(pieces)
+        self._escapers = tuple(escapers)
+
+    def render(self, values):
+        """Returns the serialized record for one sequence of slot values."""
+        escaped = [escape(value) for escape, value in zip(self._escapers, values)]
+        if len(escaped) != len(self.slots):
+            raise ValueError(f"{self.table} expects {len(self.slots)} values, got {len(escaped)}.")
+        if all(escaped):
+            return self._format % tuple(escaped)
+        return self._render_with_empty_values(escaped)
+
+    def _render_with_empty_values(self, escaped):
+        """Slow path for records with an empty value, which ElementTree writes as <tag />."""
+        values = iter(escaped)
+        pieces = [f'<{self.table} action="{escape_attrib(self.action)}">']
+        for field in self.fields:
+            if field.kind == CONST:
+                pieces.append(_element(field.tag, "" if field.value is None else escape_text(field.value)))
+            elif field.kind == TEXT:
+                pieces.append(_element(field.tag, next(values)))
+            else:
+                attrib = next(values)
+                pieces.append(_element(field.tag, next(values), attrib))
+        pieces.append(f"</{self.table}>")
+        return "".join(pieces)
+
+
+DENIAL = RecordTemplate("samp_eng_app_denial", [
+    const("additional_key"),
+    ref("computer"),
+    text("denial_date", safe=True),
+    text("denial_id", safe=True),
+    ref("discovery_model"),
+    ref("group"),
+    const("is_product_normalized", "true"),
+    text("last_denial_time", safe=True),
+    ref("license_server"),
+    ref("license_type"),
+    ref("norm_product"),
+    ref("norm_publisher"),
+    text("product"),
+    text("publisher"),
+    const("source", "OpeniT"),
+    const("sys_created_by", "admin"),
+    text("sys_created_on", safe=True),
+    text("sys_domain", safe=True),
+    const("sys_domain_path", "/"),
+    text("sys_id", safe=True),
+    text("sys_mod_count", safe=True),
+    const("sys_updated_by", "admin"),
+    text("sys_updated_on", safe=True),
+    text("total_denial_count", safe=True),
+    ref("user"),
+    const("version", "2020"),
+    ref("workstation"),
+])
+
+CONCURRENT_USAGE = RecordTemplate("samp_eng_app_concurrent_usage", [
+    text("conc_usage_id", safe=True),
+    text("concurrent_usage", safe=True),
+    ref("license"),
+    const("source", "OpeniT"),
+    const("sys_created_by", "admin"),
+    text("sys_created_on", safe=True),
+    text("sys_domain", safe=True),
+    const("sys_domain_path", "/"),
+    text("sys_id", safe=True),
+    text("sys_mod_count", safe=True),
+    const("sys_updated_by", "admin"),
+    text("sys_updated_on", safe=True),
+    text("usage_date", safe=True),
+])
+
+USAGE_SUMMARY = RecordTemplate("samp_eng_app_usage_summary", [
+    ref("norm_product"),
+    ref("norm_publisher"),
+    const("reporting_version", "v1"),
+    const("source", "OpeniT"),
+    const("sys_created_by", "admin"),
+    text("sys_created_on", safe=True),
+    text("sys_domain", safe=True),
+    const("sys_domain_path", "/"),
+    text("sys_id", safe=True),
+    text("sys_mod_count", safe=True),
+    const("sys_updated_by", "admin"),
+    text("sys_updated_on", safe=True),
+    text("total_idle_duration", safe=True),
+    text("total_sess_duration", safe=True),
+    text("usage_date", safe=True),
+    ref("user"),
+])
+
+LICENSE = RecordTemplate("samp_eng_app_license", [
+    const("active", "true"),
+    text("end_date", safe=True),
+    ref("eng_software_install"),
+    const("is_product_normalized", "true"),
+    text("license_id", safe=True),
+    ref("license_server"),
+    ref("license_type"),
+    ref("norm_product"),
+    ref("norm_publisher"),
+    const("parent_id", ""),
+    text("product"),
+    text("publisher"),
+    text("quantity", safe=True),
+    const("source", "OpeniT"),
+    text("start_date", safe=True),
+    const("sys_created_by", "admin"),
+    text("sys_created_on", safe=True),
+    text("sys_domain", safe=True),
+    const("sys_domain_path", "/"),
+    text("sys_id", safe=True),
+    text("sys_mod_count", safe=True),
+    const("sys_updated_by", "admin"),
+    text("sys_updated_on", safe=True),
+    text("version"),
+])
+
+TEMPLATES = {template.table: template for template in (DENIAL, CONCURRENT_USAGE, USAGE_SUMMARY, LICENSE)}
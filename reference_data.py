@@ -0,0 +1,268 @@
+"""
+Shared, cached reference data (users, discovery models, groups, servers, license types, ...).
+
+Each CSV is parsed once per process and kept as numpy column arrays. Generators draw
+row indices with one rng.integers call and gather only the columns a record needs, so
+no per-row dict is built on the sampling path. A binary snapshot is
+cached under .cache/reference/ and reused until the CSV's mtime or size changes, so
+Streamlit reruns and new worker processes skip the CSV parse. Files with identical
+content (e.g. the copies under license_usage/) share one table.
+
+Nothing here imports streamlit or pandas, so the generators start without them;
+report_error() only uses streamlit when the page runtime has already loaded it.
+
+When REFERENCE_DATA_DIR names a directory of scaled tables (see scale_reference.py),
+a table found there is memory-mapped in place of the CSV of the same name.
+"""
+import csv
+import hashlib
+import io
+import os
+import pickle
+import sys
+
+import numpy as np
+
+from instrumentation import stage
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, ".cache", "reference")
+SNAPSHOT_VERSION = 2
+REFERENCE_DATA_DIR = os.environ.get("REFERENCE_DATA_DIR")
+
+
+class EmptyDataError(ValueError):
+    """Raised when a CSV file has no header row."""
+
+
+def report_error(message):
+    """Shows message with st.error on a Streamlit page, or prints it to stderr from scripts."""
+    st = sys.modules.get("streamlit")
+    if st is not None:
+        st.error(message)
+    else:
+        print(message, file=sys.stderr)
+
+
+def column_array(values):
+    """
+    Returns a sequence of strings as a 1-d numpy object array.
+
+    Object arrays hold references to the parsed strings, so gathering a column by an
+    index array hands back the same str objects without decoding or copying text.
+    """
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def row_values(row, names):
+    """Returns the values of `names` in a {column: value} row as a tuple, as sample_values() gives them."""
+    return tuple(row[name] for name in names)
+
+
+class ReferenceTable:
+    """
+    A read-only reference table stored column by column.
+
+    Parameters:
+    name (str): Table name, usually the CSV file name.
+    columns (dict): Column name -> numpy object array (or sequence) of string values, all
+        of the same length.
+    digest (str): Content hash of the source file.
+    """
+
+    def __init__(self, name, columns, digest=None):
+        self.name = name
+        self.columns = {column: values if isinstance(values, np.ndarray) else column_array(values)
+                        for column, values in columns.items()}
+        self.digest = digest
+        self._length = len(next(iter(columns.values()))) if columns else 0
+        self._records = None
+
+    @classmethod
+    def empty(cls, name):
+        return cls(name, {})
+
+    def __len__(self):
+        return self._length
+
+    def column(self, name):
+        """Returns one column as a numpy object array."""
+        return self.columns[name]
+
+    def row(self, index):
+        """Returns one row as a {column: value} dict."""
+        return {name: values[index] for name, values in self.columns.items()}
+
+    def records(self):
+        """Returns every row as a dict, like DataFrame.to_dict(orient="records"). Built once and cached."""
+        if self._records is None:
+            names = list(self.columns)
+            columns = [values.tolist() for values in self.columns.values()]
+            self._records = [dict(zip(names, values)) for values in zip(*columns)]
+        return self._records
+
+    def sample_indices(self, count, rng=None):
+        """
+        Draw `count` row indices uniformly with replacement in one call.
+
+        Parameters:
+        count (int): Number of indices.
+        rng (numpy.random.Generator): Generator to draw from. Defaults to an unseeded one.
+
+        Returns:
+        numpy.ndarray: int64 row indices.
+        """
+        if not self._length:
+            raise IndexError(f"Cannot sample from the empty table {self.name!r}.")
+        rng = np.random.default_rng() if rng is None else rng
+        return rng.integers(0, self._length, size=count)
+
+    def take(self, name, indices):
+        """Returns the values of one column at `indices` as a list, gathered with one fancy index."""
+        return self.columns[name][np.asarray(indices, dtype=np.intp)].tolist()
+
+    def sample_values(self, count, rng=None, names=None):
+        """
+        Draw `count` rows uniformly with replacement and return them as value tuples.
+
+        Each named column is gathered by the drawn index array once, and the columns are
+        zipped, so a row costs one tuple rather than a dict.
+
+        Parameters:
+        count (int): Number of rows.
+        rng (numpy.random.Generator): See sample_indices().
+        names (sequence): Columns to return, in tuple order. Defaults to every column.
+
+        Returns:
+        iterator: `count` tuples of column values.
+        """
+        indices = self.sample_indices(count, rng)
+        return zip(*[self.take(name, indices) for name in (names or list(self.columns))])
+
+
+def rows_at(records, indices):
+    """
+    Returns [records[i] for i in indices].
+
+    records may be a list from ReferenceTable.records() or the lazy rows of a scaled
+    table, which are then read in one batch instead of row by row.
+    """
+    batch = getattr(records, "rows", None)
+    if batch is not None:
+        return batch(indices)
+    return [records[i] for i in indices]
+
+
+_tables = {}      # real path -> (mtime_ns, size, ReferenceTable)
+_by_digest = {}   # content digest -> ReferenceTable
+
+
+def resolve_path(file_name):
+    """
+    Resolves a reference file name relative to the repository directory.
+
+    A relative name is looked up in REFERENCE_DATA_DIR first: "user.csv" resolves to the
+    scaled table directory REFERENCE_DATA_DIR/user when one exists.
+    """
+    if os.path.isabs(file_name):
+        return file_name
+    if REFERENCE_DATA_DIR:
+        scaled = os.path.join(REFERENCE_DATA_DIR, os.path.splitext(file_name)[0])
+        if os.path.isfile(os.path.join(scaled, "meta.json")):
+            return scaled
+    return os.path.join(BASE_DIR, file_name)
+
+
+def _snapshot_path(path):
+    key = hashlib.sha1(os.path.realpath(path).encode()).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.pickle")
+
+
+def _parse_csv(path, data):
+    text = data.decode("utf-8-sig")
+    reader = csv.reader(io.StringIO(text, newline=""))
+    header = next(reader, None)
+    if not header:
+        raise EmptyDataError(f"No columns to parse from file {path}")
+    rows = [row for row in reader if row]
+    columns = {}
+    for position, name in enumerate(header):
+        columns[name] = column_array([row[position] if position < len(row) else "" for row in rows])
+    return columns
+
+
+def _read_snapshot(path, stat):
+    try:
+        with open(_snapshot_path(path), "rb") as handle:
+            snapshot = pickle.load(handle)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    if (snapshot.get("version") != SNAPSHOT_VERSION
+            or snapshot.get("mtime_ns") != stat.st_mtime_ns or snapshot.get("size") != stat.st_size):
+        return None
+    return snapshot
+
+
+def _write_snapshot(path, stat, digest, columns):
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "digest": digest,
+        "columns": columns,
+    }
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{_snapshot_path(path)}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as handle:
+            pickle.dump(snapshot, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, _snapshot_path(path))
+    except OSError:
+        # The snapshot is only an optimisation; a read-only checkout still works.
+        pass
+
+
+def load_table(file_name):
+    """
+    Return the ReferenceTable for a CSV file, loading it at most once per file change.
+
+    Scaled table directories are opened as scale_reference.MappedTable instead.
+
+    Raises FileNotFoundError if the file is missing and EmptyDataError if it has no header.
+    """
+    path = os.path.realpath(resolve_path(file_name))
+    if os.path.isdir(path):
+        stat = os.stat(os.path.join(path, "meta.json"))
+    else:
+        stat = os.stat(path)
+    cached = _tables.get(path)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    if os.path.isdir(path):
+        from scale_reference import MappedTable
+
+        with stage("reference_load"):
+            table = MappedTable(path)
+        _tables[path] = (stat.st_mtime_ns, stat.st_size, table)
+        return table
+
+    with stage("reference_load"):
+        snapshot = _read_snapshot(path, stat)
+        if snapshot is not None:
+            digest, columns = snapshot["digest"], snapshot["columns"]
+        else:
+            with open(path, "rb") as handle:
+                data = handle.read()
+            digest = hashlib.sha1(data).hexdigest()
+            columns = _parse_csv(path, data)
+            _write_snapshot(path, stat, digest, columns)
+
+    table = _by_digest.get(digest)
+    if table is None:
+        table = ReferenceTable(os.path.basename(path), columns, digest)
+        _by_digest[digest] = table
+    _tables[path] = (stat.st_mtime_ns, stat.st_size, table)
+    return table
@@ -0,0 +1,534 @@
+"""
+Incremental license utilization rollups: peak and average utilization, hours at cap,
+denial counts and days since the last day at the maximum, per license, license server
+and group, by day, by month and over all time.
+
+Inputs are turned into one observation table (OBSERVATION_COLUMNS) first:
+- controlled series frames from graph.py (Date, Quantity, Usage, Denial plus any key
+  columns), each point covering the time until the series' next point;
+- concurrent usage records, each a day's peak usage of a license;
+- denial records, counted against the license of their product and server.
+Records come from unload files or from the CSV/JSONL/Parquet files of sinks.py. The
+license records supply the quantity and server of each license.
+
+Observations of all licenses of a server (or group) at the same instant are added up
+first, so a server's utilization is its licenses' combined usage over their combined
+quantity. Every rollup is then a set of sums, maxima and minima, so rollups of
+separate batches merge exactly (merge_rollups). A RollupStore keeps one Parquet file
+per month plus the all-time totals. A new day of data only rewrites its own month's
+file and the totals. A later batch may add other licenses, servers or groups to a
+stored day, but each key's day must arrive in one update, since a later batch cannot
+be added into instants already summed.
+
+Examples:
+    python rollups.py update store --licenses dataset/samp_eng_app_license.xml \\
+        --usage dataset/samp_eng_app_concurrent_usage.xml --denials dataset/samp_eng_app_denial.xml
+    python rollups.py update store --series generated_graph_data.csv
+    python rollups.py report store --dimension server --period month
+    python rollups.py report store --dimension license --period all -o licenses.csv
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from clock import DATE_FORMAT
+
+DIMENSIONS = ("license", "server", "group")
+PERIODS = ("day", "month", "all")
+DAY_SECONDS = 24 * 60 * 60
+
+# graph.py's columns; any other column of a series frame identifies the series.
+SERIES_COLUMNS = ["Date", "Quantity", "Usage", "Denial"]
+
+# The record columns read (sinks.py column names).
+LICENSE_COLUMNS = ["sys_id", "norm_product", "norm_product_display_value", "license_server",
+                   "license_server_display_value", "quantity"]
+USAGE_COLUMNS = ["license", "license_display_value", "concurrent_usage", "usage_date"]
+DENIAL_COLUMNS = ["norm_product", "norm_product_display_value", "license_server", "license_server_display_value",
+                  "group", "group_display_value", "denial_date", "total_denial_count"]
+
+OBSERVATION_COLUMNS = ["time", "license", "license_name", "server", "server_name", "group", "group_name",
+                       "quantity", "usage", "denials", "seconds", "observed"]
+
+# A rollup row is identified by ROLLUP_KEYS and merged column by column with AGGREGATES.
+# start is the first day of the day or month, and NaT for the all-time totals.
+ROLLUP_KEYS = ["dimension", "key", "period", "start"]
+AGGREGATES = {
+    "name": "last",             # the newest display name
+    "observations": "sum",
+    "seconds": "sum",           # time covered by usage observations
+    "usage_seconds": "sum",     # usage x time, for the time-weighted average
+    "capacity_seconds": "sum",  # quantity x time
+    "peak_usage": "max",
+    "peak_quantity": "max",
+    "peak_utilization": "max",
+    "at_cap_seconds": "sum",
+    "denials": "sum",
+    "first": "min",
+    "last": "max",
+    "last_at_cap": "max",
+}
+ROLLUP_COLUMNS = ROLLUP_KEYS + list(AGGREGATES)
+
+REPORT_COLUMNS = ["dimension", "key", "name", "period", "start", "observations", "peak_usage", "peak_quantity",
+                  "peak_utilization", "avg_utilization", "hours_at_cap", "denials", "last_at_cap",
+                  "days_since_last_at_max"]
+
+STORE_VERSION = 1
+MANIFEST_FILE = "rollups.json"
+TOTALS_FILE = "totals.parquet"
+
+
+def read_records(path, columns):
+    """
+    Reads the given columns of a record file into a DataFrame of strings.
+
+    Parameters:
+    path (str): An unload (.xml, optionally .gz) or a sinks.py .csv/.jsonl(.gz)/.parquet file.
+    columns (list): Column names as in sinks.column_names(); missing fields read as "".
+    """
+    name = path[:-len(".gz")] if path.endswith(".gz") else path
+    if name.endswith(".parquet"):
+        return pd.read_parquet(path, columns=columns)
+    if name.endswith(".csv"):
+        return pd.read_csv(path, dtype=str, keep_default_na=False, usecols=columns)
+    if name.endswith(".jsonl"):
+        return pd.read_json(path, lines=True, dtype=False)[columns]
+
+    from validate_unload import iter_records, open_unload
+
+    data = {column: [] for column in columns}
+    with open_unload(path) as handle:
+        for _, _, fields, displays in iter_records(handle):
+            row = dict(fields)
+            for tag, display in displays.items():
+                row[f"{tag}_display_value"] = display
+            for column, values in data.items():
+                values.append(row.get(column, ""))
+    return pd.DataFrame(data, columns=columns)
+
+
+def license_catalog(licenses):
+    """
+    Returns the license table used to resolve usage and denials, indexed by license sys_id.
+
+    Parameters:
+    licenses (pd.DataFrame): License records with LICENSE_COLUMNS.
+
+    Returns:
+    pd.DataFrame: product, server, license_name, server_name and quantity per license.
+    """
+    catalog = pd.DataFrame({
+        "product": licenses["norm_product"].to_numpy(),
+        "server": licenses["license_server"].to_numpy(),
+        "license_name": (licenses["norm_product_display_value"] + " @ "
+                         + licenses["license_server_display_value"]).to_numpy(),
+        "server_name": licenses["license_server_display_value"].to_numpy(),
+        "quantity": pd.to_numeric(licenses["quantity"]).to_numpy(dtype=np.int64),
+    }, index=pd.Index(licenses["sys_id"].to_numpy(), name="license"))
+    return catalog[~catalog.index.duplicated(keep="last")]
+
+
+def _observations(**columns):
+    frame = pd.DataFrame(columns)
+    for name in ("license", "license_name", "server", "server_name", "group", "group_name"):
+        if name not in frame:
+            frame[name] = ""
+        else:
+            frame[name] = frame[name].fillna("").astype(str)
+    return frame[OBSERVATION_COLUMNS]
+
+
+def usage_observations(usage, licenses=None):
+    """
+    Returns one observation per concurrent usage record: the day's peak usage, covering the day.
+
+    Parameters:
+    usage (pd.DataFrame): Concurrent usage records with USAGE_COLUMNS.
+    licenses (pd.DataFrame): license_catalog(). Usage of a license missing from it keeps
+        its peak but has no quantity, so it adds no utilization or time at cap.
+    """
+    if licenses is None:
+        licenses = license_catalog(pd.DataFrame(columns=LICENSE_COLUMNS))
+    matched = usage[["license"]].join(licenses, on="license")
+    names = matched["license_name"].where(matched["license_name"].notna(), usage["license_display_value"])
+    return _observations(
+        time=pd.to_datetime(usage["usage_date"], format=DATE_FORMAT).to_numpy(),
+        license=usage["license"].to_numpy(),
+        license_name=names.to_numpy(),
+        server=matched["server"].to_numpy(),
+        server_name=matched["server_name"].to_numpy(),
+        quantity=matched["quantity"].fillna(0).to_numpy(dtype=np.int64),
+        usage=pd.to_numeric(usage["concurrent_usage"]).to_numpy(dtype=np.int64),
+        denials=0,
+        seconds=float(DAY_SECONDS),
+        observed=np.int8(1),
+    )
+
+
+def denial_observations(denials, licenses=None):
+    """
+    Returns one observation per denial record, holding its total_denial_count.
+
+    The denial is counted against the license of its product on its license server when
+    licenses (a license_catalog()) has one, and always against its server and group.
+    """
+    license_keys = pd.Series("", index=denials.index)
+    license_names = pd.Series("", index=denials.index)
+    if licenses is not None and len(licenses):
+        pairs = licenses.reset_index().drop_duplicates(["product", "server"]).set_index(["product", "server"])
+        matched = pairs.reindex(pd.MultiIndex.from_arrays([denials["norm_product"], denials["license_server"]]))
+        license_keys = pd.Series(matched["license"].fillna("").to_numpy(), index=denials.index)
+        license_names = pd.Series(matched["license_name"].fillna("").to_numpy(), index=denials.index)
+    return _observations(
+        time=pd.to_datetime(denials["denial_date"], format=DATE_FORMAT).to_numpy(),
+        license=license_keys.to_numpy(),
+        license_name=license_names.to_numpy(),
+        server=denials["license_server"].to_numpy(),
+        server_name=denials["license_server_display_value"].to_numpy(),
+        group=denials["group"].to_numpy(),
+        group_name=denials["group_display_value"].to_numpy(),
+        quantity=0,
+        usage=0,
+        denials=pd.to_numeric(denials["total_denial_count"]).to_numpy(dtype=np.int64),
+        seconds=0.0,
+        observed=np.int8(0),
+    )
+
+
+def series_observations(frame, license=None, server=None, group=None, name="series"):
+    """
+    Returns the observations of controlled series (graph.generate_controlled_data or
+    generate_controlled_batch frames, or graph.py's CSV).
+
+    Each point covers the time until the next point of its series; the last point covers
+    as long as the one before it, and a single point a day. That time is counted on the
+    day the point falls on, so with uneven points a day can show a little over or under
+    24 hours.
+
+    Parameters:
+    frame (pd.DataFrame): Date, Quantity, Usage and Denial columns, plus key columns.
+    license, server, group (str): Columns holding each point's license, server and group.
+        By default the license is the key columns joined with "|", or `name` when
+        there are none, and there is no server or group.
+    name (str): License of a frame without key columns.
+    """
+    frame = frame.reset_index(drop=True)
+    keys = [column for column in frame.columns if column not in SERIES_COLUMNS]
+    if license is not None:
+        licenses = frame[license].astype(str)
+    elif keys:
+        licenses = frame[keys].astype(str).agg("|".join, axis=1)
+    else:
+        licenses = pd.Series(name, index=frame.index)
+    dates = pd.to_datetime(frame["Date"])
+    following = dates.groupby(licenses, sort=False).shift(-1)
+    covered = following - dates
+    covered = covered.fillna(covered.groupby(licenses, sort=False).ffill()).fillna(pd.Timedelta(days=1))
+    return _observations(
+        time=dates.to_numpy(),
+        license=licenses.to_numpy(),
+        license_name=licenses.to_numpy(),
+        server=frame[server].astype(str).to_numpy() if server else "",
+        server_name=frame[server].astype(str).to_numpy() if server else "",
+        group=frame[group].astype(str).to_numpy() if group else "",
+        group_name=frame[group].astype(str).to_numpy() if group else "",
+        quantity=frame["Quantity"].to_numpy(dtype=np.int64),
+        usage=frame["Usage"].to_numpy(dtype=np.int64),
+        denials=frame["Denial"].to_numpy(dtype=np.int64),
+        seconds=covered.dt.total_seconds().to_numpy(),
+        observed=np.int8(1),
+    )
+
+
+def _points(observations, dimension):
+    """Adds up the observations of each key of `dimension` per instant and derives the per-point measures."""
+    observations = observations[observations[dimension] != ""]
+    points = observations.groupby([dimension, "time"], sort=False).agg(
+        quantity=("quantity", "sum"), usage=("usage", "sum"), denials=("denials", "sum"),
+        seconds=("seconds", "max"), observed=("observed", "max"),
+    ).reset_index()
+    names = observations.groupby(dimension, sort=False)[f"{dimension}_name"].last()
+
+    observed = points["observed"].to_numpy() > 0
+    quantity = points["quantity"].to_numpy(dtype=np.int64)
+    usage = points["usage"].to_numpy(dtype=np.int64)
+    seconds = np.where(observed, points["seconds"].to_numpy(dtype=np.float64), 0.0)
+    measured = observed & (quantity > 0)
+    at_cap = measured & (usage >= quantity)
+    times = points["time"]
+    return pd.DataFrame({
+        "key": points[dimension],
+        "time": times,
+        "observations": observed.astype(np.int64),
+        "seconds": seconds,
+        "usage_seconds": usage * seconds,
+        "capacity_seconds": np.where(measured, quantity * seconds, 0.0),
+        "peak_usage": usage,
+        "peak_quantity": quantity,
+        "peak_utilization": np.where(measured, usage / np.maximum(quantity, 1), np.nan),
+        "at_cap_seconds": np.where(at_cap, seconds, 0.0),
+        "denials": points["denials"].to_numpy(dtype=np.int64),
+        "first": times,
+        "last": times,
+        "last_at_cap": times.where(at_cap),
+    }), names
+
+
+def rollup(observations):
+    """
+    Aggregates observations per dimension key by day, by month and over all time.
+
+    Returns:
+    pd.DataFrame: ROLLUP_COLUMNS rows, ready for merge_rollups.
+    """
+    measures = {column: how for column, how in AGGREGATES.items() if column != "name"}
+    frames = []
+    for dimension in DIMENSIONS:
+        points, names = _points(observations, dimension)
+        if points.empty:
+            continue
+        starts = {
+            "day": points["time"].dt.floor("D"),
+            "month": points["time"].dt.to_period("M").dt.start_time,
+            "all": pd.Series(pd.NaT, index=points.index, dtype=points["time"].dtype),
+        }
+        for period, start in starts.items():
+            rows = points.assign(start=start).groupby(["key", "start"], sort=False, dropna=False).agg(measures)
+            rows = rows.reset_index()
+            rows["dimension"] = dimension
+            rows["period"] = period
+            rows["name"] = rows["key"].map(names)
+            frames.append(rows[ROLLUP_COLUMNS])
+    if not frames:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def merge_rollups(*rollups):
+    """Merges rollups of separate observation batches into one, row by ROLLUP_KEYS."""
+    frames = [frame for frame in rollups if frame is not None and len(frame)]
+    if not frames:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    if len(frames) == 1:
+        return frames[0][ROLLUP_COLUMNS].reset_index(drop=True)
+    merged = pd.concat(frames, ignore_index=True)
+    return merged.groupby(ROLLUP_KEYS, sort=False, dropna=False).agg(AGGREGATES).reset_index()[ROLLUP_COLUMNS]
+
+
+def with_metrics(rollups):
+    """
+    Returns the rollup rows with the reported measures, as REPORT_COLUMNS.
+
+    avg_utilization is usage over quantity, weighted by the time each observation
+    covers. days_since_last_at_max counts from the latest day at the maximum up to the
+    row's last observed day, looking back through the earlier rows of the same key;
+    it is empty for keys never at the maximum so far.
+    """
+    rows = rollups.sort_values(["dimension", "key", "period", "start"], na_position="first").reset_index(drop=True)
+    capacity = rows["capacity_seconds"].astype(float)
+    rows["avg_utilization"] = (rows["usage_seconds"] / capacity.where(capacity > 0)).astype(float)
+    rows["hours_at_cap"] = rows["at_cap_seconds"] / 3600
+    last_at_cap = rows.groupby(["dimension", "key", "period"], sort=False)["last_at_cap"].ffill()
+    rows["days_since_last_at_max"] = (rows["last"].dt.floor("D") - last_at_cap.dt.floor("D")).dt.days
+    return rows[REPORT_COLUMNS]
+
+
+def _stored_days(stored, rows):
+    """Returns the (dimension, key, start) of the day rows in `rows` that `stored` already has."""
+    columns = ["dimension", "key", "start"]
+    days = rows.loc[rows["period"] == "day", columns]
+    return days.merge(stored.loc[stored["period"] == "day", columns], on=columns)
+
+
+def _write_parquet(frame, path):
+    """Writes a frame to a temporary Parquet file next to path and returns its name."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    frame.to_parquet(tmp_path, index=False)
+    return tmp_path
+
+
+class RollupStore:
+    """
+    Stored rollups: months/<YYYY-MM>.parquet with the day and month rows of each month,
+    totals.parquet with the all-time rows, and rollups.json listing the stored days.
+
+    Parameters:
+    path (str): Store directory (created on the first update).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.days = set()
+        manifest = os.path.join(path, MANIFEST_FILE)
+        if os.path.exists(manifest):
+            with open(manifest, encoding="utf-8") as handle:
+                state = json.load(handle)
+            if state.get("version") != STORE_VERSION:
+                raise ValueError(f"{manifest} was written by an incompatible version.")
+            self.days = set(state["days"])
+
+    def month_path(self, month):
+        return os.path.join(self.path, "months", f"{month}.parquet")
+
+    def months(self):
+        """Returns the stored months (YYYY-MM), oldest first."""
+        return sorted({day[:7] for day in self.days})
+
+    def _read(self, path, filters=None):
+        if not os.path.exists(path):
+            return None
+        return pd.read_parquet(path, filters=filters)
+
+    def update(self, observations):
+        """
+        Adds a batch of observations.
+
+        The batch may cover stored days, as long as none of its licenses, servers or
+        groups already has rows for those days. Only the months the batch touches and
+        the totals are read and rewritten.
+
+        Returns:
+        list: The days the batch covers.
+
+        Raises:
+        ValueError: When a (dimension, key, day) of the batch is already stored.
+        """
+        # Only the distinct days and months are formatted, not every observation.
+        days = [str(day) for day in np.unique(observations["time"].to_numpy().astype("datetime64[D]"))]
+        if not days:
+            return []
+        partial = rollup(observations)
+        periodic = partial[partial["period"] != "all"]
+
+        months, repeated = [], []
+        for month, rows in periodic.groupby(periodic["start"].to_numpy().astype("datetime64[M]"), sort=True):
+            path = self.month_path(pd.Timestamp(month).strftime("%Y-%m"))
+            stored = self._read(path)
+            if stored is not None:
+                repeated.append(_stored_days(stored, rows))
+            months.append((stored, rows, path))
+        repeated = pd.concat(repeated, ignore_index=True) if repeated else []
+        if len(repeated):
+            shown = ", ".join(f"{row.dimension} {row.key} on {row.start:%Y-%m-%d}"
+                              for row in repeated.head(5).itertuples())
+            more = f" and {len(repeated) - 5:,} more" if len(repeated) > 5 else ""
+            raise ValueError(f"Already stored: {shown}{more}. "
+                             "Rebuild the store to change a stored day.")
+
+        os.makedirs(os.path.join(self.path, "months"), exist_ok=True)
+        replacements = [(_write_parquet(merge_rollups(stored, rows), path), path) for stored, rows, path in months]
+        totals_path = os.path.join(self.path, TOTALS_FILE)
+        totals = merge_rollups(self._read(totals_path), partial[partial["period"] == "all"])
+        replacements.append((_write_parquet(totals, totals_path), totals_path))
+        # Every file is written before any is replaced, and the manifest goes last.
+        for tmp_path, path in replacements:
+            os.replace(tmp_path, path)
+        self.days.update(days)
+        self._save()
+        return days
+
+    def _save(self):
+        tmp_path = os.path.join(self.path, f"{MANIFEST_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump({"version": STORE_VERSION, "days": sorted(self.days)}, handle, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, MANIFEST_FILE))
+
+    def rollups(self, dimension, period="month", last_month=None):
+        """Returns the stored rollup rows of one dimension and period, up to last_month (YYYY-MM)."""
+        if period == "all":
+            frames = [self._read(os.path.join(self.path, TOTALS_FILE), [("dimension", "==", dimension)])]
+        else:
+            months = [month for month in self.months() if last_month is None or month <= last_month]
+            filters = [("dimension", "==", dimension), ("period", "==", period)]
+            frames = [self._read(self.month_path(month), filters) for month in months]
+        frames = [frame for frame in frames if frame is not None]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=ROLLUP_COLUMNS)
+
+    def report(self, dimension, period="month", date_from=None, date_to=None):
+        """
+        Returns with_metrics() rows of one dimension and period, optionally limited to
+        the days or months starting within [date_from, date_to] (YYYY-MM-DD or YYYY-MM).
+
+        Earlier months are still read, so days_since_last_at_max looks back through them.
+        """
+        rows = with_metrics(self.rollups(dimension, period, None if date_to is None else str(date_to)[:7]))
+        if period != "all":
+            if date_from is not None:
+                rows = rows[rows["start"] >= pd.Timestamp(date_from)]
+            if date_to is not None:
+                rows = rows[rows["start"] <= pd.Timestamp(date_to)]
+        return rows.reset_index(drop=True)
+
+
+def _read_series(path):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Maintain and report incremental license utilization rollups.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    update = sub.add_parser("update", help="Add usage, denial and series files to a rollup store")
+    update.add_argument("store", help="Rollup store directory")
+    update.add_argument("--licenses", nargs="+", default=[], help="License files for quantities and servers")
+    update.add_argument("--usage", nargs="+", default=[], help="Concurrent usage files")
+    update.add_argument("--denials", nargs="+", default=[], help="Denial files")
+    update.add_argument("--series", nargs="+", default=[],
+                        help="Controlled series CSV/Parquet files (graph.py); a file without key columns is "
+                             "one license named after the file")
+    report = sub.add_parser("report", help="Print or save rollups with utilization measures")
+    report.add_argument("store", help="Rollup store directory")
+    report.add_argument("--dimension", choices=DIMENSIONS, default="license")
+    report.add_argument("--period", choices=PERIODS, default="month")
+    report.add_argument("--date-from", help="First day or month (YYYY-MM-DD or YYYY-MM)")
+    report.add_argument("--date-to", help="Last day or month")
+    report.add_argument("-o", "--output", help="Write the report to this CSV file instead of printing it")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        store = RollupStore(args.store)
+        if args.command == "report":
+            rows = store.report(args.dimension, args.period, args.date_from, args.date_to)
+            if args.output:
+                rows.to_csv(args.output, index=False)
+                print(f"Wrote {len(rows):,} rows to {args.output}")
+            else:
+                with pd.option_context("display.max_rows", 200, "display.width", 200):
+                    print(rows.to_string(index=False))
+            return 0
+
+        started = time.perf_counter()
+        if (args.usage or args.denials) and not args.licenses:
+            raise ValueError("--usage and --denials need --licenses for the quantities and servers.")
+        frames = [read_records(path, LICENSE_COLUMNS) for path in args.licenses]
+        licenses = license_catalog(pd.concat(frames, ignore_index=True)) if frames else None
+        observations = [usage_observations(read_records(path, USAGE_COLUMNS), licenses) for path in args.usage]
+        observations += [denial_observations(read_records(path, DENIAL_COLUMNS), licenses) for path in args.denials]
+        observations += [
+            series_observations(_read_series(path), name=os.path.splitext(os.path.basename(path))[0])
+            for path in args.series
+        ]
+        if not observations:
+            raise ValueError("Give --usage, --denials or --series files to add.")
+        days = store.update(pd.concat(observations, ignore_index=True))
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    elapsed = time.perf_counter() - started
+    span = f"{days[0]} to {days[-1]}" if days else "nothing"
+    print(f"Added {len(days)} days ({span}) to {args.store} in {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
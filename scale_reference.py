@@ -0,0 +1,385 @@
+"""
+Synthetic, large reference tables (users, groups, license servers, discovery models).
+
+The tables are written as memory-mapped columns instead of CSVs:
+- sys_id columns are 16 raw bytes per row;
+- repetitive text columns are int32 codes into a small vocabulary;
+- other text columns are one UTF-8 blob plus row offsets.
+
+MappedTable reads them with numpy mmap and offers the same sampling interface as
+reference_data.ReferenceTable, decoding only the rows that are drawn. Point
+REFERENCE_DATA_DIR at the output directory and every generator samples from the scaled
+tables instead of the CSVs.
+
+Examples:
+    python scale_reference.py -o scaled --users 2000000 --groups 5000 --servers 1000 --discovery 10000
+    REFERENCE_DATA_DIR=scaled python batch_generate.py denial -n 5000000 -o denial.xml.gz
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections.abc import Sequence
+
+import numpy as np
+
+from reference_data import BASE_DIR, load_table
+
+FORMAT_VERSION = 1
+SYS_ID_BYTES = 16
+
+DEPARTMENTS = ["Engineering", "Design", "Research", "Manufacturing", "Simulation", "IT", "Operations",
+               "Quality", "Test", "Tooling", "Analytics", "Support"]
+REGIONS = ["Central", "East", "West", "North", "South", "APAC", "EMEA", "LATAM"]
+
+
+class MappedColumn(Sequence):
+    """Read-only view of one column of a MappedTable; indexing decodes only the rows asked for."""
+
+    def __init__(self, table, name):
+        self.table = table
+        self.name = name
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.table.take(self.name, range(*index.indices(len(self))))
+        return self.table.take(self.name, [index])[0]
+
+
+class MappedRows(Sequence):
+    """Rows of a MappedTable as a sequence of dicts, built on access (random.choice works on it)."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.table.rows(range(*index.indices(len(self))))
+        return self.table.row(index)
+
+    def rows(self, indices):
+        """Returns the rows at `indices` in one batched read (see reference_data.rows_at)."""
+        return self.table.rows(indices)
+
+
+class MappedTable:
+    """
+    A reference table stored column by column in memory-mapped .npy files.
+
+    Parameters:
+    path (str): Table directory written by write_table().
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as handle:
+            meta = json.load(handle)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path} was written by an incompatible version of scale_reference.py.")
+        self.path = path
+        self.name = meta["name"]
+        self.digest = meta.get("digest")
+        self._length = meta["length"]
+        self._kinds = {column["name"]: column["kind"] for column in meta["columns"]}
+        self._arrays = {}
+        self._vocab = {}
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def column_names(self):
+        return list(self._kinds)
+
+    def _array(self, file_name):
+        array = self._arrays.get(file_name)
+        if array is None:
+            array = self._arrays[file_name] = np.load(os.path.join(self.path, file_name), mmap_mode="r")
+        return array
+
+    def _vocabulary(self, name):
+        vocab = self._vocab.get(name)
+        if vocab is None:
+            with open(os.path.join(self.path, f"{name}.vocab.json"), encoding="utf-8") as handle:
+                vocab = self._vocab[name] = json.load(handle)
+        return vocab
+
+    def column(self, name):
+        """Returns one column as a lazy sequence of values."""
+        if name not in self._kinds:
+            raise KeyError(name)
+        return MappedColumn(self, name)
+
+    def take(self, name, indices):
+        """Returns the values of one column at `indices` as a list of strings."""
+        kind = self._kinds[name]
+        indices = np.asarray(indices, dtype=np.int64)
+        # Negative indices count from the end, as for lists (the text offsets need it spelled out).
+        indices = np.where(indices < 0, indices + self._length, indices)
+        if kind == "sys_id":
+            digits = self._array(f"{name}.npy")[indices].tobytes().hex()
+            width = SYS_ID_BYTES * 2
+            return [digits[i:i + width] for i in range(0, len(digits), width)]
+        if kind == "dict":
+            vocab = self._vocabulary(name)
+            return [vocab[code] for code in self._array(f"{name}.codes.npy")[indices].tolist()]
+        offsets = self._array(f"{name}.offsets.npy")
+        starts, stops = offsets[indices], offsets[indices + 1]
+        lengths = stops - starts
+        # Gather every requested value's bytes with one fancy index, then cut the copy up.
+        ends = np.cumsum(lengths)
+        gather = np.arange(ends[-1] if len(ends) else 0) + np.repeat(starts - (ends - lengths), lengths)
+        blob = self._array(f"{name}.data.npy")[gather].tobytes()
+        bounds = [0] + ends.tolist()
+        return [blob[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(len(indices))]
+
+    def rows(self, indices):
+        """Returns the rows at `indices` as {column: value} dicts."""
+        names = self.column_names
+        columns = [self.take(name, indices) for name in names]
+        return [dict(zip(names, values)) for values in zip(*columns)]
+
+    def row(self, index):
+        """Returns one row as a {column: value} dict."""
+        return self.rows([index])[0]
+
+    def records(self):
+        """Returns the rows as a lazy sequence of dicts; nothing is loaded up front."""
+        return MappedRows(self)
+
+    def sample_indices(self, count, rng=None):
+        """Draw `count` row indices uniformly with replacement (see ReferenceTable.sample_indices)."""
+        if not self._length:
+            raise IndexError(f"Cannot sample from the empty table {self.name!r}.")
+        rng = np.random.default_rng() if rng is None else rng
+        return rng.integers(0, self._length, size=count)
+
+    def sample_values(self, count, rng=None, names=None):
+        """Returns `count` rows drawn uniformly with replacement as value tuples, decoding only those rows."""
+        indices = self.sample_indices(count, rng)
+        return zip(*[self.take(name, indices) for name in (names or self.column_names)])
+
+
+def write_table(path, name, columns):
+    """
+    Write a table directory.
+
+    Parameters:
+    path (str): Directory to write (created if missing).
+    name (str): Table name, e.g. "user.csv", so generators load it in place of that CSV.
+    columns (dict): Column name -> (kind, data), in column order, where kind is
+        "sys_id" with an (n, 16) uint8 array, "dict" with (codes, vocabulary), or
+        "text" with a list of strings.
+    """
+    os.makedirs(path, exist_ok=True)
+    meta_columns, length = [], None
+    for column, (kind, data) in columns.items():
+        if kind == "sys_id":
+            np.save(os.path.join(path, f"{column}.npy"), np.ascontiguousarray(data, dtype=np.uint8))
+            size = len(data)
+        elif kind == "dict":
+            codes, vocab = data
+            np.save(os.path.join(path, f"{column}.codes.npy"), np.asarray(codes, dtype=np.int32))
+            with open(os.path.join(path, f"{column}.vocab.json"), "w", encoding="utf-8") as handle:
+                json.dump(list(vocab), handle)
+            size = len(codes)
+        elif kind == "text":
+            encoded = [value.encode("utf-8") for value in data]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(value) for value in encoded], out=offsets[1:])
+            np.save(os.path.join(path, f"{column}.offsets.npy"), offsets)
+            np.save(os.path.join(path, f"{column}.data.npy"), np.frombuffer(b"".join(encoded), dtype=np.uint8))
+            size = len(encoded)
+        else:
+            raise ValueError(f"Unknown column kind {kind!r}.")
+        if length is not None and size != length:
+            raise ValueError(f"Column {column!r} has {size} rows, expected {length}.")
+        length = size
+        meta_columns.append({"name": column, "kind": kind})
+    meta = {"version": FORMAT_VERSION, "name": name, "length": length or 0, "columns": meta_columns,
+            "digest": f"scaled-{name}-{length}-{time.time_ns()}"}
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as handle:
+        json.dump(meta, handle, indent=2)
+
+
+def random_sys_ids(count, rng):
+    """Returns `count` random sys_ids as an (n, 16) uint8 array."""
+    return np.frombuffer(rng.bytes(count * SYS_ID_BYTES), dtype=np.uint8).reshape(count, SYS_ID_BYTES)
+
+
+def _name_pools():
+    """First and last names taken from data.json's display names."""
+    with open(os.path.join(BASE_DIR, "data.json"), encoding="utf-8") as handle:
+        people = json.load(handle)
+    firsts, lasts = set(), set()
+    for person in people:
+        # "Abel Tuter (Architect)" -> "Abel", "Tuter"; skip service accounts and odd names.
+        parts = re.sub(r"\s*\(.*\)", "", person.get("name", "")).split()
+        if len(parts) == 2 and all(part.isalpha() and len(part) <= 20 for part in parts):
+            firsts.add(parts[0])
+            lasts.add(parts[1])
+    return sorted(firsts), sorted(lasts)
+
+
+def scale_users(count, rng):
+    """Users with workstations and computers: "First Last", "FirstLast-PC", one sys_id each."""
+    firsts, lasts = _name_pools()
+    combinations = len(firsts) * len(lasts)
+    pairs = np.concatenate([rng.permutation(combinations) for _ in range(-(-count // combinations))])[:count]
+    rounds = np.arange(count) // combinations
+    users, workstations = [], []
+    for pair, round_number in zip(pairs.tolist(), rounds.tolist()):
+        first, last = firsts[pair // len(lasts)], lasts[pair % len(lasts)]
+        suffix = f" {round_number + 1}" if round_number else ""
+        users.append(f"{first} {last}{suffix}")
+        workstations.append(f"{first}{last}{suffix.strip()}-PC")
+    return {
+        "user": ("text", users),
+        "user_sys_id": ("sys_id", random_sys_ids(count, rng)),
+        "workstation": ("text", workstations),
+        "workstation_sys_id": ("sys_id", random_sys_ids(count, rng)),
+        "computer_name": ("text", workstations),
+        "computer_sys_id": ("sys_id", random_sys_ids(count, rng)),
+    }
+
+
+def _numbered(names, count):
+    """names, then "<name> 2", "<name> 3", ... until there are `count` of them."""
+    return [names[i % len(names)] + (f" {i // len(names) + 1}" if i >= len(names) else "") for i in range(count)]
+
+
+def scale_groups(count, rng):
+    names = _numbered([f"{department} {region}" for department in DEPARTMENTS for region in REGIONS], count)
+    return {"group": ("text", names), "group_sys_id": ("sys_id", random_sys_ids(count, rng))}
+
+
+def scale_servers(count, rng):
+    names = _numbered([f"LMS {region}" for region in REGIONS], count)
+    return {"license_server": ("text", names), "license_server_sys_id": ("sys_id", random_sys_ids(count, rng))}
+
+
+def _base_products():
+    """Distinct product rows from discovery.csv, products.csv and publisher_group.json."""
+    bases = {}
+    for row in load_table("discovery.csv").records():
+        bases.setdefault(row["discovery_model"], dict(row))
+    extra = list(load_table("products.csv").records())
+    with open(os.path.join(BASE_DIR, "publisher_group.json"), encoding="utf-8") as handle:
+        extra += json.load(handle)
+    for row in extra:
+        if row["discovery_model"] not in bases:
+            version = row["discovery_model"].rsplit(" ", 1)[-1] if " " in row["discovery_model"] else "1"
+            bases[row["discovery_model"]] = dict(row, software_install=row["product"], version1=version)
+    return list(bases.values())
+
+
+def scale_discovery(count, rng):
+    """
+    Discovery models: every base product, then further versions of them.
+
+    Products keep one norm_product/norm_publisher sys_id across their versions, while
+    each model gets its own discovery, software install and license sys_ids.
+    """
+    bases = _base_products()
+    product_ids = {}
+    publisher_ids = {}
+    for base in bases:
+        product_ids.setdefault(base["norm_product"], base.get("norm_product_sys_id"))
+        publisher_ids.setdefault(base["norm_publisher"], base.get("norm_publisher_sys_id"))
+    for ids in (product_ids, publisher_ids):
+        for key, value in ids.items():
+            ids[key] = bytes.fromhex(value) if value else rng.bytes(SYS_ID_BYTES)
+
+    vocab = {name: [] for name in ("norm_publisher", "norm_product", "publisher", "product", "software_install")}
+    lookup = {name: {} for name in vocab}
+
+    def code(column, value):
+        codes = lookup[column]
+        if value not in codes:
+            codes[value] = len(vocab[column])
+            vocab[column].append(value)
+        return codes[value]
+
+    base_codes = [{column: code(column, base[column]) for column in vocab} for base in bases]
+    models, versions = [], []
+    codes = {column: np.empty(count, dtype=np.int32) for column in vocab}
+    norm_product_ids = np.empty((count, SYS_ID_BYTES), dtype=np.uint8)
+    norm_publisher_ids = np.empty((count, SYS_ID_BYTES), dtype=np.uint8)
+    for i in range(count):
+        base = bases[i % len(bases)]
+        release = i // len(bases)
+        if release == 0:
+            model, version = base["discovery_model"], base["version1"]
+        else:
+            version = f"{2015 + release % 11}.{release // 11}"
+            model = f"{base['product']} {version}"
+        models.append(model)
+        versions.append(version)
+        for column in vocab:
+            codes[column][i] = base_codes[i % len(bases)][column]
+        norm_product_ids[i] = np.frombuffer(product_ids[base["norm_product"]], dtype=np.uint8)
+        norm_publisher_ids[i] = np.frombuffer(publisher_ids[base["norm_publisher"]], dtype=np.uint8)
+
+    version_codes = {}
+    version_column = np.array([version_codes.setdefault(v, len(version_codes)) for v in versions], dtype=np.int32)
+    version_vocab = sorted(version_codes, key=version_codes.get)
+    return {
+        "discovery_model": ("text", models),
+        "discovery_sys_id": ("sys_id", random_sys_ids(count, rng)),
+        "norm_publisher": ("dict", (codes["norm_publisher"], vocab["norm_publisher"])),
+        "norm_publisher_sys_id": ("sys_id", norm_publisher_ids),
+        "norm_product": ("dict", (codes["norm_product"], vocab["norm_product"])),
+        "norm_product_sys_id": ("sys_id", norm_product_ids),
+        "publisher": ("dict", (codes["publisher"], vocab["publisher"])),
+        "product": ("dict", (codes["product"], vocab["product"])),
+        "software_install": ("dict", (codes["software_install"], vocab["software_install"])),
+        "software_install_sys_id": ("sys_id", random_sys_ids(count, rng)),
+        "version1": ("dict", (version_column, version_vocab)),
+        "license_sys_id": ("sys_id", random_sys_ids(count, rng)),
+    }
+
+
+# Output table -> (CSV it replaces, builder).
+SCALERS = {
+    "user": ("user.csv", scale_users),
+    "group": ("group.csv", scale_groups),
+    "license_server": ("license_server.csv", scale_servers),
+    "discovery": ("discovery.csv", scale_discovery),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Write large, memory-mapped reference tables.")
+    parser.add_argument("-o", "--output-dir", required=True, help="Directory for the tables (REFERENCE_DATA_DIR)")
+    parser.add_argument("--users", type=int, default=1000000, help="Users (each with a workstation and computer)")
+    parser.add_argument("--groups", type=int, default=1000, help="Groups")
+    parser.add_argument("--servers", type=int, default=1000, help="License servers")
+    parser.add_argument("--discovery", type=int, default=5000, help="Discovery models")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible tables")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    counts = {"user": args.users, "group": args.groups, "license_server": args.servers, "discovery": args.discovery}
+    rng = np.random.default_rng(args.seed)
+    for table, count in counts.items():
+        if count <= 0:
+            continue
+        started = time.perf_counter()
+        file_name, build = SCALERS[table]
+        path = os.path.join(args.output_dir, os.path.splitext(file_name)[0])
+        write_table(path, file_name, build(count, rng))
+        print(f"{table:<16}{count:>12,} rows  {path}  ({time.perf_counter() - started:.1f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import hashlib
+import random
+
+import sys_ids
+
+# The independent random streams a generator draws from.
+STREAM_NAMES = ("picks", "counts", "durations", "dates", "quantities", "ids", "series")
+
+
+def derive_seed(seed, *path):
+    """
+    Derive a 64-bit seed from a root seed and a path such as (shard, "picks").
+
+    The derivation is a hash, so every (seed, path) pair gets an unrelated stream, and
+    any one of them can be recreated without replaying the others.
+    """
+    key = repr((seed,) + path).encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big")
+
+
+class RandomStreams:
+    """
+    Named, independent random streams split from one root seed.
+
+    Each part of a record draws from its own stream (reference picks, counts, durations,
+    dates, quantities, sys_ids, graph series), and every shard of a run gets its own set,
+    so shard k of a seeded run can be regenerated on its own and gives the same records.
+
+    Without a seed every stream is the global random module and sys_ids come from the
+    process-wide generator, which is how the scripts behave when no seed is given.
+
+    The sys_id stream is also keyed by the table, so separate runs of different tables
+    with the same seed (and shard) issue different sys_ids and their records can be
+    joined and imported side by side.
+
+    Parameters:
+    seed (int): Root seed. None keeps the unseeded behaviour.
+    shard (int): Shard number; also the sys_id namespace of the shard.
+    table (str): Table the records are generated for, e.g. "denial". Streams shared by
+        several tables in one run (pipeline.py) leave it unset and draw every sys_id
+        from one generator.
+    """
+
+    def __init__(self, seed=None, shard=0, table=None):
+        self.seed = seed
+        self.shard = shard
+        self.table = table
+        self._streams = {}
+        self._numpy = {}
+        self._sys_ids = None
+
+    @property
+    def seeded(self):
+        return self.seed is not None
+
+    def spawn(self, shard):
+        """Returns the streams of another shard of the same run."""
+        return RandomStreams(self.seed, shard, self.table)
+
+    def stream(self, name):
+        """Returns the random.Random (or the random module, when unseeded) for one stream."""
+        if not self.seeded:
+            return random
+        rng = self._streams.get(name)
+        if rng is None:
+            rng = self._streams[name] = random.Random(derive_seed(self.seed, self.shard, name))
+        return rng
+
+    def numpy(self, name="series"):
+        """Returns a numpy Generator for one stream."""
+        rng = self._numpy.get(name)
+        if rng is None:
+            import numpy as np
+
+            seed = derive_seed(self.seed, self.shard, "numpy", name) if self.seeded else None
+            rng = self._numpy[name] = np.random.default_rng(seed)
+        return rng
+
+    @property
+    def picks(self):
+        return self.stream("picks")
+
+    @property
+    def counts(self):
+        return self.stream("counts")
+
+    @property
+    def durations(self):
+        return self.stream("durations")
+
+    @property
+    def dates(self):
+        return self.stream("dates")
+
+    @property
+    def quantities(self):
+        return self.stream("quantities")
+
+    def _id_generator(self):
+        if self._sys_ids is None:
+            rng = random.Random(derive_seed(self.seed, self.shard, "ids", self.table))
+            self._sys_ids = sys_ids.SysIdGenerator(self.shard, rng=rng)
+        return self._sys_ids
+
+    def new_sys_id(self):
+        """Returns a new sys_id: from this shard and table's seeded generator, or the process-wide one."""
+        if not self.seeded:
+            return sys_ids.new_sys_id()
+        return self._id_generator().next_id()
+
+    def new_sys_ids(self, count):
+        """Returns `count` new sys_ids in one block (see new_sys_id)."""
+        if not self.seeded:
+            return sys_ids.new_sys_ids(count)
+        return self._id_generator().take(count)
+
+
+def parse_seed(text):
+    """Parses an optional seed from user input: "" -> None, otherwise a non-negative int."""
+    text = (text or "").strip()
+    if not text:
+        return None
+    if not text.isdigit():
+        raise ValueError("The seed must be a non-negative whole number.")
+    return int(text)
@@ -0,0 +1,294 @@
+"""
+Event-driven session simulator behind usage summaries and concurrency peaks.
+
+Sessions are simulated a day at a time and kept in flat numpy arrays (user, license,
+start, stop, idle seconds), never as Python objects, so tens of millions of sessions fit
+in memory. Sessions still running at midnight are split: the rest carries over into the
+next day. From one day's sessions a sorted sweep over their start/stop events gives the
+exact peak concurrency of every license. Grouped sums give each user's
+total_sess_duration and total_idle_duration per license and day.
+
+Examples:
+    python session_sim.py --date-from 2024-12-01 --date-to 2024-12-31 -o sessions
+    python session_sim.py --date-from 2024-01-01 --date-to 2024-12-31 --users 200000 --stats-only
+"""
+import argparse
+import os
+import sys
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+import numpy as np
+
+import concurrent_usage
+import usage_summary
+from batch_generate import TABLES
+from clock import DATE_FORMAT, DateWindow, GenerationClock
+from record_templates import CONCURRENT_USAGE, USAGE_SUMMARY
+from reference_data import row_values, rows_at
+from seeding import RandomStreams
+from unload_writer import UnloadWriter
+
+SECONDS_PER_DAY = 86400
+# Event keys pack (license, second, is_start) into one int64: 18 bits hold the second of
+# the day, one bit the event type (stops sort before starts at the same second, so
+# sessions are half-open), and the rest the license.
+TIME_SHIFT = 1
+LICENSE_SHIFT = 18
+
+# One day's sessions, column-wise; every array has one entry per session.
+Sessions = namedtuple("Sessions", ["user", "license", "start", "stop", "idle"])
+# One day's results: per-(user, license) totals and per-license peaks.
+DayResult = namedtuple("DayResult", ["date", "sessions", "user", "license", "session_seconds", "idle_seconds",
+                                     "peaks"])
+
+
+def simulate_sessions(num_users, num_licenses, rng, active_rate=0.6, sessions_per_user=2.0,
+                      median_minutes=45, license_weights=None, carried=None):
+    """
+    Draw one day of sessions.
+
+    Each user is active with probability active_rate and then opens 1 + Poisson(sessions_per_user - 1)
+    sessions. Sessions start around the working day (08:00-18:00, most around late morning),
+    last a log-normal time with the given median, and are idle for a Beta(2, 5) share of it.
+    Sessions carried over from the previous day (see split_at_midnight) start at midnight
+    and keep their idle share. A user's sessions on the same license never overlap: each is
+    cut at the next one's start.
+
+    Returns:
+    Sessions: Arrays sorted by (user, license, start), times in seconds since midnight. A
+    stop past SECONDS_PER_DAY means the session runs into the next day.
+    """
+    active = np.flatnonzero(rng.random(num_users) < active_rate)
+    per_user = 1 + rng.poisson(max(sessions_per_user - 1, 0), size=len(active))
+    user = np.repeat(active, per_user).astype(np.int32)
+    count = len(user)
+
+    if license_weights is None:
+        license = rng.integers(0, num_licenses, size=count, dtype=np.int32)
+    else:
+        weights = np.asarray(license_weights, dtype=np.float64)
+        license = np.searchsorted(np.cumsum(weights / weights.sum()), rng.random(count)).astype(np.int32)
+        license = np.minimum(license, num_licenses - 1)
+    start = np.clip(rng.normal(11.5 * 3600, 2.5 * 3600, size=count), 8 * 3600, 18 * 3600).astype(np.int32)
+    duration = np.clip(rng.lognormal(np.log(median_minutes * 60), 0.8, size=count), 60, None)
+    stop = (start + duration).astype(np.int32)
+    share = rng.beta(2, 5, size=count)
+    if carried is not None and len(carried.user):
+        user = np.concatenate([carried.user, user])
+        license = np.concatenate([carried.license, license])
+        start = np.concatenate([carried.start, start])
+        stop = np.concatenate([carried.stop, stop])
+        share = np.concatenate([carried.idle / (carried.stop - carried.start), share])
+
+    # Sort by (user, license, start) and cut overlapping sessions of the same user and license.
+    key = (user.astype(np.int64) * num_licenses + license) * SECONDS_PER_DAY + start
+    order = np.argsort(key, kind="stable")
+    user, license, start, stop, share, key = (user[order], license[order], start[order], stop[order], share[order],
+                                              key[order])
+    same_group = (key[1:] // SECONDS_PER_DAY) == (key[:-1] // SECONDS_PER_DAY)
+    stop[:-1] = np.where(same_group, np.minimum(stop[:-1], start[1:]), stop[:-1])
+    keep = stop > start
+    user, license, start, stop, share = user[keep], license[keep], start[keep], stop[keep], share[keep]
+
+    idle = ((stop - start) * share).astype(np.int32)
+    return Sessions(user, license, start, stop, idle)
+
+
+def split_at_midnight(sessions):
+    """
+    Split sessions that run past midnight into today's part and the rest.
+
+    Idle seconds are shared between the two parts in proportion to their length.
+
+    Returns:
+    tuple: (today, carried) Sessions. today ends by SECONDS_PER_DAY; carried holds the
+    rest of the sessions that ran past it, starting at 0 of the next day, in the same order.
+    """
+    over = sessions.stop > SECONDS_PER_DAY
+    stop = np.minimum(sessions.stop, SECONDS_PER_DAY)
+    length = (sessions.stop - sessions.start).astype(np.int64)
+    idle = (sessions.idle * (stop - sessions.start).astype(np.int64) // length).astype(np.int32)
+    today = Sessions(sessions.user, sessions.license, sessions.start, stop, idle)
+    carried = Sessions(sessions.user[over], sessions.license[over], np.zeros(np.count_nonzero(over), dtype=np.int32),
+                       sessions.stop[over] - SECONDS_PER_DAY, (sessions.idle - idle)[over])
+    return today, carried
+
+
+def concurrency_peaks(license, start, stop, num_licenses):
+    """
+    Exact peak number of simultaneous sessions per license, by a sorted event sweep.
+
+    Every session contributes a +1 event at start and a -1 event at stop. The events are
+    packed into int64 keys and sorted once. Each license's events sum to zero, so a single
+    running sum over all of them restarts at 0 for every license, and the peak of each
+    license is the maximum of its slice.
+
+    Returns:
+    np.ndarray: Peak per license (0 for licenses without sessions).
+    """
+    peaks = np.zeros(num_licenses, dtype=np.int64)
+    if not len(start):
+        return peaks
+    license = license.astype(np.int64) << LICENSE_SHIFT
+    keys = np.concatenate([
+        ((license | start.astype(np.int64)) << TIME_SHIFT) | 1,  # starts
+        (license | stop.astype(np.int64)) << TIME_SHIFT,  # stops sort first at the same second
+    ])
+    keys.sort()
+    running = np.cumsum((keys & 1) * 2 - 1)
+    event_license = keys >> (LICENSE_SHIFT + TIME_SHIFT)
+    boundaries = np.flatnonzero(np.r_[True, event_license[1:] != event_license[:-1]])
+    peaks[event_license[boundaries]] = np.maximum.reduceat(running, boundaries)
+    return peaks
+
+
+def daily_totals(sessions, num_licenses):
+    """
+    Sum session and idle seconds per (user, license).
+
+    Returns:
+    tuple: (user, license, session_seconds, idle_seconds) arrays, one entry per pair.
+    """
+    if not len(sessions.user):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    # Sessions are already sorted by (user, license), so each pair is one contiguous run.
+    key = sessions.user.astype(np.int64) * num_licenses + sessions.license
+    boundaries = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    session_seconds = np.add.reduceat((sessions.stop - sessions.start).astype(np.int64), boundaries)
+    idle_seconds = np.add.reduceat(sessions.idle.astype(np.int64), boundaries)
+    return sessions.user[boundaries], sessions.license[boundaries], session_seconds, idle_seconds
+
+
+def simulate(date_window, num_users, num_licenses, rng=None, **options):
+    """
+    Simulate every day of date_window, one day in memory at a time.
+
+    Parameters:
+    date_window (clock.DateWindow): Days to simulate.
+    num_users, num_licenses (int): Population sizes; users and licenses are row indices.
+    rng (np.random.Generator | int): Random generator or seed.
+    options: Passed to simulate_sessions (active_rate, sessions_per_user, ...).
+
+    Yields:
+    DayResult: Per-day totals and peaks. A session running past midnight counts towards
+    each day for the time it ran on that day.
+    """
+    if num_users < 1 or num_licenses < 1:
+        raise ValueError("At least one user and one license are needed.")
+    if num_licenses >= 1 << (63 - LICENSE_SHIFT - TIME_SHIFT):
+        raise ValueError("Too many licenses for the event sweep.")
+    rng = np.random.default_rng(rng)
+    carried = None
+    for offset in range(len(date_window)):
+        day = (date_window.start + timedelta(days=offset)).strftime(DATE_FORMAT)
+        sessions, carried = split_at_midnight(
+            simulate_sessions(num_users, num_licenses, rng, carried=carried, **options))
+        peaks = concurrency_peaks(sessions.license, sessions.start, sessions.stop, num_licenses)
+        user, license, session_seconds, idle_seconds = daily_totals(sessions, num_licenses)
+        yield DayResult(day, len(sessions.user), user, license, session_seconds, idle_seconds, peaks)
+
+
+def generate_simulated_records(days, users, licenses, base_date=usage_summary.BASE_DATE, clock=None, streams=None):
+    """
+    Yield ("usage_summary" | "concurrent_usage", record) pairs for simulated days.
+
+    One usage summary per user, license and day with that day's session and idle totals
+    (offset from base_date, as usage_summary.py writes them), and one concurrent usage per
+    license and day with its exact peak, for licenses that were used.
+    """
+    clock = clock or GenerationClock()
+    streams = streams or RandomStreams()
+    licenses = rows_at(licenses, range(len(licenses)))
+    summary_refs = [row_values(license, usage_summary.DISCOVERY_COLUMNS) for license in licenses]
+    usage_refs = [row_values(license, concurrent_usage.DISCOVERY_COLUMNS) for license in licenses]
+    summary_num = usage_num = 0
+    for result in days:
+        day_users = rows_at(users, result.user.tolist())
+        for user, license, session_seconds, idle_seconds in zip(
+                day_users, result.license.tolist(),
+                result.session_seconds.tolist(), result.idle_seconds.tolist()):
+            summary_num += 1
+            durations = (timedelta(seconds=idle_seconds), timedelta(seconds=session_seconds))
+            values = usage_summary.generate_record_values(
+                summary_num, base_date, clock, picks=(row_values(user, usage_summary.USER_COLUMNS),
+                                                      summary_refs[license]), streams=streams,
+                usage_date=result.date, durations=durations)
+            yield "usage_summary", USAGE_SUMMARY.render(values)
+        for license in np.flatnonzero(result.peaks).tolist():
+            usage_num += 1
+            values = concurrent_usage.generate_record_values(
+                usage_num, clock, discovery=usage_refs[license], streams=streams, usage_date=result.date,
+                concurrent_usage=int(result.peaks[license]))
+            yield "concurrent_usage", CONCURRENT_USAGE.render(values)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Simulate user sessions and write usage summaries and peaks.")
+    parser.add_argument("-o", "--output-dir", default=".", help="Directory for the two unload files")
+    parser.add_argument("--date-from", help="First day (default: 30 days before the as-of date)")
+    parser.add_argument("--date-to", help="Last day (default: the as-of date)")
+    parser.add_argument("--as-of", help="Timestamp every record with this time (default: now)")
+    parser.add_argument("--users", type=int, help="Users to simulate (default: every row of user.csv)")
+    parser.add_argument("--active-rate", type=float, default=0.6, help="Share of users active on a day")
+    parser.add_argument("--sessions-per-user", type=float, default=2.0, help="Mean sessions of an active user")
+    parser.add_argument("--median-minutes", type=float, default=45, help="Median session length")
+    parser.add_argument("--seed", type=int, help="Root seed for a reproducible simulation")
+    parser.add_argument("--stats-only", action="store_true",
+                        help="Only simulate and print totals (allows more users than user.csv has)")
+    parser.add_argument("--gzip", action="store_true", help="Gzip the output files")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    clock = GenerationClock(args.as_of or time.strftime("%Y-%m-%d %H:%M:%S"))
+    date_to = args.date_to or clock.as_of
+    date_from = args.date_from or (clock.as_of - timedelta(days=30))
+    users = usage_summary.USER_NAMES
+    licenses = usage_summary.DISCOVERY_MODELS
+    num_users = args.users or len(users)
+    streams = RandomStreams(args.seed)
+    options = dict(active_rate=args.active_rate, sessions_per_user=args.sessions_per_user,
+                   median_minutes=args.median_minutes)
+    started = time.perf_counter()
+    try:
+        window = DateWindow(date_from, date_to)
+        if not args.stats_only and num_users > len(users):
+            raise ValueError(f"user.csv has only {len(users)} users; use --stats-only to simulate more.")
+        days = simulate(window, num_users, len(licenses), streams.numpy("sessions"), **options)
+        if args.stats_only:
+            sessions = pairs = 0
+            peaks = np.zeros(len(licenses), dtype=np.int64)
+            for result in days:
+                sessions += result.sessions
+                pairs += len(result.user)
+                np.maximum(peaks, result.peaks, out=peaks)
+            print(f"{sessions:,} sessions, {pairs:,} user-license-days over {len(window)} days "
+                  f"in {time.perf_counter() - started:.1f}s")
+            print(f"Highest daily peak per license: {peaks.tolist()}")
+            return 0
+
+        os.makedirs(args.output_dir, exist_ok=True)
+        suffix = ".gz" if args.gzip else ""
+        tables = ("usage_summary", "concurrent_usage")
+        paths = {table: os.path.join(args.output_dir, TABLES[table].file_name + suffix) for table in tables}
+        unload_date = clock.stamp().second
+        with UnloadWriter(paths["usage_summary"], unload_date, args.gzip) as summary_writer, \
+                UnloadWriter(paths["concurrent_usage"], unload_date, args.gzip) as usage_writer:
+            writers = {"usage_summary": summary_writer, "concurrent_usage": usage_writer}
+            for table, record in generate_simulated_records(days, users, licenses, clock=clock, streams=streams):
+                writers[table].write(record)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    for table in tables:
+        print(f"{table:<18}{writers[table].count:>10,} records  {paths[table]}")
+    print(f"{len(window)} days in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,393 @@
+"""
+Output sinks: write generated record values as XML, CSV, JSONL or Parquet.
+
+Every generator yields its records as value tuples in RecordTemplate slot order
+(generate_values). A sink takes those tuples in batches and writes them without
+building an element per record:
+- xml: the unload document, byte-identical to rendering each record with the template;
+- csv: one header row, then one row per record;
+- jsonl: one JSON object per line;
+- parquet: string columns, written in row groups of ROW_GROUP_ROWS records.
+
+Columns follow the template's fields in document order. Constant fields become
+constant columns and a reference field becomes two columns, "<tag>_display_value"
+and "<tag>" (its sys_id). Values are kept as the exact strings the XML carries, so
+every format of one run holds the same data. Text sinks gzip their output when the
+path ends in ".gz".
+
+Example:
+    template = batch_generate.table_template("denial")
+    values = data_generate.generate_values(1, 100001)
+    with open_sink("xml", "denials.xml", template) as xml, open_sink("parquet", "denials.parquet", template) as pq:
+        write_values(values, [xml, pq])
+"""
+import csv
+import io
+import os
+from itertools import islice
+from json.encoder import encode_basestring
+from operator import itemgetter
+
+from instrumentation import wrap
+from record_templates import CONST, REF, TEXT
+from unload_writer import UNLOAD_FOOTER, close_stream, open_stream, unload_header
+
+# Records handed to every sink at a time by write_values().
+BATCH_SIZE = 4096
+
+# Parquet sinks buffer this many records per row group.
+ROW_GROUP_ROWS = 128 * 1024
+
+COPY_CHUNK_SIZE = 1 << 20
+
+
+def column_layout(template):
+    """
+    Returns one (column name, slot index, constant) tuple per output column of a template.
+
+    Slot index is the position of the column's value in a value tuple, or None for a
+    constant field, whose text is then given as the constant ("" for an empty field).
+    """
+    layout = []
+    slot = 0
+    for field in template.fields:
+        if field.kind == CONST:
+            layout.append((field.tag, None, "" if field.value is None else str(field.value)))
+        elif field.kind == TEXT:
+            layout.append((field.tag, slot, None))
+            slot += 1
+        elif field.kind == REF:
+            layout.append((f"{field.tag}_display_value", slot, None))
+            layout.append((field.tag, slot + 1, None))
+            slot += 2
+    return layout
+
+
+def column_names(template):
+    """Returns the output column names of a template, in document order."""
+    return [name for name, _, _ in column_layout(template)]
+
+
+def row_getter(template):
+    """
+    Returns a function mapping one value tuple to the full output row, constants included.
+
+    The constants are appended to the values once and picked out with one itemgetter,
+    so a row costs one tuple concatenation.
+    """
+    layout = column_layout(template)
+    constants = tuple(constant for _, slot, constant in layout if slot is None)
+    width = len(template.slots)
+    indexes, next_constant = [], width
+    for _, slot, _ in layout:
+        if slot is None:
+            indexes.append(next_constant)
+            next_constant += 1
+        else:
+            indexes.append(slot)
+    pick = itemgetter(*indexes)
+    return lambda values: pick(tuple(values) + constants)
+
+
+def _as_str(value):
+    return value if value.__class__ is str else str(value)
+
+
+class Sink:
+    """
+    Base class of the output sinks. Use as a context manager so the file is finished.
+
+    Parameters:
+    template (record_templates.RecordTemplate): Layout of the records written.
+    """
+
+    extension = None
+
+    def __init__(self, template):
+        self.template = template
+        self.count = 0
+        self._closed = False
+
+    def write_batch(self, batch):
+        """Writes a list of value tuples."""
+        raise NotImplementedError
+
+    def write_all(self, values, batch_size=BATCH_SIZE):
+        """Writes every value tuple from an iterable and returns the running record count."""
+        values = iter(values)
+        batch = list(islice(values, batch_size))
+        while batch:
+            self.write_batch(batch)
+            batch = list(islice(values, batch_size))
+        return self.count
+
+    def append_shard(self, path, count):
+        """Copies a shard written by this sink type with header=False (see batch_generate.py)."""
+        raise NotImplementedError
+
+    def _finish(self):
+        raise NotImplementedError
+
+    def close(self):
+        """Finishes and closes the output."""
+        if self._closed:
+            return
+        self._closed = True
+        self._finish()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class TextSink(Sink):
+    """
+    A sink writing UTF-8 text to a path or binary file object.
+
+    Parameters:
+    target (str | os.PathLike | file): Output path or binary file object.
+    template (record_templates.RecordTemplate): Layout of the records written.
+    header (bool): Write the header and footer. Shards written with header=False are
+        bare records that append_shard() can concatenate.
+    compress (bool): Gzip the output. Defaults to True for paths ending in ".gz".
+    compresslevel (int): Gzip compression level.
+    """
+
+    def __init__(self, target, template, header=True, compress=None, compresslevel=6):
+        super().__init__(template)
+        self.header = header
+        self.bytes_written = 0
+        self._raw, self._file, self._owns_file = open_stream(target, compress, compresslevel)
+        self._serialize = wrap("render", self._serialize)
+        if header:
+            self._write_text(self._header())
+
+    def _header(self):
+        return ""
+
+    def _footer(self):
+        return ""
+
+    def _serialize(self, batch):
+        raise NotImplementedError
+
+    def _write_text(self, text):
+        data = text.encode("utf-8")
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def write_batch(self, batch):
+        self._write_text(self._serialize(batch))
+        self.count += len(batch)
+
+    def append_shard(self, path, count):
+        with open(path, "rb") as part:
+            chunk = part.read(COPY_CHUNK_SIZE)
+            while chunk:
+                self._file.write(chunk)
+                self.bytes_written += len(chunk)
+                chunk = part.read(COPY_CHUNK_SIZE)
+        self.count += count
+
+    def _finish(self):
+        if self.header:
+            self._write_text(self._footer())
+        close_stream(self._raw, self._file, self._owns_file)
+
+
+class XmlSink(TextSink):
+    """
+    Writes the unload document (see unload_writer.UnloadWriter).
+
+    Parameters:
+    unload_date (str): Value of the unload_date attribute. Defaults to now.
+    See TextSink for the others.
+    """
+
+    extension = ".xml"
+
+    def __init__(self, target, template, header=True, compress=None, compresslevel=6, unload_date=None):
+        self.unload_date = unload_date
+        super().__init__(target, template, header, compress, compresslevel)
+
+    def _header(self):
+        return unload_header(self.unload_date)
+
+    def _footer(self):
+        return UNLOAD_FOOTER
+
+    def _serialize(self, batch):
+        return "".join(map(self.template.render, batch))
+
+
+class CsvSink(TextSink):
+    """Writes a header row of column_names(), then one row per record."""
+
+    extension = ".csv"
+
+    def __init__(self, target, template, header=True, compress=None, compresslevel=6, unload_date=None):
+        self._row = row_getter(template)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+        super().__init__(target, template, header, compress, compresslevel)
+
+    def _header(self):
+        return ",".join(column_names(self.template)) + "\n"
+
+    def _serialize(self, batch):
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._writer.writerows(map(self._row, batch))
+        return self._buffer.getvalue()
+
+
+class JsonlSink(TextSink):
+    """
+    Writes one JSON object per record and line, keys in column_names() order.
+
+    Like RecordTemplate, the line is compiled into one %-format string with the keys
+    and constants already encoded, so a record only encodes its varying values.
+    """
+
+    extension = ".jsonl"
+
+    def __init__(self, target, template, header=True, compress=None, compresslevel=6, unload_date=None):
+        pieces, slots = [], []
+        for name, slot, constant in column_layout(template):
+            if slot is None:
+                pieces.append(f"{encode_basestring(name)}: {encode_basestring(constant)}".replace("%", "%%"))
+            else:
+                pieces.append(f"{encode_basestring(name)}: %s")
+                slots.append(slot)
+        self._format = "{" + ", ".join(pieces) + "}\n"
+        self._order = itemgetter(*slots) if len(slots) > 1 else (lambda values: (values[slots[0]],))
+        super().__init__(target, template, header, compress, compresslevel)
+
+    def _line(self, values):
+        return self._format % tuple(encode_basestring(_as_str(value)) for value in self._order(values))
+
+    def _serialize(self, batch):
+        return "".join(map(self._line, batch))
+
+
+class ParquetSink(Sink):
+    """
+    Writes a Parquet file with one string column per column_names() entry.
+
+    Batches are buffered until ROW_GROUP_ROWS records are pending, then written as row
+    groups. Needs pyarrow. A Parquet file is always complete, so header is ignored and
+    shards are merged row group by row group.
+
+    Parameters:
+    target (str | os.PathLike): Output path.
+    template (record_templates.RecordTemplate): Layout of the records written.
+    compression (str): Parquet compression codec.
+    """
+
+    extension = ".parquet"
+
+    def __init__(self, target, template, header=True, compress=None, compresslevel=6, unload_date=None,
+                 compression="zstd", row_group_rows=ROW_GROUP_ROWS):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        super().__init__(template)
+        self._pa = pa
+        self._layout = column_layout(template)
+        self.schema = pa.schema([(name, pa.string()) for name, _, _ in self._layout])
+        self.row_group_rows = row_group_rows
+        self._writer = pq.ParquetWriter(os.fspath(target), self.schema, compression=compression)
+        self._pending = []
+        self._pending_rows = 0
+        self._columns = wrap("render", self._columns)
+
+    def _columns(self, batch):
+        pa = self._pa
+        slots = list(zip(*batch))
+        arrays = []
+        for _, slot, constant in self._layout:
+            values = [constant] * len(batch) if slot is None else slots[slot]
+            if slot is not None and not all(value.__class__ is str for value in values):
+                values = [_as_str(value) for value in values]
+            arrays.append(pa.array(values, pa.string()))
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def write_batch(self, batch):
+        if not batch:
+            return
+        self._pending.append(self._columns(batch))
+        self._pending_rows += len(batch)
+        self.count += len(batch)
+        if self._pending_rows >= self.row_group_rows:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            table = self._pa.Table.from_batches(self._pending, schema=self.schema)
+            self._writer.write_table(table, row_group_size=self.row_group_rows)
+            self._pending = []
+            self._pending_rows = 0
+
+    def append_shard(self, path, count):
+        import pyarrow.parquet as pq
+
+        self._flush()
+        shard = pq.ParquetFile(path)
+        for group in range(shard.num_row_groups):
+            self._writer.write_table(shard.read_row_group(group))
+        self.count += count
+
+    def _finish(self):
+        self._flush()
+        self._writer.close()
+
+
+SINKS = {"xml": XmlSink, "csv": CsvSink, "jsonl": JsonlSink, "parquet": ParquetSink}
+FORMATS = tuple(SINKS)
+
+
+def sink_path(path, fmt):
+    """
+    Returns path with its format extension swapped for fmt's, keeping a ".gz" suffix
+    for text formats, e.g. sink_path("out.xml.gz", "csv") == "out.csv.gz".
+    """
+    compressed = path.endswith(".gz")
+    base = path[:-len(".gz")] if compressed else path
+    for extension in (sink.extension for sink in SINKS.values()):
+        if base.endswith(extension):
+            base = base[:-len(extension)]
+            break
+    suffix = ".gz" if compressed and fmt != "parquet" else ""
+    return base + SINKS[fmt].extension + suffix
+
+
+def open_sink(fmt, target, template, **options):
+    """Returns the sink for one of FORMATS; options are passed to its constructor."""
+    try:
+        sink = SINKS[fmt]
+    except KeyError:
+        raise ValueError(f"Unknown output format {fmt!r}; expected one of {', '.join(FORMATS)}.") from None
+    return sink(target, template, **options)
+
+
+def write_values(values, sinks, batch_size=BATCH_SIZE):
+    """
+    Writes every value tuple from an iterable to each sink, batch by batch, so all
+    formats of one run receive the same records.
+
+    Returns:
+    int: The number of records written.
+    """
+    values = iter(values)
+    writers = [wrap("write", sink.write_batch) for sink in sinks]
+    count = 0
+    batch = list(islice(values, batch_size))
+    while batch:
+        for write in writers:
+            write(batch)
+        count += len(batch)
+        batch = list(islice(values, batch_size))
+    return count
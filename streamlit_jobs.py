@@ -0,0 +1,226 @@
+"""
+Background generation for the Streamlit pages.
+
+Generation runs on a worker thread that streams the unload to a temporary file on the
+server. The page polls the job for progress, can cancel it, previews only the first few
+records and serves the download straight from disk.
+
+A job's file is deleted when the page starts another job, JOB_TTL_SECONDS after the job
+finished (sessions that were simply closed leave nothing behind for longer), and at
+interpreter exit.
+"""
+import atexit
+import os
+import tempfile
+import threading
+import time
+
+import streamlit as st
+
+from instrumentation import Profiler, profiling, wrap
+from unload_writer import UnloadWriter, serialize_record, unload_header, UNLOAD_FOOTER
+
+PREVIEW_RECORDS = 20
+POLL_SECONDS = 0.5
+
+# Finished jobs keep their file for this long before expire_jobs() deletes it.
+JOB_TTL_SECONDS = 60 * 60
+
+# Every job whose file has not been deleted yet, across all sessions of this process.
+_jobs = set()
+_jobs_lock = threading.Lock()
+
+
+class GenerationJob:
+    """
+    Write an unload on a background thread.
+
+    Parameters:
+    records (iterable): Records to write; consumed on the worker thread.
+    total (int): Expected number of records, for the progress bar.
+    file_name (str): Download file name, e.g. "samp_eng_app_denial.xml".
+    compress (bool): Gzip the file (the download name gets a .gz suffix).
+    preview_records (int): Number of leading records kept for the preview.
+    profile (bool): Profile the generation stages (see instrumentation.py).
+    """
+
+    def __init__(self, records, total, file_name, compress=False, preview_records=PREVIEW_RECORDS, profile=False):
+        self.total = total
+        self.file_name = f"{file_name}.gz" if compress else file_name
+        self.compress = compress
+        self.preview = []
+        self.preview_records = preview_records
+        self.count = 0
+        self.bytes_written = 0
+        self.error = None
+        self.profiler = Profiler() if profile else None
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.finished_at = None
+        self.expired = False
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+        fd, self.path = tempfile.mkstemp(prefix="unload-", suffix=".xml.gz" if compress else ".xml")
+        os.close(fd)
+        with _jobs_lock:
+            _jobs.add(self)
+        self._thread = threading.Thread(target=self._run, args=(records,), daemon=True)
+        self._thread.start()
+
+    def _run(self, records):
+        if self.profiler is None:
+            self._write(records)
+            return
+        with profiling(self.profiler):
+            self._write(records)
+        self.profiler.add_records(self.count)
+
+    def _write(self, records):
+        try:
+            with UnloadWriter(self.path, compress=self.compress) as writer:
+                write = wrap("write", writer.write)
+                for record in records:
+                    if self._cancel.is_set():
+                        break
+                    record = serialize_record(record)
+                    write(record)
+                    if len(self.preview) < self.preview_records:
+                        self.preview.append(record)
+                    self.count = writer.count
+                    self.bytes_written = writer.bytes_written
+            self.bytes_written = writer.bytes_written
+        except Exception as e:  # surfaced on the page instead of dying silently with the thread
+            self.error = e
+        finally:
+            self.elapsed = time.perf_counter() - self.started
+            self.finished_at = time.monotonic()
+            self._finished.set()
+
+    @property
+    def running(self):
+        return not self._finished.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def progress(self):
+        return min(1.0, self.count / self.total) if self.total else 1.0
+
+    def cancel(self):
+        """Asks the worker to stop after the current record."""
+        self._cancel.set()
+
+    def preview_xml(self):
+        """Returns a small unload document holding only the preview records."""
+        return unload_header() + "".join(self.preview) + UNLOAD_FOOTER
+
+    def file_size(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def read(self):
+        """Returns the finished file's bytes, for the deferred download."""
+        with open(self.path, "rb") as handle:
+            return handle.read()
+
+    def discard(self):
+        """Cancels the job and deletes its file."""
+        self.cancel()
+        self._thread.join(timeout=5)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        with _jobs_lock:
+            _jobs.discard(self)
+
+
+def expire_jobs(ttl=JOB_TTL_SECONDS, now=None):
+    """Deletes the files of jobs that finished more than `ttl` seconds ago, in any session."""
+    now = time.monotonic() if now is None else now
+    with _jobs_lock:
+        expired = [job for job in _jobs if job.finished_at is not None and now - job.finished_at > ttl]
+    for job in expired:
+        job.discard()
+        job.expired = True
+
+
+@atexit.register
+def _discard_all():
+    with _jobs_lock:
+        jobs = list(_jobs)
+    for job in jobs:
+        job.discard()
+
+
+def start_job(key, records, total, file_name, compress=False, profile=False):
+    """Starts a job for this page, replacing (and cleaning up) any previous one."""
+    expire_jobs()
+    previous = st.session_state.get(key)
+    if previous is not None:
+        previous.discard()
+    st.session_state[key] = GenerationJob(records, total, file_name, compress, profile=profile)
+
+
+def _format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:,.0f} {unit}" if unit == "B" else f"{size:,.1f} {unit}"
+        size /= 1024
+
+
+def show_job(key):
+    """Renders progress, cancel, preview and download for this page's job."""
+    expire_jobs()
+    job = st.session_state.get(key)
+    if job is None:
+        return
+    if job.expired:
+        st.info("The generated file has expired. Generate it again to download it.")
+        return
+
+    if job.running:
+        st.progress(job.progress, text=f"Generated {job.count:,} of {job.total:,} records")
+        if st.button("Cancel", key=f"{key}_cancel"):
+            job.cancel()
+        time.sleep(POLL_SECONDS)
+        st.rerun()
+
+    if job.error is not None:
+        st.error(f"Generation failed: {job.error}")
+        return
+    if job.cancelled:
+        st.warning(f"Generation cancelled after {job.count:,} records.")
+    else:
+        rate = job.count / job.elapsed if job.elapsed else 0
+        st.success(
+            f"Generated {job.count:,} records ({_format_size(job.bytes_written)} of XML, "
+            f"{_format_size(job.file_size())} on disk) in {job.elapsed:.1f}s ({rate:,.0f} records/s)."
+        )
+
+    if job.preview:
+        st.caption(f"Preview of the first {len(job.preview)} of {job.count:,} records")
+        if job.profiler is None:
+            st.code(job.preview_xml(), language="xml")
+        else:
+            with job.profiler.stage("preview"):
+                st.code(job.preview_xml(), language="xml")
+    if job.profiler is not None:
+        show_profile(job.profiler)
+    if not job.cancelled:
+        st.download_button(
+            label="Download XML",
+            data=job.read,
+            file_name=job.file_name,
+            mime="application/gzip" if job.compress else "application/xml",
+            key=f"{key}_download",
+        )
+
+
+def show_profile(profiler):
+    """Renders a finished job's per-stage profile in the sidebar."""
+    report = profiler.to_dict()
+    st.sidebar.subheader("Generation profile")
+    if report["records_per_second"]:
+        st.sidebar.caption(f"{report['records']:,} records in {report['seconds']:.2f}s "
+                           f"({report['records_per_second']:,.0f} records/s); stage times include nested stages")
+    st.sidebar.table(profiler.rows())
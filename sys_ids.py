@@ -0,0 +1,91 @@
+import os
+import random
+
+from instrumentation import stage
+
+RANDOM_HEX_DIGITS = 20
+COUNTER_HEX_DIGITS = 12
+SEQUENCE_BITS = 32
+MAX_NAMESPACE = (1 << (COUNTER_HEX_DIGITS * 4 - SEQUENCE_BITS)) - 1
+
+
+class SysIdGenerator:
+    """
+    Issue 32-hex-digit sys_ids in bulk blocks.
+
+    Each sys_id is 20 random hex digits followed by a 12-digit counter. The random part
+    for a whole block comes from one os.urandom call, and the counter guarantees that no
+    two ids from the same generator are equal. The counter's top 16 bits hold a namespace,
+    so parallel shards given different namespaces never collide with each other either.
+
+    Parameters:
+    namespace (int): Shard number in 0..65535. Defaults to a random namespace.
+    block_size (int): Number of ids generated per refill.
+    rng (random.Random): Source of the random digits, for reproducible ids. Defaults to os.urandom.
+    """
+
+    def __init__(self, namespace=None, block_size=8192, rng=None):
+        if namespace is None:
+            namespace = random.SystemRandom().randint(0, MAX_NAMESPACE)
+        if not 0 <= namespace <= MAX_NAMESPACE:
+            raise ValueError(f"The namespace must be between 0 and {MAX_NAMESPACE}.")
+        self.namespace = namespace
+        self.block_size = block_size
+        self.rng = rng
+        self._counter = namespace << SEQUENCE_BITS
+        self._limit = (namespace + 1) << SEQUENCE_BITS
+        self._block = iter(())
+
+    def _random_hex(self, count):
+        """Returns count * RANDOM_HEX_DIGITS random hex digits as one string."""
+        if self.rng is not None:
+            digits = count * RANDOM_HEX_DIGITS
+            return f"{self.rng.getrandbits(digits * 4):0{digits}x}" if digits else ""
+        return os.urandom(count * RANDOM_HEX_DIGITS // 2).hex()
+
+    def take(self, count):
+        """Returns a list of `count` new sys_ids."""
+        start = self._counter
+        if start + count > self._limit:
+            raise OverflowError(f"Namespace {self.namespace} has run out of sys_ids.")
+        self._counter = start + count
+        buffer = self._random_hex(count)
+        width = RANDOM_HEX_DIGITS
+        return [
+            f"{buffer[i * width:(i + 1) * width]}{start + i:012x}"
+            for i in range(count)
+        ]
+
+    def next_id(self):
+        """Returns one new sys_id, refilling the block when it runs out."""
+        try:
+            return next(self._block)
+        except StopIteration:
+            with stage("sys_ids"):
+                self._block = iter(self.take(self.block_size))
+            return next(self._block)
+
+
+_default = SysIdGenerator()
+
+
+def configure(namespace=None, block_size=8192):
+    """
+    Replace the process-wide generator.
+
+    Worker processes must call this with their shard number: a forked worker otherwise
+    inherits the parent's half-used block and would repeat its ids.
+    """
+    global _default
+    _default = SysIdGenerator(namespace, block_size)
+    return _default
+
+
+def new_sys_id():
+    """Returns a new sys_id from the process-wide generator."""
+    return _default.next_id()
+
+
+def new_sys_ids(count):
+    """Returns `count` new sys_ids from the process-wide generator."""
+    return _default.take(count)
@@ -0,0 +1,66 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from batch_generate import part_path, plan_shards, run
+from clock import GenerationClock
+
+AS_OF = "2024-06-01 12:00:00"
+
+
+def records(path):
+    return list(ET.parse(path).getroot())
+
+
+def denial_numbers(path):
+    return [int(record.findtext("denial_id").split()[-1]) for record in records(path)]
+
+
+def options():
+    return {"clock": GenerationClock(AS_OF)}
+
+
+@pytest.mark.parametrize("num_records", [1, 2, 7, 100, 101])
+@pytest.mark.parametrize("num_shards", [1, 3, 8, 200])
+@pytest.mark.parametrize("block", [1, 3])
+def test_shards_cover_every_record_once(num_records, num_shards, block):
+    shards = plan_shards(num_records, num_shards, block)
+    assert [n for start, stop in shards for n in range(start, stop)] == list(range(1, num_records + 1))
+    assert all(start < stop for start, stop in shards)
+    assert all((start - 1) % block == 0 for start, _ in shards)
+    assert len(shards) == min(num_shards, -(-num_records // block))
+
+
+def test_merged_count_is_the_same_for_any_worker_count(tmp_path):
+    one = run("denial", 57, str(tmp_path / "one.xml"), workers=1, options=options())
+    many = run("denial", 57, str(tmp_path / "many.xml"), workers=3, shards=7, options=options())
+    assert len(records(one[0])) == len(records(many[0])) == 57
+    assert denial_numbers(one[0]) == denial_numbers(many[0])
+
+
+def test_part_files_are_contiguous(tmp_path):
+    output = str(tmp_path / "denial.xml")
+    paths = run("denial", 23, output, workers=2, parts=4, options=options())
+    assert paths == [part_path(output, k, 4) for k in range(4)]
+    numbers = [denial_numbers(path) for path in paths]
+    assert all(part for part in numbers)
+    flat = [n for part in numbers for n in part]
+    assert flat == list(range(flat[0], flat[0] + 23))
+
+
+def test_sys_ids_are_unique_across_shards(tmp_path):
+    for table in ("denial", "license"):
+        path = run(table, 60, str(tmp_path / f"{table}.xml"), workers=3, shards=6, options=options())[0]
+        ids = [record.findtext("sys_id") for record in records(path)]
+        assert len(ids) == 60 and len(set(ids)) == 60
+
+
+def test_same_seed_gives_the_same_file(tmp_path, monkeypatch):
+    # Several seeded shards, so both runs really merge more than one shard.
+    monkeypatch.setattr("batch_generate.SEEDED_SHARD_RECORDS", 20)
+    first = run("usage_summary", 50, str(tmp_path / "a.xml"), workers=1, options=options(), seed=9)[0]
+    second = run("usage_summary", 50, str(tmp_path / "b.xml"), workers=3, options=options(), seed=9)[0]
+    other = run("usage_summary", 50, str(tmp_path / "c.xml"), workers=3, options=options(), seed=10)[0]
+    with open(first, "rb") as a, open(second, "rb") as b, open(other, "rb") as c:
+        data = a.read()
+        assert data == b.read() and data != c.read()
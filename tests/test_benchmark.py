@@ -0,0 +1,48 @@
+import pytest
+
+from benchmark import STARTUP_MODULES, Case, Result, _import_fresh, compare, measure, spread, to_json
+
+
+def results(seconds, peak_bytes=1000, samples=None):
+    return to_json([Result("case", 100, seconds, 10, peak_bytes, samples or [seconds])], scale=1, repeat=1)
+
+
+def test_spread():
+    assert spread([2.0]) == 0.0
+    assert spread([1.0, 1.5, 1.2]) == pytest.approx(0.2)
+    assert spread([1.0, 1.1, 1.3, 2.0]) == pytest.approx(0.2)
+
+
+def test_compare_flags_slowdown_beyond_threshold():
+    (row,) = compare(results(1.25), results(1.0), threshold=0.10)
+    name, speed, memory, allowed, regressed = row
+    assert name == "case" and speed == pytest.approx(-0.2) and allowed == 0.10 and regressed
+
+
+def test_compare_allows_measured_noise():
+    noisy = results(1.25, samples=[1.25, 1.6, 1.6])
+    (row,) = compare(noisy, results(1.0), threshold=0.10)
+    assert row[3] == pytest.approx(0.28) and not row[4]
+
+
+def test_compare_flags_memory_growth():
+    (row,) = compare(results(1.0, peak_bytes=1200), results(1.0), threshold=0.10)
+    assert row[2] == pytest.approx(0.2) and row[4]
+
+
+def test_measure_counts_runs():
+    calls = []
+
+    def run(count):
+        calls.append(count)
+        return count, 3 * count
+
+    result = measure(Case("case", 5, run), repeat=3, warmup=2)
+    assert calls == [5] * 6  # warmup, timed runs and the traced run
+    assert (result.records, result.bytes, len(result.samples)) == (5, 15, 3)
+
+
+@pytest.mark.parametrize("module", STARTUP_MODULES)
+def test_modules_start_without_heavy_imports(module):
+    # Raises when importing the module pulls in pandas, matplotlib or streamlit.
+    assert _import_fresh(module) == (1, 0)
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from clock import DateWindow, GenerationClock, format_offset, make_stamp
+
+
+def test_stamp_formats():
+    stamp = make_stamp(datetime(2024, 2, 29, 7, 5, 9))
+    assert stamp == ("2024-02-29", "2024-02-29 07:05", "2024-02-29 07:05:09")
+
+
+def test_fixed_clock():
+    clock = GenerationClock("2024-06-01")
+    assert clock.stamp().second == "2024-06-01 00:00:00"
+    assert clock.now() == datetime(2024, 6, 1)
+    assert GenerationClock().stamp().second[:4].isdigit()
+
+
+def test_date_window():
+    window = DateWindow("2024-02-27", datetime(2024, 3, 1, 12))
+    assert window.dates == ["2024-02-27", "2024-02-28", "2024-02-29", "2024-03-01"]
+    assert window.pick() in window.dates
+    with pytest.raises(ValueError):
+        DateWindow("2024-03-02", "2024-03-01")
+    with pytest.raises(ValueError):
+        DateWindow("03/01/2024", "2024-03-01")
+
+
+def test_format_offset():
+    assert format_offset(datetime(1970, 1, 1), timedelta(minutes=15, seconds=3)) == "1970-01-01 00:15:03"
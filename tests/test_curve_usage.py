@@ -0,0 +1,63 @@
+import csv
+
+import numpy as np
+import pytest
+
+import concurrent_usage
+from clock import DateWindow, GenerationClock
+from curve_usage import license_curves, main, write_curve_unloads
+from graph import HEAD_POINTS, MIN_POINTS, controlled_series_batch
+from reference_data import resolve_path
+from seeding import RandomStreams
+
+LICENSES = concurrent_usage.DISCOVERY_MODELS[:3]
+
+
+@pytest.mark.parametrize("num_points", [MIN_POINTS, HEAD_POINTS, 120])
+def test_usage_stays_within_quantity_over_the_whole_range(num_points):
+    quantities = np.repeat(np.arange(1, 151), 4)
+    usage, denial = controlled_series_batch(quantities, num_points, rng=num_points)
+    assert (usage >= 0).all()
+    assert (usage <= quantities[:, None]).all()
+    assert (denial >= 0).all()
+
+
+def test_license_curves_cover_the_window():
+    window = DateWindow("2024-01-01", "2024-02-29")
+    dates, quantity, usage, denial = license_curves(LICENSES, window, 1, 3, rng=5)
+    assert dates[0] == "2024-01-01" and dates[-1] == "2024-02-29" and len(dates) == 60
+    assert ((1 <= quantity) & (quantity <= 3)).all()
+    assert usage.shape == denial.shape == (3, 60)
+    assert ((0 <= usage) & (usage <= quantity[:, None])).all()
+
+
+@pytest.mark.parametrize("low,high", [(0, 10), (5, 4)])
+def test_license_curves_reject_bad_quantity_ranges(low, high):
+    with pytest.raises(ValueError):
+        license_curves(LICENSES, DateWindow("2024-01-01", "2024-02-29"), low, high)
+
+
+def test_license_curves_need_enough_days():
+    with pytest.raises(ValueError):
+        license_curves(LICENSES, DateWindow("2024-01-01", "2024-01-10"))
+
+
+def test_curve_unloads_hold_a_record_per_license_day(tmp_path):
+    window = DateWindow("2024-01-01", "2024-02-29")
+    written = write_curve_unloads(str(tmp_path), window, LICENSES, 1, 5,
+                                  clock=GenerationClock("2024-03-01 00:00:00"), streams=RandomStreams(2))
+    _, _, _, denial = license_curves(LICENSES, window, 1, 5, RandomStreams(2).numpy("series"))
+    assert written["concurrent_usage"][1] == 3 * 60
+    assert written["denial"][1] == np.count_nonzero(denial) > 0
+
+
+def test_cli_reads_licenses_relative_to_the_working_directory(tmp_path, monkeypatch):
+    with open(resolve_path("discovery.csv"), newline="", encoding="utf-8-sig") as handle:
+        rows = list(csv.reader(handle))[:4]
+    with open(tmp_path / "my_discovery.csv", "w", newline="", encoding="utf-8") as handle:
+        csv.writer(handle).writerows(rows)
+    monkeypatch.chdir(tmp_path)
+    assert main(["--licenses", "my_discovery.csv", "-o", "out", "--date-from", "2024-01-01", "--date-to",
+                 "2024-02-29", "--as-of", "2024-03-01", "--seed", "1"]) == 0
+    with open(tmp_path / "out" / "samp_eng_app_concurrent_usage.xml", encoding="utf-8") as handle:
+        assert handle.read().count("<samp_eng_app_concurrent_usage ") == 3 * 60
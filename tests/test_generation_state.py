@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from clock import GenerationClock
+from generation_state import (MOD_COUNT_PATTERN, SYS_ID_PATTERN, GenerationState, bump_record, delta_file_name,
+                              run_delta)
+from seeding import RandomStreams
+
+
+def indexed_records(state, table):
+    """Returns {sys_id: record} read back through the table's index."""
+    files = state.table(table)["files"]
+    records = {}
+    for entry in state.index(table):
+        with open(os.path.join(state.path, files[entry["file"]]), "rb") as handle:
+            handle.seek(int(entry["offset"]))
+            records[bytes(entry["sys_id"]).hex()] = handle.read(int(entry["length"])).decode("utf-8")
+    return records
+
+
+def test_delta_runs_track_every_record(tmp_path):
+    state = GenerationState(str(tmp_path))
+    streams = RandomStreams(5, table="denial")
+    path, new, updates = run_delta(state, "denial", 20, clock=GenerationClock("2024-06-01 00:00:00"),
+                                   streams=streams)
+    assert (os.path.basename(path), new, updates) == (delta_file_name("denial", 0), 20, 0)
+    before = indexed_records(state, "denial")
+
+    state = GenerationState(str(tmp_path))
+    path, new, updates = run_delta(state, "denial", 5, update_fraction=0.25,
+                                   clock=GenerationClock("2024-06-02 00:00:00"), streams=streams)
+    assert (os.path.basename(path), new, updates) == ("samp_eng_app_denial.delta0001.xml", 5, 5)
+    assert state.table("denial")["last_number"] == 25
+    after = indexed_records(state, "denial")
+    assert len(after) == 25 and set(before) <= set(after)
+
+    changed = 0
+    for sys_id, record in after.items():
+        assert SYS_ID_PATTERN.search(record).group(1) == sys_id
+        if sys_id in before and record != before[sys_id]:
+            changed += 1
+            assert record == bump_record(before[sys_id], "2024-06-02 00:00:00")
+    assert changed == 5
+    # New records are numbered on from the first run.
+    text = "".join(after.values())
+    assert all(f"<denial_id>Denial {number + 100}</denial_id>" in text for number in range(1, 26))
+
+
+def test_as_of_must_not_go_back(tmp_path):
+    state = GenerationState(str(tmp_path))
+    run_delta(state, "denial", 1, clock=GenerationClock("2024-06-02 00:00:00"), streams=RandomStreams(1))
+    with pytest.raises(ValueError):
+        run_delta(state, "denial", 1, clock=GenerationClock("2024-06-01 00:00:00"), streams=RandomStreams(1))
+
+
+def test_bump_record():
+    record = "<r><sys_mod_count>9</sys_mod_count><sys_updated_on>2020-01-01 00:00:00</sys_updated_on></r>"
+    bumped = bump_record(record, "2024-01-01 10:00:00")
+    assert MOD_COUNT_PATTERN.search(bumped).group(1) == "10"
+    assert "<sys_updated_on>2024-01-01 10:00:00</sys_updated_on>" in bumped
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from graph import MIN_POINTS, _clamped_walks, controlled_series_batch, generate_controlled_data
+
+
+def naive_walks(start, steps, low, high):
+    low, high = np.broadcast_to(low, steps.shape), np.broadcast_to(high, steps.shape)
+    walk = np.empty(steps.shape, dtype=np.int64)
+    for row in range(steps.shape[0]):
+        value = np.broadcast_to(start, steps.shape[:1])[row]
+        for i in range(steps.shape[1]):
+            value = min(max(value + steps[row, i], low[row, i]), high[row, i])
+            walk[row, i] = value
+    return walk
+
+
+@pytest.mark.parametrize("block", [1, 4, 7, 512])
+def test_clamped_walks_match_step_by_step(block):
+    rng = np.random.default_rng(block)
+    steps = rng.integers(-10, 10, size=(6, 40))
+    low = rng.integers(0, 20, size=steps.shape)
+    high = low + rng.integers(0, 30, size=steps.shape)
+    start = rng.integers(0, 50, size=6)
+    assert np.array_equal(_clamped_walks(start, steps, low, high, block), naive_walks(start, steps, low, high))
+
+
+def test_clamped_walks_scalar_bounds_and_int64_range():
+    rng = np.random.default_rng(2)
+    steps = rng.integers(-10 ** 12, 10 ** 12, size=(3, 25))
+    walk = _clamped_walks(0, steps, -10 ** 13, 10 ** 13, block=8)
+    assert walk.dtype == np.int64
+    assert np.array_equal(walk, naive_walks(0, steps, -10 ** 13, 10 ** 13))
+
+
+def test_controlled_series_batch_shapes_and_seed():
+    usage, denial = controlled_series_batch([40, 100, 7], 60, rng=3)
+    assert usage.shape == denial.shape == (3, 60)
+    again, _ = controlled_series_batch([40, 100, 7], 60, rng=3)
+    assert np.array_equal(usage, again)
+    assert (denial >= 0).all()
+
+
+def test_generate_controlled_data_frame():
+    frame = generate_controlled_data("2024-01-01", "2024-03-31", 50, num_points=MIN_POINTS, rng=1)
+    assert list(frame.columns) == ["Date", "Quantity", "Usage", "Denial"]
+    assert len(frame) == MIN_POINTS
+    assert frame["Usage"].between(0, 50).all()
+    with pytest.raises(ValueError):
+        generate_controlled_data("2024-01-01", "2024-03-31", 50, num_points=MIN_POINTS - 1)
@@ -0,0 +1,51 @@
+import time
+
+from batch_generate import run
+from clock import GenerationClock
+from instrumentation import Profiler, profiling, stage, wrap
+
+
+def calls(profiler):
+    return {name: stats["calls"] for name, stats in profiler.to_dict()["stages"].items()}
+
+
+def test_stages_count_every_call_and_nest():
+    profiler = Profiler(memory=False)
+    with profiling(profiler):
+        double = wrap("double", lambda x: 2 * x)
+        for n in range(5):
+            with stage("outer"):
+                double(n)
+                time.sleep(0.001)
+    assert wrap("double", len) is len and stage("outer") is stage("other")  # off outside profiling()
+    report = profiler.to_dict()
+    assert calls(profiler) == {"outer": 5, "double": 5}
+    # Stage times are inclusive, so the outer stage covers the nested one and the run covers both.
+    assert report["stages"]["double"]["seconds"] <= report["stages"]["outer"]["seconds"] <= report["seconds"]
+
+
+def test_merged_reports_add_up():
+    total = Profiler(memory=False)
+    parts = []
+    for count in (3, 4):
+        part = Profiler(memory=False)
+        with profiling(part):
+            for _ in range(count):
+                with stage("values"):
+                    pass
+        part.add_records(count)
+        parts.append(part.to_dict())
+        total.merge(parts[-1])
+    assert total.records == 7 and calls(total) == {"values": 7}
+    assert total.stages["values"][1] == sum(part["stages"]["values"]["seconds"] for part in parts)
+
+
+def test_sharded_run_counts_every_record_once(tmp_path):
+    profiler = Profiler()
+    with profiling(profiler):
+        run("denial", 40, str(tmp_path / "denial.xml"), workers=2, shards=4,
+            options={"clock": GenerationClock("2024-06-01 12:00:00")}, profiler=profiler)
+    stages = calls(profiler)
+    assert profiler.records == 40
+    assert stages["values"] == 40 and stages["picks"] == 4 and stages["merge_shards"] == 4
+    assert all(stats["peak_bytes"] >= 0 for stats in profiler.to_dict()["stages"].values())
@@ -0,0 +1,99 @@
+import random
+import shutil
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+import reference_data
+from clock import GenerationClock
+from license_usage import (ENTITLEMENT_FILES, CatalogSpec, _add_years, entitlement_sources, generate_catalog_values,
+                           parse_quantity_distribution, split_quantity)
+from record_templates import LICENSE
+from reference_data import resolve_path
+from seeding import RandomStreams
+
+
+def feasible(total_sum, parts, max_gap):
+    """Whether some distinct positive numbers within max_gap of each other sum to total_sum, by brute force."""
+    return any(smallest + sum(rest) == total_sum
+               for smallest in range(1, total_sum + 1)
+               for rest in combinations(range(smallest + 1, smallest + max_gap + 1), parts - 1))
+
+
+@pytest.mark.parametrize("parts,max_gap", [(1, 0), (2, 1), (3, 5), (4, 3), (5, 8)])
+def test_split_quantity_meets_constraints_or_raises(parts, max_gap):
+    rng = random.Random(parts * 100 + max_gap)
+    for total_sum in range(1, 61):
+        if not feasible(total_sum, parts, max_gap):
+            with pytest.raises(ValueError):
+                split_quantity(total_sum, parts, max_gap, rng)
+            continue
+        for _ in range(20):
+            numbers = split_quantity(total_sum, parts, max_gap, rng)
+            assert len(numbers) == parts
+            assert sum(numbers) == total_sum
+            assert list(numbers) == sorted(set(numbers))
+            assert numbers[0] >= 1
+            assert numbers[-1] - numbers[0] <= max_gap
+
+
+@pytest.mark.parametrize("max_gap", [5, 10 ** 9])
+def test_split_quantity_handles_large_totals(max_gap):
+    # The work must not grow with the total or the gap.
+    numbers = split_quantity(10 ** 12, 4, max_gap, random.Random(1))
+    assert sum(numbers) == 10 ** 12 and numbers[-1] - numbers[0] <= max_gap
+    assert list(numbers) == sorted(set(numbers))
+
+
+def test_split_quantity_rejects_bad_parts():
+    with pytest.raises(ValueError):
+        split_quantity(30, 0)
+    with pytest.raises(ValueError):
+        split_quantity(300, 7, 5)
+
+
+def test_catalog_covers_every_combination_once_first():
+    installs, servers, license_types = entitlement_sources()
+    combinations = len(installs["install_sys_id"]) * len(servers["license_server_sys_id"]) * len(
+        license_types["license_type_sys_id"])
+    clock = GenerationClock("2024-06-01 12:00:00")
+    catalog = CatalogSpec("uniform:1,50", "2023-01-01", "2023-12-31", (1, 3))
+    slots = {name: LICENSE.slots.index(name) for name in
+             ("eng_software_install", "license_server", "license_type", "quantity", "start_date", "end_date")}
+    values = list(generate_catalog_values(1, combinations + 1, catalog, clock, RandomStreams(6), batch_size=37))
+    keys = {(v[slots["eng_software_install"]], v[slots["license_server"]], v[slots["license_type"]]) for v in values}
+    assert len(keys) == combinations
+    for record in values:
+        assert 1 <= int(record[slots["quantity"]]) <= 50
+        start, end = record[slots["start_date"]], record[slots["end_date"]]
+        assert "2023-01-01" <= start[:10] <= "2023-12-31"
+        assert int(end[:4]) - int(start[:4]) in (1, 3) and end[4:] <= start[4:]
+
+
+def test_add_years_keeps_month_ends():
+    days = np.array(["2024-02-29", "2023-03-31", "2022-07-15"], dtype="datetime64[D]")
+    assert _add_years(days, np.array([1, 1, 10])).astype(str).tolist() == ["2025-02-28", "2024-03-31", "2032-07-15"]
+
+
+@pytest.mark.parametrize("spec", ["normal:1", "fixed:0", "uniform:5,1", "uniform:1", "poisson:x", "choice:"])
+def test_bad_quantity_distributions(spec):
+    with pytest.raises(ValueError):
+        parse_quantity_distribution(spec)
+
+
+def test_quantities_are_at_least_one():
+    draw = parse_quantity_distribution("lognormal:2,3")
+    assert draw(np.random.default_rng(0), 1000).min() >= 1
+
+
+def test_entitlement_sources_follow_file_changes(tmp_path, monkeypatch):
+    for file_name in ENTITLEMENT_FILES:
+        shutil.copy(resolve_path(file_name), tmp_path / file_name)
+    monkeypatch.setattr(reference_data, "BASE_DIR", str(tmp_path))
+    monkeypatch.setattr(reference_data, "REFERENCE_DATA_DIR", None)
+    _, _, license_types = entitlement_sources()
+    assert entitlement_sources()[2] is license_types
+    with open(tmp_path / "license_type.csv", "a", encoding="utf-8") as handle:
+        handle.write("Site,00000000000000000000000000000abc\n")
+    assert list(entitlement_sources()[2]["license_type"]) == list(license_types["license_type"]) + ["Site"]
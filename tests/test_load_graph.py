@@ -0,0 +1,63 @@
+import os
+
+import pandas as pd
+import pytest
+
+from graph import generate_controlled_data
+from load_graph import REQUIRED_COLUMNS, UsageFile, downsample
+
+
+@pytest.fixture
+def usage_csv(tmp_path):
+    path = tmp_path / "usage.csv"
+    generate_controlled_data("2024-01-01", "2024-03-01", 100, num_points=3000, rng=5).to_csv(path, index=False)
+    return str(path)
+
+
+def full_read(path, start=None, end=None):
+    frame = pd.read_csv(path, usecols=REQUIRED_COLUMNS)
+    frame["Date"] = pd.to_datetime(frame["Date"])
+    if start is not None:
+        frame = frame[frame["Date"] >= pd.Timestamp(start)]
+    if end is not None:
+        frame = frame[frame["Date"] <= pd.Timestamp(end)]
+    return frame.reset_index(drop=True)
+
+
+def ranged_read(usage_file, start=None, end=None):
+    return pd.concat(list(usage_file.chunks(start, end)), ignore_index=True)
+
+
+@pytest.mark.parametrize("start,end", [(None, None), ("2024-01-20", "2024-02-03 12:00"), ("2024-02-29", None),
+                                       (None, "2024-01-01 01:00")])
+def test_ranged_read_matches_full_read(usage_csv, start, end):
+    usage_file = UsageFile(usage_csv, block_size=4096)
+    for _ in range(2):  # building the index, then using it
+        pd.testing.assert_frame_equal(ranged_read(usage_file, start, end), full_read(usage_csv, start, end))
+    assert len(usage_file.blocks) > 10
+
+
+def test_index_is_saved_and_reused_until_the_csv_changes(usage_csv, monkeypatch):
+    blocks = UsageFile(usage_csv, block_size=4096).index()
+    assert os.path.exists(f"{usage_csv}.blocks.json")
+
+    # A fresh reader loads the saved index instead of scanning the file.
+    monkeypatch.setattr(UsageFile, "_read_blocks", lambda self, offset: pytest.fail("rescanned"))
+    assert UsageFile(usage_csv, block_size=4096).index() == blocks
+    monkeypatch.undo()
+
+    # A different block size or a changed file rebuilds it.
+    assert UsageFile(usage_csv, block_size=8192).index() != blocks
+    generate_controlled_data("2023-01-01", "2023-02-01", 50, num_points=500, rng=6).to_csv(usage_csv, index=False)
+    usage_file = UsageFile(usage_csv, block_size=4096)
+    pd.testing.assert_frame_equal(ranged_read(usage_file, "2023-01-10", "2023-01-12"),
+                                  full_read(usage_csv, "2023-01-10", "2023-01-12"))
+
+
+def test_downsample_keeps_extremes_and_denials(usage_csv):
+    usage, quantity, denials = downsample(UsageFile(usage_csv, block_size=4096), max_points=100)
+    frame = full_read(usage_csv)
+    assert len(usage) <= 100
+    assert usage["Usage"].max() == frame["Usage"].max() and usage["Usage"].min() == frame["Usage"].min()
+    assert len(denials) == (frame["Denial"] > 0).sum()
+    assert quantity["Quantity"].max() == frame["Quantity"].max()
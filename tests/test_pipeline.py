@@ -0,0 +1,55 @@
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+
+import pytest
+
+from clock import DateWindow, GenerationClock
+from pipeline import build_licenses, generate_dataset
+from seeding import RandomStreams
+
+CLOCK = GenerationClock("2024-06-01 12:00:00")
+
+
+def records(path):
+    return [{field.tag: field.text for field in record} for record in ET.parse(path).getroot()]
+
+
+def test_licenses_use_a_bounded_set_of_servers():
+    index, rows = build_licenses(30, 5, CLOCK, RandomStreams(4), servers_per_product=2)
+    assert len(index) == len(rows)
+    for product, licenses in index.by_product.items():
+        servers = [lic.server["license_server_sys_id"] for lic in licenses]
+        assert len(servers) == len(set(servers)) <= 2
+        assert sum(lic.quantity for lic in licenses) == 30
+        for lic in licenses:
+            assert index.lookup(product, lic.server["license_server_sys_id"]) is lic
+
+
+def test_dataset_is_consistent(tmp_path):
+    written = generate_dataset(str(tmp_path), DateWindow("2024-05-01", "2024-05-07"), cap_rate=0.3,
+                               clock=CLOCK, streams=RandomStreams(3))
+    counts = {table: count for table, (_, count) in written.items()}
+    assert counts["concurrent_usage"] == 7 * counts["license"]
+    assert counts["denial"] > 0
+
+    licenses = records(written["license"][0])
+    by_pair = {(lic["norm_product"], lic["license_server"]): lic["sys_id"] for lic in licenses}
+    quantities = {lic["sys_id"]: int(lic["quantity"]) for lic in licenses}
+    peaks = {}
+    for usage in records(written["concurrent_usage"][0]):
+        assert int(usage["concurrent_usage"]) <= quantities[usage["license"]]
+        peaks[usage["license"], usage["usage_date"]] = int(usage["concurrent_usage"])
+    in_session = defaultdict(set)
+    for summary in records(written["usage_summary"][0]):
+        in_session[summary["norm_product"], summary["usage_date"]].add(summary["user"])
+    for denial in records(written["denial"][0]):
+        # Denials only hit licensed pairs on days their license was used up, and users without a session.
+        license = by_pair[denial["norm_product"], denial["license_server"]]
+        assert peaks[license, denial["denial_date"]] == quantities[license]
+        assert denial["user"] not in in_session[denial["norm_product"], denial["denial_date"]]
+
+
+def test_too_few_users_is_an_error(tmp_path):
+    with pytest.raises(ValueError, match="distinct users"):
+        generate_dataset(str(tmp_path), DateWindow("2024-05-01", "2024-05-02"), total_sum=1000, max_gap=1000,
+                         clock=CLOCK, streams=RandomStreams(3))
@@ -0,0 +1,42 @@
+import csv
+import importlib
+import threading
+
+import pytest
+
+from batch_generate import TABLES, table_template
+from clock import GenerationClock
+from push_import import ImportClient, StubImportServer, generate_rows, push_rows
+from seeding import RandomStreams
+from sinks import column_names, open_sink, write_values
+
+AS_OF = "2024-06-01 12:00:00"
+
+
+@pytest.mark.parametrize("table", sorted(TABLES))
+def test_rows_hold_every_csv_column(table, tmp_path):
+    rows = list(generate_rows(table, 30, RandomStreams(9, table=table), clock=GenerationClock(AS_OF)))
+    assert all(list(row) == column_names(table_template(table)) for row in rows)
+
+    module = importlib.import_module(TABLES[table].module)
+    path = tmp_path / "rows.csv"
+    with open_sink("csv", str(path), table_template(table)) as sink:
+        write_values(module.generate_values(1, 31, streams=RandomStreams(9, table=table),
+                                            clock=GenerationClock(AS_OF)), [sink])
+    with open(path, newline="", encoding="utf-8") as handle:
+        assert list(csv.DictReader(handle)) == rows
+
+
+def test_push_retries_failed_batches():
+    server = StubImportServer(fail_rate=0.3)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        rows = generate_rows("usage_summary", 250, RandomStreams(1, table="usage_summary"))
+        stats = push_rows(ImportClient(server.url), rows, batch_size=20, workers=3, retries=50, backoff=0)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert (stats.records, stats.batches) == (250, 13)
+    assert server.records == 250
+    assert server.requests == 13 + server.failures == 13 + stats.retries
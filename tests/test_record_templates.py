@@ -0,0 +1,53 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from record_templates import CONST, REF, TEMPLATES, TEXT
+
+
+def element_tree_render(template, values):
+    """Builds the record the way the generators did before templates, with ET.SubElement."""
+    values = iter(values)
+    record = ET.Element(template.table, action=template.action)
+    for field in template.fields:
+        if field.kind == CONST:
+            ET.SubElement(record, field.tag).text = field.value
+        elif field.kind == REF:
+            element = ET.SubElement(record, field.tag, display_value=next(values))
+            element.text = next(values)
+        else:
+            ET.SubElement(record, field.tag).text = next(values)
+    return ET.tostring(record, encoding="unicode")
+
+
+@pytest.mark.parametrize("table", sorted(TEMPLATES))
+def test_render_matches_element_tree(table):
+    template = TEMPLATES[table]
+    values = [f"{slot} {n}" for n, slot in enumerate(template.slots)]
+    assert template.render(values) == element_tree_render(template, values)
+
+
+@pytest.mark.parametrize("table", sorted(TEMPLATES))
+def test_render_escapes_like_element_tree(table):
+    template = TEMPLATES[table]
+    # Fields declared safe (dates, ids, counts) are never escaped, so only the others get markup.
+    values = []
+    for field in template.fields:
+        if field.kind == TEXT:
+            values.append("2024-01-02" if field.safe else 'a&b <c> "d" %s')
+        elif field.kind == REF:
+            values.extend(['a&b <c> "d"\r\n\te %s', "<id>"])
+    assert template.render(values) == element_tree_render(template, values)
+
+
+def test_empty_values_render_short_form():
+    template = TEMPLATES["samp_eng_app_denial"]
+    values = ["x"] * len(template.slots)
+    values[0] = values[-1] = ""
+    assert template.render(values) == element_tree_render(template, values)
+
+
+def test_render_checks_value_count():
+    template = TEMPLATES["samp_eng_app_denial"]
+    with pytest.raises(ValueError):
+        template.render(["x"] * (len(template.slots) - 1))
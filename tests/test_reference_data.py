@@ -0,0 +1,32 @@
+import numpy as np
+
+from reference_data import ReferenceTable, row_values
+
+
+def make_table(rows=50):
+    return ReferenceTable("people.csv", {
+        "user": [f"user {i}" for i in range(rows)],
+        "user_sys_id": [f"{i:032x}" for i in range(rows)],
+        "group": [f"group {i % 7}" for i in range(rows)],
+    })
+
+
+def test_sample_values_are_rows_of_the_table():
+    table = make_table()
+    names = ("user_sys_id", "user")
+    indices = table.sample_indices(200, np.random.default_rng(5))
+    sampled = list(table.sample_values(200, np.random.default_rng(5), names))
+    assert sampled == [row_values(table.row(i), names) for i in indices]
+
+
+def test_sample_values_defaults_to_every_column():
+    table = make_table()
+    (values,) = table.sample_values(1, np.random.default_rng(1))
+    assert len(values) == 3
+    assert dict(zip(table.columns, values)) in table.records()
+
+
+def test_records_match_rows():
+    table = make_table(5)
+    assert table.records() == [table.row(i) for i in range(5)]
+    assert table.take("group", [4, 1]) == ["group 4", "group 1"]
@@ -0,0 +1,107 @@
+import pandas as pd
+import pytest
+
+from graph import generate_controlled_batch
+from rollups import (ROLLUP_KEYS, RollupStore, license_catalog, merge_rollups, rollup, series_observations,
+                     usage_observations, with_metrics)
+
+SERIES = [
+    {"license": "A", "server": "s1", "group": "g", "max_quantity": 30},
+    {"license": "B", "server": "s1", "group": "g", "max_quantity": 12},
+    {"license": "C", "server": "s2", "group": "g", "max_quantity": 5},
+]
+
+# Two licenses of quantity 10 on server s.
+LICENSES = pd.DataFrame({"sys_id": ["A", "B"], "norm_product": ["p", "q"], "norm_product_display_value": ["P", "Q"],
+                         "license_server": ["s", "s"], "license_server_display_value": ["S", "S"],
+                         "quantity": ["10", "10"]})
+
+
+def observations():
+    frame = generate_controlled_batch("2024-01-01", "2024-03-30", SERIES, num_points=90, rng=8)
+    return series_observations(frame, license="license", server="server", group="group")
+
+
+def split_by_day(frame, day):
+    return frame[frame["time"] < pd.Timestamp(day)], frame[frame["time"] >= pd.Timestamp(day)]
+
+
+def ordered(frame):
+    return frame.sort_values(ROLLUP_KEYS, na_position="first").reset_index(drop=True)
+
+
+def assert_same_rollups(left, right):
+    pd.testing.assert_frame_equal(ordered(left), ordered(right), check_dtype=False)
+
+
+@pytest.mark.parametrize("day", ["2024-01-02", "2024-02-15", "2024-03-01"])
+def test_merged_batches_equal_one_rollup(day):
+    everything = observations()
+    first, second = split_by_day(everything, day)
+    assert_same_rollups(merge_rollups(rollup(first), rollup(second)), rollup(everything))
+
+
+def test_store_updates_equal_one_update(tmp_path):
+    everything = observations()
+    whole = RollupStore(str(tmp_path / "whole"))
+    whole.update(everything)
+    incremental = RollupStore(str(tmp_path / "incremental"))
+    for batch in split_by_day(everything, "2024-02-10"):
+        incremental.update(batch)
+    incremental = RollupStore(incremental.path)  # reopened from its manifest
+    assert incremental.days == whole.days and len(whole.days) == 90
+    for dimension in ("license", "server", "group"):
+        for period in ("day", "month", "all"):
+            assert_same_rollups(incremental.rollups(dimension, period), whole.rollups(dimension, period))
+    with pytest.raises(ValueError):
+        incremental.update(split_by_day(everything, "2024-03-30")[1])
+
+
+def test_server_utilization_adds_up_its_licenses():
+    usage = pd.DataFrame({
+        "license": ["A", "A", "B", "B"],
+        "license_display_value": ["A", "A", "B", "B"],
+        "concurrent_usage": ["10", "5", "2", "4"],
+        "usage_date": ["2024-01-01", "2024-01-02", "2024-01-01", "2024-01-02"],
+    })
+    report = with_metrics(rollup(usage_observations(usage, license_catalog(LICENSES))))
+    totals = report[report["period"] == "all"].set_index(["dimension", "key"])
+    assert totals.loc[("license", "A"), "avg_utilization"] == pytest.approx(0.75)
+    assert totals.loc[("license", "A"), "hours_at_cap"] == 24
+    assert totals.loc[("license", "B"), "peak_utilization"] == pytest.approx(0.4)
+    assert totals.loc[("server", "s"), "avg_utilization"] == pytest.approx(21 / 40)
+    assert totals.loc[("server", "s"), "peak_usage"] == 12
+    assert totals.loc[("license", "A"), "name"] == "P @ S"
+
+
+def usage_and_licenses(days):
+    usage = pd.DataFrame({
+        "license": ["A", "B"] * len(days),
+        "license_display_value": ["A", "B"] * len(days),
+        "concurrent_usage": [str(n % 11) for n in range(2 * len(days))],
+        "usage_date": [day for day in days for _ in range(2)],
+    })
+    return usage_observations(usage, license_catalog(LICENSES))
+
+
+def test_store_takes_new_keys_on_stored_days(tmp_path):
+    days = [f"2024-01-{day:02d}" for day in range(1, 11)]
+    records = usage_and_licenses(days)
+    frame = generate_controlled_batch("2024-01-01", "2024-01-30", [{"max_quantity": 20}], num_points=30, rng=1)
+    series = series_observations(frame, name="generated_graph_data")
+
+    store = RollupStore(str(tmp_path / "two"))
+    store.update(records)
+    assert store.update(series) == [f"2024-01-{day:02d}" for day in range(1, 31)]
+    whole = RollupStore(str(tmp_path / "whole"))
+    whole.update(pd.concat([records, series], ignore_index=True))
+    for dimension in ("license", "server"):
+        for period in ("day", "month", "all"):
+            assert_same_rollups(store.rollups(dimension, period), whole.rollups(dimension, period))
+
+    # A key's stored day cannot take more observations, whichever dimension it is in.
+    with pytest.raises(ValueError, match="license generated_graph_data on 2024-01-30"):
+        store.update(series[series["time"] == pd.Timestamp("2024-01-30")])
+    other = usage_and_licenses(["2024-01-05"]).replace({"license": {"A": "C", "B": "D"}})
+    with pytest.raises(ValueError, match="server s on 2024-01-05"):
+        store.update(other)
@@ -0,0 +1,63 @@
+import random
+
+import numpy as np
+import pytest
+
+from scale_reference import MappedTable, random_sys_ids, write_table
+
+TEXT = ["Zoë Ångström", "", "plain", "中文名字", "emoji 🚀 rocket", "a,\"b\" <c>", "x" * 300, "Łódź"]
+VOCAB = ["Engineering", "Ingeniería", "製造"]
+
+
+@pytest.fixture
+def table(tmp_path):
+    rng = np.random.default_rng(0)
+    count = 50
+    ids = random_sys_ids(count, rng)
+    codes = rng.integers(0, len(VOCAB), size=count)
+    text = [TEXT[i % len(TEXT)] + (str(i) if i % 3 else "") for i in range(count)]
+    write_table(str(tmp_path / "user"), "user.csv", {
+        "sys_id": ("sys_id", ids),
+        "department": ("dict", (codes, VOCAB)),
+        "name": ("text", text),
+    })
+    expected = [{"sys_id": ids[i].tobytes().hex(), "department": VOCAB[codes[i]], "name": text[i]} for i in range(count)]
+    return MappedTable(str(tmp_path / "user")), expected
+
+
+@pytest.mark.parametrize("indices", [[], [0], [49], [3, 3, 7], [12, 1, 40, 2, 2], list(range(50))])
+def test_take_matches_the_written_columns(table, indices):
+    mapped, expected = table
+    for name in mapped.column_names:
+        assert mapped.take(name, indices) == [expected[i][name] for i in indices]
+    assert mapped.rows(indices) == [expected[i] for i in indices]
+
+
+def test_rows_columns_and_samples_read_back(table):
+    mapped, expected = table
+    assert len(mapped) == 50 and mapped.column_names == ["sys_id", "department", "name"]
+    assert list(mapped.records()) == expected
+    assert mapped.records()[5:9] == expected[5:9]
+    assert mapped.column("name")[-1] == expected[-1]["name"]
+    assert random.Random(1).choice(mapped.records()) in expected
+
+    rows = [tuple(row.values()) for row in expected]
+    assert all(values in rows for values in mapped.sample_values(200, np.random.default_rng(2)))
+    names = list(mapped.sample_values(5, np.random.default_rng(3), names=["name"]))
+    assert all(len(values) == 1 and values[0] in [row["name"] for row in expected] for values in names)
+
+
+def test_empty_table_round_trips(tmp_path):
+    write_table(str(tmp_path / "empty"), "user.csv", {
+        "sys_id": ("sys_id", np.zeros((0, 16), dtype=np.uint8)),
+        "name": ("text", []),
+    })
+    mapped = MappedTable(str(tmp_path / "empty"))
+    assert len(mapped) == 0 and mapped.take("name", []) == [] and mapped.rows([]) == []
+    with pytest.raises(IndexError):
+        mapped.sample_indices(1)
+
+
+def test_column_lengths_must_agree(tmp_path):
+    with pytest.raises(ValueError, match="expected 2"):
+        write_table(str(tmp_path / "bad"), "user.csv", {"a": ("text", ["x", "y"]), "b": ("text", ["z"])})
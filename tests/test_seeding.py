@@ -0,0 +1,40 @@
+import data_generate
+from clock import GenerationClock
+from seeding import RandomStreams, derive_seed, parse_seed
+
+AS_OF = "2024-06-01 12:00:00"
+
+
+def denials(streams, count=50):
+    return list(data_generate.generate_values(1, count + 1, clock=GenerationClock(AS_OF), streams=streams))
+
+
+def test_seeded_runs_repeat():
+    assert denials(RandomStreams(7, table="denial")) == denials(RandomStreams(7, table="denial"))
+    assert denials(RandomStreams(7, table="denial")) != denials(RandomStreams(8, table="denial"))
+
+
+def test_shards_can_be_regenerated_alone():
+    run = RandomStreams(7, table="denial")
+    assert denials(run.spawn(3)) == denials(RandomStreams(7, 3, "denial"))
+    assert denials(run.spawn(3)) != denials(run.spawn(4))
+
+
+def test_sys_ids_are_keyed_by_table():
+    denial_ids = RandomStreams(7, table="denial").new_sys_ids(1000)
+    license_ids = RandomStreams(7, table="license").new_sys_ids(1000)
+    assert len(set(denial_ids)) == 1000
+    assert not set(denial_ids) & set(license_ids)
+
+
+def test_streams_are_independent():
+    first = RandomStreams(7)
+    second = RandomStreams(7)
+    second.counts.random()
+    assert first.picks.random() == second.picks.random()
+    assert derive_seed(7, 0, "picks") != derive_seed(7, 0, "counts")
+
+
+def test_parse_seed():
+    assert parse_seed("") is None
+    assert parse_seed(" 42 ") == 42
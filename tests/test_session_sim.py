@@ -0,0 +1,72 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from clock import DateWindow
+from session_sim import (SECONDS_PER_DAY, Sessions, concurrency_peaks, daily_totals, simulate, simulate_sessions,
+                         split_at_midnight)
+
+
+def brute_force_peaks(license, start, stop, num_licenses):
+    """Counts the sessions open at every start (sessions are half-open [start, stop))."""
+    peaks = np.zeros(num_licenses, dtype=np.int64)
+    for lic, at in zip(license, start):
+        open_now = np.count_nonzero((license == lic) & (start <= at) & (at < stop))
+        peaks[lic] = max(peaks[lic], open_now)
+    return peaks
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_sweep_peaks_match_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    count = rng.integers(0, 40)
+    license = rng.integers(0, 4, size=count).astype(np.int32)
+    start = rng.integers(0, SECONDS_PER_DAY, size=count).astype(np.int32)
+    # Few distinct times, so sessions often touch: one stopping as another starts is not an overlap.
+    start = (start // 10000 * 10000).astype(np.int32)
+    stop = np.minimum(start + rng.integers(1, 4, size=count) * 10000, SECONDS_PER_DAY).astype(np.int32)
+    assert np.array_equal(concurrency_peaks(license, start, stop, 5), brute_force_peaks(license, start, stop, 5))
+
+
+def test_simulated_day_peaks_match_brute_force():
+    sessions, _ = split_at_midnight(simulate_sessions(60, 3, np.random.default_rng(1)))
+    assert np.array_equal(concurrency_peaks(sessions.license, sessions.start, sessions.stop, 3),
+                          brute_force_peaks(sessions.license, sessions.start, sessions.stop, 3))
+
+
+def test_split_at_midnight_shares_idle_time():
+    sessions = Sessions(*(np.array(column, dtype=np.int32) for column in
+                          ([0, 1], [0, 0], [82800, 3600], [90000, 7200], [1200, 100])))
+    today, carried = split_at_midnight(sessions)
+    assert today.stop.tolist() == [SECONDS_PER_DAY, 7200] and today.idle.tolist() == [600, 100]
+    assert [column.tolist() for column in carried] == [[0], [0], [0], [3600], [600]]
+
+
+def test_totals_are_split_per_day_across_midnight():
+    rng = np.random.default_rng(3)
+    first = simulate_sessions(50, 4, rng, median_minutes=600)
+    assert np.count_nonzero(first.stop > SECONDS_PER_DAY)
+    expected = Counter()
+    for user, license, start, stop in zip(first.user, first.license, first.start, first.stop):
+        expected[user, license, 0] += min(stop, SECONDS_PER_DAY) - start
+        if stop > SECONDS_PER_DAY:
+            expected[user, license, 1] += min(stop - SECONDS_PER_DAY, SECONDS_PER_DAY)
+
+    today, carried = split_at_midnight(first)
+    second, _ = split_at_midnight(simulate_sessions(50, 4, rng, active_rate=0, carried=carried))
+    totals = Counter()
+    for day, sessions in enumerate((today, second)):
+        for user, license, session_seconds, _ in zip(*daily_totals(sessions, 4)):
+            totals[user, license, day] = session_seconds
+    assert totals == expected
+    assert today.idle.sum() + carried.idle.sum() == first.idle.sum()
+
+
+def test_simulated_days_stay_within_the_day():
+    days = list(simulate(DateWindow("2024-03-01", "2024-03-03"), 40, 2, rng=7, median_minutes=900))
+    assert [day.date for day in days] == ["2024-03-01", "2024-03-02", "2024-03-03"]
+    for day in days:
+        assert day.session_seconds.max() <= SECONDS_PER_DAY
+        assert (day.idle_seconds <= day.session_seconds).all()
+        assert day.peaks.sum() > 0
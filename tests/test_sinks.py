@@ -0,0 +1,96 @@
+import csv
+import gzip
+import importlib
+import json
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from batch_generate import TABLES, table_template
+from clock import GenerationClock
+from record_templates import REF, TEXT
+from seeding import RandomStreams
+from sinks import FORMATS, column_names, open_sink, sink_path, write_values
+
+AS_OF = "2024-06-01 12:00:00"
+
+
+def table_values(table, count=40):
+    """Seeded values of a table, with markup, CSV quoting and an empty value in the first record."""
+    module = importlib.import_module(TABLES[table].module)
+    values = [list(v) for v in module.generate_values(1, count + 1, clock=GenerationClock(AS_OF),
+                                                      streams=RandomStreams(4, table=table))]
+    template = table_template(table)
+    slot = 0
+    for field in template.fields:
+        if field.kind == TEXT and not field.safe:
+            values[0][slot] = 'a,"b" <c> & d'
+            values[1][slot] = ""
+        slot += {TEXT: 1, REF: 2}.get(field.kind, 0)
+    return values
+
+
+def xml_rows(path):
+    rows = []
+    for record in ET.parse(path).getroot():
+        row = {}
+        for element in record:
+            if "display_value" in element.attrib:
+                row[f"{element.tag}_display_value"] = element.attrib["display_value"]
+            row[element.tag] = element.text or ""
+        rows.append(row)
+    return rows
+
+
+def read_rows(fmt, path):
+    if fmt == "xml":
+        return xml_rows(path)
+    if fmt == "csv":
+        with open(path, newline="", encoding="utf-8") as handle:
+            return list(csv.DictReader(handle))
+    if fmt == "jsonl":
+        with open(path, encoding="utf-8") as handle:
+            return [json.loads(line) for line in handle]
+    import pyarrow.parquet as pq
+
+    return pq.read_table(path).to_pylist()
+
+
+@pytest.mark.parametrize("table", sorted(TABLES))
+def test_every_format_holds_the_xml_fields(table, tmp_path):
+    template = table_template(table)
+    paths = {fmt: str(tmp_path / f"records.{fmt}") for fmt in FORMATS}
+    sinks = [open_sink(fmt, path, template) for fmt, path in paths.items()]
+    assert write_values(table_values(table), sinks, batch_size=16) == 40
+    for sink in sinks:
+        sink.close()
+
+    expected = xml_rows(paths["xml"])
+    assert len(expected) == 40 and list(expected[0]) == column_names(template)
+    for fmt in FORMATS:
+        rows = read_rows(fmt, paths[fmt])
+        assert [list(row) for row in rows] == [column_names(template)] * 40, fmt
+        assert rows == expected, fmt
+
+
+def test_xml_sink_matches_template_render(tmp_path):
+    template = table_template("denial")
+    values = table_values("denial", 5)
+    with open_sink("xml", str(tmp_path / "denial.xml.gz"), template, unload_date=AS_OF) as sink:
+        write_values(values, [sink])
+    with gzip.open(tmp_path / "denial.xml.gz", "rt", encoding="utf-8") as handle:
+        text = handle.read()
+    assert f'unload_date="{AS_OF}"' in text
+    assert "".join(map(template.render, values)) in text
+
+
+def test_sink_path():
+    assert sink_path("out.xml", "parquet") == "out.parquet"
+    assert sink_path("out.xml.gz", "csv") == "out.csv.gz"
+    assert sink_path("out.csv.gz", "parquet") == "out.parquet"
+    assert sink_path("out", "jsonl") == "out.jsonl"
+
+
+def test_open_sink_rejects_unknown_formats(tmp_path):
+    with pytest.raises(ValueError):
+        open_sink("yaml", str(tmp_path / "out.yaml"), table_template("denial"))
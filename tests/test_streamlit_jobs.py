@@ -0,0 +1,47 @@
+import os
+
+import streamlit_jobs
+from streamlit_jobs import GenerationJob, expire_jobs
+
+RECORDS = [f"<record><sys_id>{i}</sys_id></record>" for i in range(5)]
+
+
+def finished_job():
+    job = GenerationJob(iter(RECORDS), len(RECORDS), "test.xml")
+    job._thread.join()
+    return job
+
+
+def test_read_returns_the_whole_unload():
+    job = finished_job()
+    try:
+        data = job.read()
+        assert data.startswith(b"<unload") and all(record.encode() in data for record in RECORDS)
+        assert len(data) == job.file_size()
+    finally:
+        job.discard()
+
+
+def test_discard_deletes_the_file_and_forgets_the_job():
+    job = finished_job()
+    job.discard()
+    assert not os.path.exists(job.path)
+    assert job not in streamlit_jobs._jobs
+
+
+def test_finished_jobs_expire_after_the_ttl():
+    job = finished_job()
+    try:
+        expire_jobs(ttl=60, now=job.finished_at + 30)
+        assert os.path.exists(job.path) and not job.expired
+        expire_jobs(ttl=60, now=job.finished_at + 61)
+        assert not os.path.exists(job.path) and job.expired
+        assert job not in streamlit_jobs._jobs
+    finally:
+        job.discard()
+
+
+def test_exit_cleanup_deletes_every_live_file():
+    jobs = [finished_job(), finished_job()]
+    streamlit_jobs._discard_all()
+    assert not any(os.path.exists(job.path) for job in jobs)
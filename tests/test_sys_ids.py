@@ -0,0 +1,33 @@
+import random
+
+import pytest
+
+from sys_ids import MAX_NAMESPACE, SysIdGenerator
+
+
+def test_ids_are_unique_hex_across_blocks():
+    generator = SysIdGenerator(3, block_size=100)
+    ids = [generator.next_id() for _ in range(1000)] + generator.take(500)
+    assert len(set(ids)) == 1500
+    assert all(len(sys_id) == 32 and int(sys_id, 16) >= 0 for sys_id in ids)
+
+
+def test_namespaces_never_collide():
+    # The same random digits in two namespaces still give different ids.
+    first = SysIdGenerator(1, rng=random.Random(0)).take(1000)
+    second = SysIdGenerator(2, rng=random.Random(0)).take(1000)
+    assert not set(first) & set(second)
+
+
+def test_seeded_ids_repeat():
+    assert SysIdGenerator(5, rng=random.Random(9)).take(10) == SysIdGenerator(5, rng=random.Random(9)).take(10)
+
+
+def test_namespace_bounds():
+    with pytest.raises(ValueError):
+        SysIdGenerator(MAX_NAMESPACE + 1)
+    generator = SysIdGenerator(0)
+    generator._counter = generator._limit - 2  # skip to the end of the namespace
+    assert len(generator.take(2)) == 2
+    with pytest.raises(OverflowError):
+        generator.take(1)
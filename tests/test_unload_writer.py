@@ -0,0 +1,64 @@
+import gzip
+import io
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from unload_writer import UnloadWriter, iter_unload
+
+UNLOAD_DATE = '2024-06-01 12:00:00 & "later"'
+VALUES = ["plain", "", 'a&b <c> "d" > e', "Zoë Ångström 中文 🚀", "line\r\nbreak\ttab", "it's %s {0}"]
+
+
+def make_record(n):
+    """A denial-like record with markup, non-ASCII text and empty elements in its values."""
+    record = ET.Element("samp_eng_app_denial", action="INSERT_OR_UPDATE")
+    ET.SubElement(record, "additional_key")
+    value = VALUES[n % len(VALUES)]
+    ET.SubElement(record, "computer", display_value=value).text = f"{n:032x}"
+    ET.SubElement(record, "denial_id").text = f"Denial {n + 100}"
+    ET.SubElement(record, "product").text = value
+    ET.SubElement(record, "user", display_value=VALUES[(n + 1) % len(VALUES)]).text = value or None
+    return record
+
+
+def element_tree_unload(count):
+    """The whole document as the pages serialized it before UnloadWriter: one ET tree, then tostring."""
+    root = ET.Element("unload")
+    root.set("unload_date", UNLOAD_DATE)
+    for n in range(count):
+        root.append(make_record(n))
+    return ET.tostring(root, encoding="utf-8")
+
+
+@pytest.mark.parametrize("count", [1, 2, 13])
+def test_writer_matches_element_tree_byte_for_byte(count):
+    expected = element_tree_unload(count)
+    elements, strings = io.BytesIO(), io.BytesIO()
+    with UnloadWriter(elements, UNLOAD_DATE) as writer:
+        writer.write_all(make_record(n) for n in range(count))
+    assert elements.getvalue() == expected
+    assert writer.count == count and writer.bytes_written == len(expected)
+    with UnloadWriter(strings, UNLOAD_DATE) as writer:
+        writer.write_all(ET.tostring(make_record(n), encoding="unicode") for n in range(count))
+    assert strings.getvalue() == expected
+    assert b"".join(iter_unload((make_record(n) for n in range(count)), UNLOAD_DATE)) == expected
+    assert "".join(iter_unload((make_record(n) for n in range(count)), UNLOAD_DATE, encoding=None)) == \
+        expected.decode("utf-8")
+
+
+def test_gzip_output_holds_the_same_bytes(tmp_path):
+    path = str(tmp_path / "denial.xml.gz")
+    with UnloadWriter(path, UNLOAD_DATE) as writer:
+        writer.write_all(make_record(n) for n in range(7))
+    with gzip.open(path, "rb") as handle:
+        assert handle.read() == element_tree_unload(7)
+
+
+def test_closing_twice_writes_one_footer():
+    output = io.BytesIO()
+    writer = UnloadWriter(output, UNLOAD_DATE)
+    writer.write(make_record(0))
+    writer.close()
+    writer.close()
+    assert output.getvalue() == element_tree_unload(1)
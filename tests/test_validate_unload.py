@@ -0,0 +1,173 @@
+import re
+
+import pytest
+
+import concurrent_usage
+import data_generate
+import license_usage
+import validate_unload
+from clock import DateWindow, GenerationClock
+from curve_usage import write_curve_unloads
+from pipeline import generate_dataset
+from record_templates import CONCURRENT_USAGE, DENIAL, LICENSE
+from reference_data import row_values
+from seeding import RandomStreams
+from unload_writer import UnloadWriter
+from validate_unload import Distribution, LicenseQuantities, iter_records, open_unload, validate
+
+AS_OF = "2024-06-01 12:00:00"
+CLOCK = GenerationClock(AS_OF)
+DISCOVERY = data_generate.DISCOVERY_MODELS[0]
+SERVER, OTHER_SERVER = data_generate.LICENSE_SERVER_VALUES[:2]
+LICENSE_TYPE = data_generate.LICENSE_TYPE_VALUES[0]
+
+
+def write_unload(path, records):
+    with UnloadWriter(str(path), unload_date=AS_OF) as writer:
+        for record in records:
+            writer.write(record)
+    return str(path)
+
+
+def denials(count, streams=None):
+    streams = streams or RandomStreams(11, table="denial")
+    return [DENIAL.render(values) for values in data_generate.generate_values(1, count + 1, CLOCK, streams=streams)]
+
+
+def denial_for(server, day, streams):
+    picks = (
+        row_values(data_generate.USER_NAMES[0], data_generate.USER_COLUMNS),
+        row_values(DISCOVERY, data_generate.DISCOVERY_COLUMNS),
+        row_values(data_generate.GROUP_NAMES[0], data_generate.GROUP_COLUMNS),
+        row_values(server, data_generate.LICENSE_SERVER_COLUMNS),
+        row_values(LICENSE_TYPE, data_generate.LICENSE_TYPE_COLUMNS),
+    )
+    return DENIAL.render(data_generate.generate_record_values(1, CLOCK, picks=picks, streams=streams, denial_date=day))
+
+
+def usage_for(license_id, usage, day, streams):
+    return CONCURRENT_USAGE.render(concurrent_usage.generate_record_values(
+        1, CLOCK, discovery=(DISCOVERY["norm_product"], license_id), streams=streams, usage_date=day,
+        concurrent_usage=usage))
+
+
+def test_clean_unload_has_no_issues(tmp_path):
+    report = validate([write_unload(tmp_path / "denial.xml", denials(100))])
+    assert report.ok, report.summary()
+    assert report.records == {"samp_eng_app_denial": 100}
+    assert report.distributions["samp_eng_app_denial"]["total_denial_count"].count == 100
+
+
+def test_gzip_unload(tmp_path):
+    report = validate([write_unload(tmp_path / "denial.xml.gz", denials(10))])
+    assert report.ok and report.records == {"samp_eng_app_denial": 10}
+
+
+CORRUPTIONS = {
+    "bad_sys_id": (r"<sys_id>[0-9a-f]{32}</sys_id>", "<sys_id>not-hex</sys_id>"),
+    "empty_value": (r"<product>[^<]*</product>", "<product />"),
+    "bad_date": (r"<denial_date>[^<]*</denial_date>", "<denial_date>2024-13-45</denial_date>"),
+    "date_after_unload": (r"<denial_date>[^<]*</denial_date>", "<denial_date>2030-01-01</denial_date>"),
+    "bad_integer": (r"<total_denial_count>[^<]*</total_denial_count>", "<total_denial_count>²</total_denial_count>"),
+    "missing_field": (r"<publisher>[^<]*</publisher>", ""),
+    "duplicate_field": (r"(<publisher>[^<]*</publisher>)", r"\1\1"),
+    "updated_before_created": (r"<sys_updated_on>[^<]*</sys_updated_on>",
+                               "<sys_updated_on>2000-01-01 00:00:00</sys_updated_on>"),
+    "empty_display_value": (r'<group display_value="[^"]*">', '<group display_value="">'),
+}
+
+
+@pytest.mark.parametrize("kind", sorted(CORRUPTIONS))
+def test_corrupted_record_is_reported_where_it_is(kind, tmp_path):
+    pattern, replacement = CORRUPTIONS[kind]
+    records = denials(50)
+    records[16] = re.sub(pattern, replacement, records[16], count=1)
+    path = write_unload(tmp_path / "denial.xml", records)
+    report = validate([path], stats=False)
+    assert report.issues == {kind: 1}
+    assert report.examples[kind][0].startswith(f"{path}:17:")
+
+
+def test_duplicate_sys_ids_across_files(tmp_path):
+    records = denials(20)
+    first = write_unload(tmp_path / "a.xml", records)
+    second = write_unload(tmp_path / "b.xml", records[5:6] + denials(5, RandomStreams(12, table="denial")))
+    report = validate([first, second], stats=False)
+    assert report.issues == {"duplicate_sys_id": 1}
+
+
+def test_malformed_xml(tmp_path):
+    path = tmp_path / "denial.xml"
+    path.write_text(open(write_unload(path, denials(3)), encoding="utf-8").read()[:-40], encoding="utf-8")
+    assert "malformed_xml" in validate([str(path)], stats=False).issues
+
+
+def test_license_checks(tmp_path):
+    streams = RandomStreams(13)
+    license = license_usage.generate_record_values(DISCOVERY, 10, CLOCK, streams, SERVER, LICENSE_TYPE)
+    license_id = license[LICENSE.slots.index("sys_id")]
+    licenses = write_unload(tmp_path / "license.xml", [LICENSE.render(license)])
+    usage = write_unload(tmp_path / "usage.xml", [
+        usage_for(license_id, 12, "2024-05-01", streams),  # over the quantity
+        usage_for(license_id, 5, "2024-05-02", streams),
+        usage_for("f" * 32, 1, "2024-05-02", streams),  # unknown license
+    ])
+    denial = write_unload(tmp_path / "denial.xml", [
+        denial_for(SERVER, "2024-05-01", streams),  # the license was used up that day
+        denial_for(SERVER, "2024-05-02", streams),  # usage peaked at 5 of 10
+        denial_for(OTHER_SERVER, "2024-05-01", streams),  # no license on that server
+    ])
+    report = validate([usage, denial], licenses=[licenses], stats=False)
+    assert report.issues == {"usage_over_quantity": 1, "unknown_license": 1, "denial_below_quantity": 1,
+                             "unlicensed_denial": 1}
+    assert report.examples["denial_below_quantity"] == [f"{denial}:2: usage peaked at 5 of 10 on 2024-05-02"]
+    assert set(report.records) == {"samp_eng_app_concurrent_usage", "samp_eng_app_denial"}
+
+
+def test_iter_records_does_not_depend_on_chunk_size(tmp_path):
+    path = write_unload(tmp_path / "denial.xml", denials(30))
+    with open_unload(path) as handle:
+        whole = list(iter_records(handle))
+    with open_unload(path) as handle:
+        chunked = list(iter_records(handle, chunk_size=97))
+    assert len(whole) == 30 and chunked == whole
+
+
+@pytest.mark.parametrize("numeric", [False, True])
+def test_distribution_update_matches_add(numeric, monkeypatch):
+    monkeypatch.setattr(validate_unload, "MAX_DISTINCT", 5)
+    values = [str(n % 9) for n in range(40)] + [str(n) for n in range(20, 0, -1)]
+    one_by_one, batched = Distribution(numeric), Distribution(numeric)
+    for value in values:
+        one_by_one.add(value)
+    for start in range(0, len(values), 7):
+        batched.update(values[start:start + 7])
+    assert batched.to_dict() == one_by_one.to_dict()
+    assert list(batched.values.items()) == list(one_by_one.values.items())
+
+
+def test_license_quantities_lookup():
+    quantities = LicenseQuantities()
+    ids = [f"{n:032x}" for n in range(1, 200)]
+    for n, sys_id in enumerate(ids):
+        quantities.add(sys_id, f"product {n % 3}", "server", n)
+    assert quantities.get(ids[42]) == (quantities.pairs[("product 0", "server")], 42)
+    quantities.add(ids[42], "product 1", "server", 7)  # a license read again takes its latest record
+    assert quantities.get(ids[42]) == (quantities.pairs[("product 1", "server")], 7)
+    assert quantities.get("0" * 32) is None
+    assert quantities.get("not-an-id") is None
+    assert quantities.by_pair == [sum(range(0, 199, 3)), sum(range(1, 199, 3)) + 7, sum(range(2, 199, 3))]
+
+
+def test_generated_datasets_are_valid(tmp_path):
+    written = generate_dataset(str(tmp_path / "pipeline"), DateWindow("2024-05-01", "2024-05-07"), cap_rate=0.3,
+                               clock=CLOCK, streams=RandomStreams(3))
+    # licenses=[] checks usage and denials against the license file among the paths.
+    report = validate([path for path, _ in written.values()], licenses=[], stats=False)
+    assert report.ok, report.summary()
+    assert report.records["samp_eng_app_denial"] > 0
+
+    written = write_curve_unloads(str(tmp_path / "curves"), DateWindow("2024-01-01", "2024-02-29"),
+                                  data_generate.DISCOVERY_MODELS[:3], 1, 5, clock=CLOCK, streams=RandomStreams(2))
+    report = validate([path for path, _ in written.values()], stats=False)
+    assert report.ok, report.summary()
@@ -0,0 +1,140 @@
+import gzip
+import os
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+from record_templates import escape_attrib
+
+UNLOAD_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def unload_header(unload_date=None):
+    """Returns the opening <unload> tag, stamped with unload_date (defaults to now)."""
+    if unload_date is None:
+        unload_date = datetime.now().strftime(UNLOAD_DATE_FORMAT)
+    return f'<unload unload_date="{escape_attrib(unload_date)}">'
+
+
+UNLOAD_FOOTER = "</unload>"
+
+
+def serialize_record(record):
+    """Serializes one record element to an XML string. Pre-rendered strings pass through unchanged."""
+    if isinstance(record, str):
+        return record
+    return ET.tostring(record, encoding="unicode")
+
+
+def iter_unload(records, unload_date=None, encoding="utf-8"):
+    """
+    Stream an unload document chunk by chunk.
+
+    Each record is serialized as soon as it is pulled from `records`, so only one
+    record is held in memory at a time.
+
+    Parameters:
+    records (iterable): ET.Element records or pre-rendered record strings.
+    unload_date (str): Value of the unload_date attribute. Defaults to now.
+    encoding (str): Encoding of the yielded chunks. None yields str chunks.
+
+    Yields:
+    bytes or str: The header, one chunk per record, then the footer.
+    """
+    def encode(text):
+        return text if encoding is None else text.encode(encoding)
+
+    yield encode(unload_header(unload_date))
+    for record in records:
+        yield encode(serialize_record(record))
+    yield encode(UNLOAD_FOOTER)
+
+
+def open_stream(target, compress=None, compresslevel=6):
+    """
+    Open an output path or wrap an open binary file object, gzipping it if asked.
+
+    Parameters:
+    target (str | os.PathLike | file): Output path or binary file object.
+    compress (bool): Gzip the output. Defaults to True for paths ending in ".gz".
+    compresslevel (int): Gzip compression level.
+
+    Returns:
+    tuple: (raw file, stream to write to, True when the raw file was opened here).
+    """
+    owns_file = isinstance(target, (str, os.PathLike))
+    if compress is None:
+        compress = owns_file and os.fspath(target).endswith(".gz")
+    raw = open(target, "wb") if owns_file else target
+    # No file name or mtime in the gzip header, so equal content gives equal bytes.
+    stream = (gzip.GzipFile(filename="", fileobj=raw, mode="wb", compresslevel=compresslevel, mtime=0)
+              if compress else raw)
+    return raw, stream, owns_file
+
+
+def close_stream(raw, stream, owns_file):
+    """Closes what open_stream() returned; a caller's file object is only flushed."""
+    if stream is not raw:
+        stream.close()
+    if owns_file:
+        raw.close()
+    else:
+        raw.flush()
+
+
+class UnloadWriter:
+    """
+    Write an unload document to a file, a gzip stream or an open binary file object.
+
+    Records are written as they arrive, so peak memory does not depend on the number
+    of records. Use as a context manager so the closing </unload> tag is always written.
+
+    Parameters:
+    target (str | os.PathLike | file): Output path or binary file object.
+    unload_date (str): Value of the unload_date attribute. Defaults to now.
+    compress (bool): Gzip the output. Defaults to True for paths ending in ".gz".
+    compresslevel (int): Gzip compression level.
+    """
+
+    def __init__(self, target, unload_date=None, compress=None, compresslevel=6):
+        self._raw, self._file, self._owns_file = open_stream(target, compress, compresslevel)
+        self.count = 0
+        self.bytes_written = 0
+        self._closed = False
+        self._write_text(unload_header(unload_date))
+
+    def _write_text(self, text):
+        data = text.encode("utf-8")
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def write(self, record):
+        """Serializes and writes one record."""
+        self._write_text(serialize_record(record))
+        self.count += 1
+
+    def write_all(self, records):
+        """Writes every record from an iterable and returns the running record count."""
+        for record in records:
+            self.write(record)
+        return self.count
+
+    def write_serialized(self, data, count=0):
+        """Writes already-serialized UTF-8 record bytes, e.g. a shard produced by another process."""
+        self._file.write(data)
+        self.bytes_written += len(data)
+        self.count += count
+
+    def close(self):
+        """Writes the closing tag and closes the underlying streams."""
+        if self._closed:
+            return
+        self._closed = True
+        self._write_text(UNLOAD_FOOTER)
+        close_stream(self._raw, self._file, self._owns_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -1,107 +1,184 @@
-import streamlit as st
 import xml.etree.ElementTree as ET
-import random
-import hashlib
-from datetime import datetime, timedelta
-import pandas as pd
+from datetime import date, datetime, timedelta
+from reference_data import EmptyDataError, ReferenceTable, load_table, report_error
+from seeding import RandomStreams, parse_seed
+from record_templates import USAGE_SUMMARY
+from clock import DateWindow, GenerationClock, format_offset
+from instrumentation import wrap
 
 
 def load_data_from_csv(file_name):
+    """Returns the cached reference table for a CSV file (see reference_data.py)."""
     try:
-        data = pd.read_csv(file_name)
-        return data.to_dict(orient="records")
-    except (FileNotFoundError, pd.errors.EmptyDataError) as e:
-        st.error(f"Error loading CSV file: {e}")
-        return []
+        return load_table(file_name)
+    except (FileNotFoundError, EmptyDataError) as e:
+        report_error(f"Error loading CSV file: {e}")
+        return ReferenceTable.empty(file_name)
 
 
 # Usage:
-USER_NAMES = load_data_from_csv("user.csv")
-DISCOVERY_MODELS = load_data_from_csv("discovery.csv")
+USER_TABLE = load_data_from_csv("user.csv")
+USER_NAMES = USER_TABLE.records()
+DISCOVERY_TABLE = load_data_from_csv("discovery.csv")
+DISCOVERY_MODELS = DISCOVERY_TABLE.records()
 
 
 if not USER_NAMES:
-    st.error("No user names found. Ensure the 'user.csv' file exists and contains valid data.")
+    report_error("No user names found. Ensure the 'user.csv' file exists and contains valid data.")
 if not DISCOVERY_MODELS:
-    st.error("No discovery models found. Ensure the 'discovery.csv' file exists and contains valid data.")
+    report_error("No discovery models found. Ensure the 'discovery.csv' file exists and contains valid data.")
 
+# Base date for the records
+BASE_DATE = datetime.strptime("1970-01-01 00:00:00", "%Y-%m-%d %H:%M:%S")
+
+# Records are stamped from one clock that formats each second once.
+CLOCK = GenerationClock()
+
+# Unseeded by default; generate_records(..., streams=RandomStreams(seed, table="usage_summary")) is reproducible.
+STREAMS = RandomStreams()
+
+# Reference rows are drawn for this many records at a time.
+BATCH_SIZE = 4096
 
-def generate_unique_hash():
-    """Generates a unique hash value to ensure each XML field requiring a hash is unique and randomized."""
-    return hashlib.md5(str(random.random()).encode()).hexdigest()
+# The reference columns a usage summary takes from each table, in the order of its picks.
+USER_COLUMNS = ("user", "user_sys_id")
+DISCOVERY_COLUMNS = ("norm_product", "norm_product_sys_id", "norm_publisher", "norm_publisher_sys_id")
 
 
-def generate_durations_small_range():
+def generate_unique_hash(streams=STREAMS):
+    """Returns a new 32-hex sys_id, guaranteed unique within this run (see sys_ids.py)."""
+    return streams.new_sys_id()
+
+
+def generate_durations_small_range(rng=STREAMS.durations):
     """
     Generate random durations for idle and session within specified small ranges.
 
     Returns:
         tuple: Idle and session durations as strings in 'HH:MM:SS' format.
     """
-    idle_duration = timedelta(seconds=random.randint(30, 60))  # 30 seconds to 1 minute
-    session_duration = timedelta(minutes=random.randint(1, 15))  # 1 to 15 minutes
+    idle_duration = timedelta(seconds=rng.randint(30, 60))  # 30 seconds to 1 minute
+    session_duration = timedelta(minutes=rng.randint(1, 15))  # 1 to 15 minutes
     return idle_duration, session_duration
 
 
-def generate_xml_record(usage_summary_num, base_date):
-    # Randomly select from csv files
-    users = random.choice(USER_NAMES)
-    discovery = random.choice(DISCOVERY_MODELS)
+def pick_references(count, streams=STREAMS):
+    """
+    Draws the (user, discovery) picks for `count` records at once, as tuples of
+    USER_COLUMNS and DISCOVERY_COLUMNS values.
+    """
+    rng = streams.numpy("picks")
+    return zip(USER_TABLE.sample_values(count, rng, USER_COLUMNS),
+               DISCOVERY_TABLE.sample_values(count, rng, DISCOVERY_COLUMNS))
+
+
+def generate_record_values(usage_summary_num, base_date, clock=CLOCK, date_window=None, picks=None, streams=STREAMS,
+                           usage_date=None, durations=None):
+    """
+    Returns the varying values of one usage summary record, in USAGE_SUMMARY template slot order.
+
+    usage_date is today by default, or drawn from date_window (a clock.DateWindow); a
+    given usage_date overrides both.
+    picks is one tuple from pick_references(); reference rows are drawn here when omitted.
+    streams (seeding.RandomStreams) supplies every random draw.
+    durations is an (idle, session) timedelta pair, e.g. from session_sim.py; drawn when omitted.
+    """
+    if picks is None:
+        # Randomly select from csv files
+        picks = next(pick_references(1, streams))
+    users, discovery = picks
 
     # Generate durations
-    idle_duration, session_duration = generate_durations_small_range()
-
-    # Offset the base date with the idle and session durations
-    total_idle_duration = (base_date + idle_duration).strftime("%Y-%m-%d %H:%M:%S")
-    total_sess_duration = (base_date + session_duration).strftime("%Y-%m-%d %H:%M:%S")
-
-    # Create the <samp_eng_app_usage_summary> element with "INSERT_OR_UPDATE" action
-    usage_summary = ET.Element("samp_eng_app_usage_summary", action="INSERT_OR_UPDATE")
-    ET.SubElement(usage_summary, "norm_product", display_value=discovery["norm_product"]).text = discovery["norm_product_sys_id"]
-    ET.SubElement(usage_summary, "norm_publisher", display_value=discovery["norm_publisher"]).text = discovery["norm_publisher_sys_id"]
-    ET.SubElement(usage_summary, "reporting_version").text = "v1"
-    ET.SubElement(usage_summary, "source").text = "OpeniT"
-    ET.SubElement(usage_summary, "sys_created_by").text = "admin"
-    ET.SubElement(usage_summary, "sys_created_on").text = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    ET.SubElement(usage_summary, "sys_domain").text = generate_unique_hash()
-    ET.SubElement(usage_summary, "sys_domain_path").text = "/"
-    ET.SubElement(usage_summary, "sys_id").text = generate_unique_hash()
-    ET.SubElement(usage_summary, "sys_mod_count").text = str(random.randint(1, 100))
-    ET.SubElement(usage_summary, "sys_updated_by").text = "admin"
-    ET.SubElement(usage_summary, "sys_updated_on").text = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    ET.SubElement(usage_summary, "total_idle_duration").text = total_idle_duration
-    ET.SubElement(usage_summary, "total_sess_duration").text = total_sess_duration
-    ET.SubElement(usage_summary, "usage_date").text = datetime.now().strftime("%Y-%m-%d")
-    ET.SubElement(usage_summary, "user", display_value=users["user"]).text = users["user_sys_id"]
-    return usage_summary
-
-
-st.title("XML Record Generator for samp_eng_app_usage_summary.xml")
-
-num_records_input = st.text_input("Enter the number of records to generate", value="")
-
-if num_records_input.isdigit():
-    num_records = int(num_records_input)
-else:
-    num_records = 0
+    if durations is None:
+        durations = generate_durations_small_range(streams.durations)
+    idle_duration, session_duration = durations
 
-# Base date for the records
-base_date = datetime.strptime("1970-01-01 00:00:00", "%Y-%m-%d %H:%M:%S")
+    # Offset the base date with the idle and session durations (each distinct offset is formatted once)
+    total_idle_duration = format_offset(base_date, idle_duration)
+    total_sess_duration = format_offset(base_date, session_duration)
+
+    stamp = clock.stamp()
+    if usage_date is None:
+        usage_date = stamp.date if date_window is None else date_window.pick(streams.dates)
+
+    return (
+        *discovery,  # norm_product, norm_publisher and their sys_ids
+        stamp.second,  # sys_created_on
+        generate_unique_hash(streams),  # sys_domain
+        generate_unique_hash(streams),  # sys_id
+        str(streams.counts.randint(1, 100)),  # sys_mod_count
+        stamp.second,  # sys_updated_on
+        total_idle_duration,
+        total_sess_duration,
+        usage_date,
+        *users,  # user, user_sys_id
+    )
+
+
+def render_xml_record(usage_summary_num, base_date, clock=CLOCK, date_window=None, streams=STREAMS):
+    """Renders one <samp_eng_app_usage_summary> record straight to an XML string."""
+    return USAGE_SUMMARY.render(
+        generate_record_values(usage_summary_num, base_date, clock, date_window, streams=streams))
+
+
+def generate_xml_record(usage_summary_num, base_date, clock=CLOCK, date_window=None, streams=STREAMS):
+    """Returns one <samp_eng_app_usage_summary> record as an ET.Element."""
+    return ET.fromstring(render_xml_record(usage_summary_num, base_date, clock, date_window, streams))
+
+
+def generate_values(start, stop, base_date=BASE_DATE, clock=CLOCK, date_window=None, batch_size=BATCH_SIZE,
+                    streams=STREAMS):
+    """Yields the USAGE_SUMMARY value tuples of the records numbered start..stop-1."""
+    pick, values = wrap("picks", pick_references), wrap("values", generate_record_values)
+    for batch_start in range(start, stop, batch_size):
+        batch_stop = min(batch_start + batch_size, stop)
+        picks = pick(batch_stop - batch_start, streams)
+        for i, record_picks in zip(range(batch_start, batch_stop), picks):
+            yield values(i, base_date, clock, date_window, record_picks, streams)
+
+
+def generate_records(start, stop, base_date=BASE_DATE, clock=CLOCK, date_window=None, batch_size=BATCH_SIZE,
+                     streams=STREAMS):
+    """Yields the records numbered start..stop-1, so shards of one run keep contiguous IDs."""
+    yield from map(wrap("render", USAGE_SUMMARY.render),
+               generate_values(start, stop, base_date, clock, date_window, batch_size, streams))
+
+
+if __name__ == "__main__":
+    import streamlit as st
+
+    from streamlit_jobs import show_job, start_job
+
+    st.title("XML Record Generator for samp_eng_app_usage_summary.xml")
+
+    num_records_input = st.text_input("Enter the number of records to generate", value="")
 
-if st.button("Generate XML"):
-    if num_records <= 0:
-        st.error("Please enter a valid number greater than 0.")
+    if num_records_input.isdigit():
+        num_records = int(num_records_input)
     else:
-        root = ET.Element("unload")
-        root.set("unload_date", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-        for i in range(1, num_records + 1):
-            record = generate_xml_record(i, base_date)
-            root.append(record)
-        xml_data = ET.tostring(root, encoding="utf-8").decode("utf-8")
-        st.code(xml_data, language="xml")
-        st.download_button(
-            label="Download XML",
-            data=xml_data,
-            file_name="samp_eng_app_usage_summary.xml",
-            mime="application/xml"
-        )
+        num_records = 0
+
+    date_window = None
+    if st.checkbox("Spread usage dates over a date window"):
+        window = st.date_input("Date window", value=(date.today() - timedelta(days=30), date.today()))
+        if len(window) == 2:
+            date_window = DateWindow(*window)
+
+    compress = st.checkbox("Gzip the download")
+    profile = st.sidebar.checkbox("Profile generation stages")
+    seed_input = st.text_input("Random seed (optional, for reproducible records)", value="")
+
+    if st.button("Generate XML"):
+        try:
+            seed = parse_seed(seed_input)
+        except ValueError as e:
+            st.error(str(e))
+            st.stop()
+        if num_records <= 0:
+            st.error("Please enter a valid number greater than 0.")
+        else:
+            records = generate_records(1, num_records + 1, date_window=date_window,
+                                       streams=RandomStreams(seed, table="usage_summary"))
+            start_job("usage_summary_job", records, num_records, "samp_eng_app_usage_summary.xml", compress, profile=profile)
+
+    show_job("usage_summary_job")
@@ -0,0 +1,685 @@
+"""
+Stream-validate generated unload files and report per-field value distributions.
+
+Files are read in 1MB chunks through an incremental XML parser whose target hands
+over each record as plain field lists. No element tree is kept, so memory does not grow
+with the file size (gzip files are decompressed on the fly). The records of a chunk are
+checked a column at a time; only a run holding a bad value or an unexpected layout is
+gone through record by record, to say where each issue is. Checks:
+- structure: <unload unload_date=...> root, known record tables, every field of the
+  table's RecordTemplate present exactly once and no unexpected ones;
+- values: non-empty text and display_value, 32-hex sys_ids, well-formed dates, times
+  and counts, sys_updated_on not before sys_created_on, end_date not before start_date,
+  denial/usage dates not after the unload_date;
+- duplicate sys_ids across all given files. Each sys_id is kept only as a 64-bit hash
+  (8 bytes per record); colliding hashes are re-checked against the real ids in a
+  second pass over the files, which only happens when there are candidates;
+- with --licenses, concurrent usage above its license's quantity or pointing at an
+  unknown license, denials for unlicensed product/server pairs, and denials on days
+  whose recorded concurrent usage stayed below the quantity. Each license takes 20
+  bytes (its sys_id hash, quantity and product/server pair) plus the peak usage and
+  denials per pair and day; none of this is kept without --licenses.
+
+Distributions keep exact counts for up to MAX_DISTINCT values per field; numeric
+fields get count/min/max/mean instead.
+
+Examples:
+    python validate_unload.py samp_eng_app_denial.xml
+    python validate_unload.py dataset/*.xml --licenses dataset/samp_eng_app_license.xml --json report.json
+    python validate_unload.py big.xml.gz --no-stats
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from collections import Counter
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter, lt
+
+import numpy as np
+
+from clock import DATE_FORMAT, MINUTE_FORMAT, SECOND_FORMAT
+from record_templates import CONST, REF, TEMPLATES
+
+CHUNK_SIZE = 1 << 20
+MAX_EXAMPLES = 5
+MAX_DISTINCT = 1000
+TOP_VALUES = 10
+
+HEX_ID = re.compile(r"[0-9a-f]{32}")
+HEX_DIGITS = re.compile(r"[0-9a-f]*")
+INTEGER = re.compile(r"[0-9]+")
+
+# Fields holding ids, which are checked but have no useful distribution.
+ID_FIELDS = {"sys_id", "sys_domain", "license_id"}
+INTEGER_FIELDS = {"sys_mod_count", "total_denial_count", "concurrent_usage", "quantity"}
+FORMATS = {
+    "denial_date": DATE_FORMAT,
+    "usage_date": DATE_FORMAT,
+    "last_denial_time": MINUTE_FORMAT,
+    "start_date": SECOND_FORMAT,
+    "end_date": SECOND_FORMAT,
+    "sys_created_on": SECOND_FORMAT,
+    "sys_updated_on": SECOND_FORMAT,
+    "total_idle_duration": SECOND_FORMAT,
+    "total_sess_duration": SECOND_FORMAT,
+}
+# Days a record is about, which cannot lie after the unload was taken.
+DAY_FIELDS = {"denial_date", "usage_date"}
+# Tables are validated licenses first, so the quantity checks can use them.
+TABLE_ORDER = ["samp_eng_app_license", "samp_eng_app_concurrent_usage", "samp_eng_app_denial",
+               "samp_eng_app_usage_summary"]
+
+
+@lru_cache(maxsize=65536)
+def _well_formed(text, layout):
+    try:
+        time.strptime(text, layout)
+    except ValueError:
+        return False
+    return True
+
+
+def sys_id_hash(sys_id):
+    """Folds a 32-hex sys_id into 64 bits."""
+    return int(sys_id[:16], 16) ^ int(sys_id[16:], 16)
+
+
+def sys_id_hashes(sys_ids):
+    """sys_id_hash of a sequence of 32-hex sys_ids, as a uint64 array."""
+    halves = np.frombuffer(bytes.fromhex("".join(sys_ids)), dtype=">u8").reshape(-1, 2)
+    return (halves[:, 0] ^ halves[:, 1]).astype(np.uint64)
+
+
+def open_unload(path):
+    """Opens an unload file for binary reading, decompressing gzip files."""
+    handle = open(path, "rb")
+    if handle.peek(2)[:2] == b"\x1f\x8b":
+        return gzip.GzipFile(fileobj=handle, mode="rb")
+    return handle
+
+
+class _RecordTarget:
+    """
+    XMLParser target that turns each record into plain lists as it is parsed.
+
+    No Element tree is built, so memory stays flat however long the file is. The
+    handlers are closures over local lists and character data goes straight to
+    list.append, which keeps the Python work per element to a couple of comparisons.
+    """
+
+    def __init__(self):
+        self.unload_date = None
+        self.records = []
+        texts = []
+        depth = 0
+        table = tags = values = displays = None
+
+        def start(tag, attrib):
+            nonlocal depth, table, tags, values, displays
+            depth += 1
+            if depth == 3:
+                texts.clear()
+                if attrib:
+                    display = attrib.get("display_value")
+                    if display is not None:
+                        displays[tag] = display
+            elif depth == 2:
+                table, tags, values, displays = tag, [], [], {}
+            elif depth == 1:
+                self.unload_date = attrib.get("unload_date") if tag == "unload" else None
+
+        def end(tag):
+            nonlocal depth
+            if depth == 3:
+                tags.append(tag)
+                values.append("".join(texts))
+            elif depth == 2:
+                self.records.append((table, tags, values, displays))
+            depth -= 1
+
+        self.start, self.end, self.data = start, end, texts.append
+
+    def close(self):
+        return None
+
+
+def iter_record_batches(handle, chunk_size=CHUNK_SIZE):
+    """
+    Yield (unload_date, records) for each chunk of an unload stream.
+
+    records lists the records completed in that chunk as (table, tags, texts,
+    display_values) tuples: the field tags and texts in document order, and a dict of the
+    display_value of each reference field. unload_date is None when the root is not a
+    valid <unload>.
+    """
+    target = _RecordTarget()
+    parser = ET.XMLParser(target=target)
+    while True:
+        chunk = handle.read(chunk_size)
+        error = None
+        try:
+            if chunk:
+                parser.feed(chunk)
+            else:
+                parser.close()
+        except ET.ParseError as e:
+            error = e
+        # Records completed before a parse error are still checked.
+        records, target.records = target.records, []
+        if records:
+            yield target.unload_date, records
+        if error is not None:
+            raise error
+        if not chunk:
+            return
+
+
+def iter_records(handle, chunk_size=CHUNK_SIZE):
+    """
+    Yield (unload_date, table, fields, display_values) for each record of an unload stream.
+
+    fields is a list of (tag, text) pairs in document order and display_values maps the
+    tags of reference fields to their display_value. The stream is parsed incrementally,
+    one chunk at a time. unload_date is None when the root is not a valid <unload>.
+    """
+    for unload_date, records in iter_record_batches(handle, chunk_size):
+        for table, tags, texts, displays in records:
+            yield unload_date, table, list(zip(tags, texts)), displays
+
+
+class Distribution:
+    """Value counts of one field, bounded to MAX_DISTINCT values, or min/max/mean for numbers."""
+
+    def __init__(self, numeric=False):
+        self.numeric = numeric
+        self.count = 0
+        self.values = Counter()
+        self.overflow = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value):
+        self.count += 1
+        if self.numeric:
+            number = int(value)
+            self.total += number
+            if self.minimum is None or number < self.minimum:
+                self.minimum = number
+            if self.maximum is None or number > self.maximum:
+                self.maximum = number
+            return
+        if value in self.values or len(self.values) < MAX_DISTINCT:
+            self.values[value] += 1
+        else:
+            self.overflow += 1
+
+    def update(self, values):
+        """Adds a column of values at once; counts come out the same as add() value by value."""
+        self.count += len(values)
+        if self.numeric:
+            numbers = list(map(int, values))
+            self.total += sum(numbers)
+            low, high = min(numbers), max(numbers)
+            if self.minimum is None or low < self.minimum:
+                self.minimum = low
+            if self.maximum is None or high > self.maximum:
+                self.maximum = high
+            return
+        counts = Counter(values)
+        if len(self.values) + len(counts) <= MAX_DISTINCT:
+            self.values.update(counts)
+            return
+        # Values are admitted in order of first appearance until MAX_DISTINCT are held.
+        if len(self.values) < MAX_DISTINCT:
+            for value in counts:
+                if value not in self.values:
+                    if len(self.values) >= MAX_DISTINCT:
+                        break
+                    self.values[value] = 0
+        kept = counts.keys() & self.values.keys()
+        for value in kept:
+            self.values[value] += counts[value]
+        self.overflow += len(values) - sum(counts[value] for value in kept)
+
+    def to_dict(self):
+        if self.numeric:
+            mean = self.total / self.count if self.count else None
+            return {"count": self.count, "min": self.minimum, "max": self.maximum, "mean": mean}
+        return {
+            "count": self.count,
+            "distinct": f">{MAX_DISTINCT}" if self.overflow else len(self.values),
+            "top": self.values.most_common(TOP_VALUES),
+        }
+
+
+class ValidationReport:
+    """Issues, record counts and distributions collected over one or more files."""
+
+    def __init__(self):
+        self.records = Counter()
+        self.issues = Counter()
+        self.examples = {}
+        self.distributions = {}
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def issue(self, kind, where, message):
+        self.issues[kind] += 1
+        examples = self.examples.setdefault(kind, [])
+        if len(examples) < MAX_EXAMPLES:
+            examples.append(f"{where}: {message}")
+
+    @property
+    def ok(self):
+        return not self.issues
+
+    def to_dict(self):
+        return {
+            "records": dict(self.records),
+            "bytes": self.bytes,
+            "seconds": self.seconds,
+            "issues": dict(self.issues),
+            "examples": self.examples,
+            "distributions": {
+                table: {field: dist.to_dict() for field, dist in fields.items()}
+                for table, fields in self.distributions.items()
+            },
+        }
+
+    def summary(self):
+        lines = []
+        for table, count in self.records.items():
+            lines.append(f"{table:<32}{count:>12,} records")
+        rate = self.bytes / self.seconds / 1e6 if self.seconds else 0
+        lines.append(f"{sum(self.records.values()):,} records, {self.bytes / 1e6:,.1f} MB in {self.seconds:.1f}s "
+                     f"({rate:,.1f} MB/s)")
+        if self.ok:
+            lines.append("No issues found.")
+        for kind, count in self.issues.most_common():
+            lines.append(f"{kind}: {count:,}")
+            lines.extend(f"    {example}" for example in self.examples[kind])
+        return "\n".join(lines)
+
+    def distribution_summary(self):
+        lines = []
+        for table, fields in self.distributions.items():
+            lines.append(table)
+            for field, dist in fields.items():
+                stats = dist.to_dict()
+                if dist.numeric:
+                    lines.append(f"    {field:<28}min {stats['min']}  max {stats['max']}  mean {stats['mean']:.2f}")
+                else:
+                    top = ", ".join(f"{value or '(empty)'} ({n:,})" for value, n in stats["top"][:5])
+                    lines.append(f"    {field:<28}{stats['distinct']} distinct; {top}")
+        return "\n".join(lines)
+
+
+class LicenseQuantities:
+    """
+    License quantities read from license unloads, for the cross-table checks.
+
+    A license costs 20 bytes however many are read: its sys_id is kept only as the 64-bit
+    sys_id_hash, next to its quantity and the index of its (norm_product, license_server)
+    pair, in arrays sorted by hash. Peak usage and denied days are kept per pair and day,
+    so they grow with the days covered rather than with the number of records.
+    """
+
+    def __init__(self):
+        self.pairs = {}        # (norm_product sys_id, license_server sys_id) -> pair index
+        self.by_pair = []      # pair index -> total quantity
+        self.peak_usage = {}   # (pair index, usage_date) -> highest recorded concurrent usage
+        self.denied_days = {}  # (pair index, denial_date) -> first "file:record" denied there
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._pair_indices = np.empty(0, dtype=np.int32)
+        self._quantities = np.empty(0, dtype=np.int64)
+        self._added = (array("Q"), array("i"), array("q"))
+
+    def add(self, sys_id, product, server, quantity):
+        pair = self.pairs.setdefault((product, server), len(self.by_pair))
+        if pair == len(self.by_pair):
+            self.by_pair.append(0)
+        self.by_pair[pair] += quantity
+        hashes, pairs, quantities = self._added
+        hashes.append(sys_id_hash(sys_id))
+        pairs.append(pair)
+        quantities.append(quantity)
+
+    def get(self, sys_id):
+        """Returns (pair index, quantity) of a license sys_id, or None for unknown or malformed ids."""
+        if not HEX_ID.fullmatch(sys_id or ""):
+            return None
+        if len(self._added[0]):
+            self._merge()
+        key = np.uint64(sys_id_hash(sys_id))
+        position = int(np.searchsorted(self._hashes, key, side="right")) - 1
+        if position < 0 or self._hashes[position] != key:
+            return None
+        return int(self._pair_indices[position]), int(self._quantities[position])
+
+    def _merge(self):
+        """Sorts the licenses added since the last lookup in; a sys_id read again takes its latest record."""
+        hashes, pairs, quantities = self._added
+        merged = np.concatenate([self._hashes, np.frombuffer(hashes, dtype=np.uint64)])
+        order = np.argsort(merged, kind="stable")
+        self._hashes = merged[order]
+        self._pair_indices = np.concatenate([self._pair_indices, np.frombuffer(pairs, dtype=np.int32)])[order]
+        self._quantities = np.concatenate([self._quantities, np.frombuffer(quantities, dtype=np.int64)])[order]
+        self._added = (array("Q"), array("i"), array("q"))
+
+
+_RULE_CONST, _RULE_REF, _RULE_ID, _RULE_INTEGER, _RULE_FORMAT, _RULE_TEXT = range(6)
+
+
+def _field_rule(field):
+    if field.kind == CONST:
+        return _RULE_CONST
+    if field.kind == REF:
+        return _RULE_REF
+    if field.tag in ID_FIELDS:
+        return _RULE_ID
+    if field.tag in INTEGER_FIELDS:
+        return _RULE_INTEGER
+    if field.tag in FORMATS:
+        return _RULE_FORMAT
+    return _RULE_TEXT
+
+
+def _all_hex_ids(values):
+    """True when every value is a 32-hex sys_id."""
+    return set(map(len, values)) == {32} and HEX_DIGITS.fullmatch("".join(values)) is not None
+
+
+def _record_checker(template, report, stats, licenses, seen):
+    """
+    Builds the check function of one table, which takes a run of that table's records.
+
+    A run whose records all hold exactly the template's fields in order is checked a
+    column at a time. When any of those checks fails, or the layout differs, the run is
+    checked record by record instead, which reports every issue where it occurs.
+    """
+    table = template.table
+    expected = [field.tag for field in template.fields]
+    positions = {tag: position for position, tag in enumerate(expected)}
+    rules = {field.tag: _field_rule(field) for field in template.fields}
+    checked = [(position, tag, rules[tag]) for position, tag in enumerate(expected) if rules[tag] != _RULE_CONST]
+    ref_tags = [tag for tag in expected if rules[tag] == _RULE_REF]
+    get_displays = itemgetter(*ref_tags) if ref_tags else None
+    ordered_pairs = [(positions[early], positions[late])
+                     for early, late in (("sys_created_on", "sys_updated_on"), ("start_date", "end_date"))
+                     if early in positions and late in positions]
+    distributions = report.distributions.setdefault(table, {})
+    for field in template.fields:
+        if stats and rules[field.tag] not in (_RULE_CONST, _RULE_ID):
+            distributions.setdefault(field.tag, Distribution(numeric=rules[field.tag] == _RULE_INTEGER))
+    issue = report.issue
+
+    def check_record(tags, texts, displays, where, unload_date):
+        values = {}
+        for tag, text in zip(tags, texts):
+            if tag in values:
+                issue("duplicate_field", where, tag)
+                continue
+            rule = rules.get(tag)
+            if rule is None:
+                issue("unexpected_field", where, tag)
+                continue
+            values[tag] = text
+            if rule == _RULE_CONST:
+                continue
+            value = text
+            if rule == _RULE_REF:
+                value = displays.get(tag)
+                if not value:
+                    issue("empty_display_value", where, tag)
+                if not HEX_ID.fullmatch(text):
+                    issue("bad_reference", where, f"{tag}={text!r}")
+            elif not text:
+                issue("empty_value", where, tag)
+            elif rule == _RULE_ID:
+                if not HEX_ID.fullmatch(text):
+                    issue("bad_sys_id", where, f"{tag}={text!r}")
+                continue
+            elif rule == _RULE_INTEGER:
+                if not INTEGER.fullmatch(text):
+                    issue("bad_integer", where, f"{tag}={text!r}")
+                    continue
+            elif rule == _RULE_FORMAT:
+                if not _well_formed(text, FORMATS[tag]):
+                    issue("bad_date", where, f"{tag}={text!r}")
+                elif tag in DAY_FIELDS and unload_date and text > unload_date[:10]:
+                    issue("date_after_unload", where, f"{tag}={text} after {unload_date}")
+            if stats and value:
+                distributions[tag].add(value)
+        if len(values) != len(expected):
+            for tag in expected:
+                if tag not in values:
+                    issue("missing_field", where, tag)
+
+        sys_id = values.get("sys_id", "")
+        if HEX_ID.fullmatch(sys_id):
+            seen.append(sys_id_hash(sys_id))
+        created, updated = values.get("sys_created_on"), values.get("sys_updated_on")
+        if created and updated and updated < created:
+            issue("updated_before_created", where, f"{updated} < {created}")
+        start, end = values.get("start_date"), values.get("end_date")
+        if start and end and end < start:
+            issue("ends_before_start", where, f"{end} < {start}")
+        if licenses is not None:
+            _check_quantities(table, values, where, report, licenses)
+
+    def check_columns(records, unload_date):
+        """Returns the field and display_value columns of a run if every record passes, else None."""
+        if any(tags != expected for _, tags, _, _ in records):
+            return None
+        columns = list(zip(*[texts for _, _, texts, _ in records]))
+        displays = {}
+        if ref_tags:
+            try:
+                rows = [get_displays(record_displays) for _, _, _, record_displays in records]
+            except KeyError:
+                return None
+            displays = dict(zip(ref_tags, zip(*rows) if len(ref_tags) > 1 else [rows]))
+        for position, tag, rule in checked:
+            column = columns[position]
+            if rule == _RULE_REF or rule == _RULE_ID:
+                if not _all_hex_ids(column) or (rule == _RULE_REF and not all(displays[tag])):
+                    return None
+            elif not all(column):
+                return None
+            elif rule == _RULE_INTEGER:
+                if not INTEGER.fullmatch("".join(column)):
+                    return None
+            elif rule == _RULE_FORMAT:
+                if not all(_well_formed(value, FORMATS[tag]) for value in set(column)):
+                    return None
+                if tag in DAY_FIELDS and unload_date and max(column) > unload_date[:10]:
+                    return None
+        for early, late in ordered_pairs:
+            if any(map(lt, columns[late], columns[early])):
+                return None
+        return columns, displays
+
+    def check(records, path, first, unload_date):
+        """Checks the records of one run, numbered from `first` within `path`."""
+        passed = check_columns(records, unload_date)
+        if passed is None:
+            for number, (_, tags, texts, displays) in enumerate(records, first):
+                check_record(tags, texts, displays, f"{path}:{number}", unload_date)
+            return
+        columns, displays = passed
+        if stats:
+            for position, tag, rule in checked:
+                if rule != _RULE_ID:
+                    distributions[tag].update(displays[tag] if rule == _RULE_REF else columns[position])
+        if "sys_id" in positions:
+            seen.frombytes(sys_id_hashes(columns[positions["sys_id"]]).tobytes())
+        if licenses is not None:
+            for number, (_, _, texts, _) in enumerate(records, first):
+                _check_quantities(table, dict(zip(expected, texts)), f"{path}:{number}", report, licenses)
+
+    return check
+
+
+def _check_quantities(table, values, where, report, licenses):
+    """Cross-checks one record against the license quantities; reference fields hold their sys_ids."""
+    if table == "samp_eng_app_license":
+        sys_id, quantity = values.get("sys_id", ""), values.get("quantity", "")
+        if HEX_ID.fullmatch(sys_id) and INTEGER.fullmatch(quantity):
+            licenses.add(sys_id, values.get("norm_product"), values.get("license_server"), int(quantity))
+    elif table == "samp_eng_app_concurrent_usage":
+        license_id = values.get("license")
+        usage = values.get("concurrent_usage", "")
+        lic = licenses.get(license_id)
+        if lic is None:
+            report.issue("unknown_license", where, f"license={license_id}")
+        elif INTEGER.fullmatch(usage):
+            pair, quantity = lic
+            if int(usage) > quantity:
+                report.issue("usage_over_quantity", where, f"{usage} > {quantity}")
+            key = (pair, values.get("usage_date"))
+            licenses.peak_usage[key] = max(licenses.peak_usage.get(key, 0), int(usage))
+    elif table == "samp_eng_app_denial":
+        product, server = values.get("norm_product"), values.get("license_server")
+        pair = licenses.pairs.get((product, server))
+        if pair is None:
+            report.issue("unlicensed_denial", where, f"product {product} on server {server}")
+        else:
+            licenses.denied_days.setdefault((pair, values.get("denial_date")), where)
+
+
+def _file_order(path):
+    """Sort key putting license files first, by peeking at the first record's table."""
+    try:
+        with open_unload(path) as handle:
+            for _, table, _, _ in iter_records(handle, 1 << 16):
+                return TABLE_ORDER.index(table) if table in TABLE_ORDER else len(TABLE_ORDER)
+    except (OSError, ET.ParseError):
+        pass
+    return len(TABLE_ORDER)
+
+
+def _find_duplicates(paths, hashes, report):
+    """Second pass: report the real sys_ids behind colliding hashes."""
+    candidates = set(hashes.tolist())
+    first_seen = {}
+    for path in paths:
+        try:
+            with open_unload(path) as handle:
+                for number, (_, _, fields, _) in enumerate(iter_records(handle), 1):
+                    sys_id = dict(fields).get("sys_id", "")
+                    if not HEX_ID.fullmatch(sys_id) or sys_id_hash(sys_id) not in candidates:
+                        continue
+                    where = f"{path}:{number}"
+                    if sys_id in first_seen:
+                        report.issue("duplicate_sys_id", where, f"{sys_id} (first at {first_seen[sys_id]})")
+                    else:
+                        first_seen[sys_id] = where
+        except (OSError, ET.ParseError):
+            # Already reported by the first pass.
+            continue
+
+
+def validate(paths, licenses=None, stats=True):
+    """
+    Validate unload files together (sys_ids must be unique across all of them).
+
+    Parameters:
+    paths (list): Unload files, plain or gzip.
+    licenses (list): License unload files for the quantity checks; files in `paths` that
+        hold licenses are used too. None skips the quantity checks.
+    stats (bool): Collect per-field distributions.
+
+    Returns:
+    ValidationReport: The collected issues and distributions.
+    """
+    started = time.perf_counter()
+    report = ValidationReport()
+    quantities = None if licenses is None else LicenseQuantities()
+    paths = list(paths)
+    ordered = [p for p in licenses or [] if p not in paths] + sorted(paths, key=_file_order)
+    seen = array("Q")
+    checkers = {}
+    for path in ordered:
+        only_licenses = path not in paths
+        number = 0
+        try:
+            with open_unload(path) as handle:
+                for unload_date, records in iter_record_batches(handle):
+                    if number == 0 and unload_date is None:
+                        report.issue("bad_root", path, "the root element is not <unload unload_date=...>")
+                    for table, run in groupby(records, key=itemgetter(0)):
+                        run = list(run)
+                        first, number = number + 1, number + len(run)
+                        template = TEMPLATES.get(table)
+                        if template is None:
+                            for unknown in range(first, number + 1):
+                                report.issue("unknown_table", f"{path}:{unknown}", table)
+                            continue
+                        if only_licenses:
+                            if table == "samp_eng_app_license":
+                                for license_number, (_, tags, texts, _) in enumerate(run, first):
+                                    _check_quantities(table, dict(zip(tags, texts)), f"{path}:{license_number}",
+                                                      report, quantities)
+                            continue
+                        check = checkers.get(table)
+                        if check is None:
+                            check = checkers[table] = _record_checker(template, report, stats, quantities, seen)
+                        check(run, path, first, unload_date)
+                        report.records[table] += len(run)
+            if not only_licenses:
+                report.bytes += os.path.getsize(path)
+        except ET.ParseError as e:
+            report.issue("malformed_xml", path, str(e))
+        except OSError as e:
+            report.issue("unreadable_file", path, str(e))
+
+    if quantities is not None:
+        for (pair, day), where in quantities.denied_days.items():
+            peak = quantities.peak_usage.get((pair, day))
+            quantity = quantities.by_pair[pair]
+            if peak is not None and peak < quantity:
+                report.issue("denial_below_quantity", where, f"usage peaked at {peak} of {quantity} on {day}")
+
+    if len(seen):
+        hashes = np.frombuffer(seen, dtype=np.uint64)
+        hashes = np.sort(hashes)
+        colliding = np.unique(hashes[1:][hashes[1:] == hashes[:-1]])
+        if len(colliding):
+            _find_duplicates(paths, colliding, report)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Validate generated unload XML files and report distributions.")
+    parser.add_argument("paths", nargs="+", help="Unload files (.xml or .xml.gz)")
+    parser.add_argument("--licenses", nargs="+", metavar="FILE",
+                        help="License unloads to check concurrent usage and denials against "
+                             "(about 20 bytes of memory per license)")
+    parser.add_argument("--no-stats", action="store_true", help="Skip the value distributions")
+    parser.add_argument("--json", help="Write the full report as JSON to this file")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    report = validate(args.paths, args.licenses, stats=not args.no_stats)
+    if not args.no_stats:
+        print(report.distribution_summary())
+    print(report.summary())
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report.to_dict(), handle, indent=2)
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())